@@ -1,27 +1,42 @@
-from flask import Flask
-from flask_restx import Api
-from flask_migrate import Migrate
-from .auth.views import auth_namespace
-from .student.views import student_namespace
-from .courses.views import courses_namespace
+from functools import partial
 from .config.config import config_dict
 from .utils import db
-from .utils.blocklist import BLOCKLIST
+from .utils.blocklist import token_blocklist
+from .utils.cache import user_identity_cache
+from .utils.response_cache import response_cache
+from .utils.routing import replica_router
+from .utils.instrumentation import instrumentation
+from .utils.passwords import password_hasher, PasswordHasherBusy
+from .utils.mail import mail_dispatcher
+from .utils.grading import grading_scales
+from .utils.startup import LazyFlask, LazyGroup
+from .utils.openapi import build_openapi_command
+from .utils.recompute import recompute_gpas_command
 from .models.user import User, Admin, Student, Lecturer
 from .models.course import Course, StudentCourse, Score
+from .models.token import RevokedToken
+from .models.transcript import StudentTranscript
+from .models.mail import OutboundEmail
+from .models.grading import GradingScale, GradingBand
 from flask_jwt_extended import JWTManager
 from werkzeug.exceptions import NotFound, MethodNotAllowed
 
-def create_app(config=config_dict['dev']):
-    app = Flask(__name__)
+def register_api(app):
+    """
+    Build the REST API and register its namespaces on the app.
 
-    app.config.from_object(config)
-
-    db.init_app(app)
-
-    jwt = JWTManager(app)
-
-    migrate = Migrate(app, db)
+    flask_restx and the views are imported here rather than with the
+    package, so a process that never builds the API (flask CLI commands,
+    a LAZY_API_REGISTRATION worker before its first request) never
+    imports them.
+    """
+    from flask_restx import Api
+    from .auth.views import auth_namespace
+    from .student.views import student_namespace
+    from .courses.views import courses_namespace
+    from .exports.views import exports_namespace
+    from .admin.views import admin_namespace
+    from .utils.openapi import init_spec
 
     authorizations = {
         'apikey': {
@@ -44,6 +59,64 @@ def create_app(config=config_dict['dev']):
     api.add_namespace(auth_namespace, path='/auth')
     api.add_namespace(student_namespace, path='/students')
     api.add_namespace(courses_namespace, path='/courses')
+    api.add_namespace(exports_namespace, path='/exports')
+    api.add_namespace(admin_namespace, path='/admin')
+
+    @api.errorhandler(PasswordHasherBusy)
+    def handle_password_hasher_busy(error):
+        return {'message': 'Too many sign-ins in progress, try again shortly'}, 503, {'Retry-After': '1'}
+
+    app.extensions['api'] = api
+
+    init_spec(app, api)
+
+    return api
+
+
+def load_migrate(app):
+    """
+    Set up Flask-Migrate and return its "flask db" command group.
+    """
+    from flask_migrate import Migrate
+
+    Migrate(app, db)
+    return app.cli.commands['db']
+
+
+def create_app(config=config_dict['dev']):
+    app = LazyFlask(__name__)
+
+    app.config.from_object(config)
+
+    db.init_app(app)
+
+    user_identity_cache.configure(app.config['USER_CACHE_MAXSIZE'], app.config['USER_CACHE_TTL'])
+
+    token_blocklist.init_app(app)
+
+    response_cache.init_app(app)
+
+    replica_router.init_app(app)
+
+    instrumentation.init_app(app)
+
+    password_hasher.init_app(app)
+
+    mail_dispatcher.init_app(app)
+
+    grading_scales.init_app(app)
+
+    jwt = JWTManager(app)
+
+    # Flask-Migrate imports alembic, only the "flask db" commands load it
+    app.cli.add_command(LazyGroup('db', partial(load_migrate, app), help='Perform database migrations.'))
+
+    app.cli.add_command(build_openapi_command)
+
+    if app.config.get('LAZY_API_REGISTRATION'):
+        app.defer(register_api)
+    else:
+        register_api(app)
 
     @app.errorhandler(NotFound)
     def handle_not_found(error):
@@ -55,7 +128,7 @@ def create_app(config=config_dict['dev']):
     
     @jwt.token_in_blocklist_loader
     def check_if_token_in_blocklist(jwt_header, jwt_payload):
-        return jwt_payload['jti'] in BLOCKLIST
+        return token_blocklist.is_revoked(jwt_payload['jti'])
     
     @jwt.revoked_token_loader
     def revoked_token_callback(jwt_header, jwt_payload):
@@ -92,6 +165,8 @@ def create_app(config=config_dict['dev']):
             'error': 'fresh_token_required'
         }, 401
 
+    app.cli.add_command(recompute_gpas_command)
+
     @app.shell_context_processor
     def make_shell_context():
         return {
@@ -102,7 +177,12 @@ def create_app(config=config_dict['dev']):
             'Lecturer': Lecturer,
             'Course': Course,
             'StudentCourse': StudentCourse,
-            'Score': Score
+            'Score': Score,
+            'RevokedToken': RevokedToken,
+            'StudentTranscript': StudentTranscript,
+            'OutboundEmail': OutboundEmail,
+            'GradingScale': GradingScale,
+            'GradingBand': GradingBand
         }
     
     return app
@@ -0,0 +1,175 @@
+import math
+from flask import request
+from flask_restx import Namespace, Resource, fields
+from http import HTTPStatus
+from sqlalchemy.exc import IntegrityError
+from ..models.grading import GradingScale, GradingBand
+from ..utils import db
+from ..utils.grading import grading_scales
+from ..utils.cache import user_identity_cache
+from ..utils.blocklist import token_blocklist
+from ..utils.response_cache import response_cache
+from ..utils.pool import pool_status
+from ..decorators import admin_required
+
+
+admin_namespace = Namespace('admin', description='Operational endpoints for admins')
+
+grading_band_field = admin_namespace.model('Grading Band Model', {
+    'min_score': fields.Float(required=True, description='Lowest score of the band'),
+    'letter': fields.String(required=True, description='Letter grade of the band'),
+    'gpa': fields.Float(required=True, description='Grade point of the band'),
+})
+
+grading_scale_field = admin_namespace.model('Grading Scale Model', {
+    'id': fields.Integer(),
+    'name': fields.String(required=True, description='Name of the scale, a new version is saved on every change'),
+    'version': fields.Integer(),
+    'is_active': fields.Boolean(description='Grade new scores with this scale'),
+    'created_at': fields.DateTime(),
+    'bands': fields.List(fields.Nested(grading_band_field), required=True),
+})
+
+
+@admin_namespace.route('/cache-stats')
+class CacheStats(Resource):
+    @admin_namespace.doc(
+        description="""
+            Only admin can access this endpoint
+            This returns the size and hit rate of the caches of the worker serving the request
+        """
+    )
+    @admin_required()
+    def get(self):
+        """
+            Get cache statistics
+        """
+        return {
+            'response_cache': response_cache.stats(),
+            'user_identity_cache': user_identity_cache.stats(),
+            'revoked_token_cache': token_blocklist.revoked_cache.stats(),
+            'not_revoked_token_cache': token_blocklist.not_revoked_cache.stats()
+        }, HTTPStatus.OK
+
+
+@admin_namespace.route('/pool-stats')
+class PoolStats(Resource):
+    @admin_namespace.doc(
+        description="""
+            Only admin can access this endpoint
+            This returns the state of the database connection pool of the worker serving the request,
+            with the time spent waiting for connections and the overflow reached so far
+        """
+    )
+    @admin_required()
+    def get(self):
+        """
+            Get database connection pool statistics
+        """
+        return pool_status(db.engine.pool), HTTPStatus.OK
+
+
+def parse_bands(bands):
+    """
+        Validate the bands of a new grading scale, returning (min_score, letter, gpa) tuples or an error message
+    """
+    if not isinstance(bands, list) or not bands:
+        return None, 'A grading scale needs at least one band'
+    parsed = []
+    for band in bands:
+        if not isinstance(band, dict):
+            return None, 'Every band must be an object'
+        try:
+            min_score = float(band.get('min_score'))
+            gpa = float(band.get('gpa'))
+        except (TypeError, ValueError):
+            return None, 'Every band needs a numeric min_score and gpa'
+        if not (math.isfinite(min_score) and math.isfinite(gpa)):
+            return None, 'Every band needs a finite min_score and gpa'
+        letter = band.get('letter')
+        if not isinstance(letter, str) or not 0 < len(letter) <= 5:
+            return None, 'Every band needs a letter of at most 5 characters'
+        parsed.append((min_score, letter, gpa))
+    if len({min_score for min_score, _, _ in parsed}) != len(parsed):
+        return None, 'Two bands have the same min_score'
+    if len({letter for _, letter, _ in parsed}) != len(parsed):
+        return None, 'Two bands have the same letter'
+    return parsed, None
+
+
+@admin_namespace.route('/grading-scales')
+class GradingScaleList(Resource):
+    @admin_namespace.marshal_list_with(grading_scale_field)
+    @admin_namespace.doc(
+        description="""
+            Only admin can access this endpoint
+            This returns every version of the grading scales, newest first
+        """
+    )
+    @admin_required()
+    def get(self):
+        """
+            List the grading scales
+        """
+        return GradingScale.query.order_by(GradingScale.id.desc()).all(), HTTPStatus.OK
+
+    @admin_namespace.expect(grading_scale_field)
+    @admin_namespace.response(HTTPStatus.CREATED, 'Created', grading_scale_field)
+    @admin_namespace.doc(
+        description="""
+            Only admin can access this endpoint
+            This saves the bands as the next version of the named scale,
+            with "is_active": true new scores are graded with it from now on
+        """
+    )
+    @admin_required()
+    def post(self):
+        """
+            Create a grading scale version
+        """
+        data = request.get_json(silent=True) or {}
+        name = data.get('name')
+        if not isinstance(name, str) or not 0 < len(name) <= 50:
+            return {'message': 'A grading scale needs a name of at most 50 characters'}, HTTPStatus.BAD_REQUEST
+        bands, error = parse_bands(data.get('bands'))
+        if error:
+            return {'message': error}, HTTPStatus.BAD_REQUEST
+
+        try:
+            scale = GradingScale(name=name, version=GradingScale.next_version(name), is_active=False)
+            scale.bands = [GradingBand(min_score=min_score, letter=letter, gpa=gpa) for min_score, letter, gpa in bands]
+            db.session.add(scale)
+            db.session.flush()
+            if data.get('is_active'):
+                scale.activate()
+            scale.save()
+        except IntegrityError:
+            # another request saved the same version of this scale first
+            db.session.rollback()
+            return {'message': 'A new version of this grading scale was just created, try again'}, HTTPStatus.CONFLICT
+        grading_scales.invalidate()
+        return admin_namespace.marshal(scale, grading_scale_field), HTTPStatus.CREATED
+
+
+@admin_namespace.route('/grading-scales/<int:scale_id>/activate')
+class ActivateGradingScale(Resource):
+    @admin_namespace.response(HTTPStatus.OK, 'Success', grading_scale_field)
+    @admin_namespace.doc(
+        description="""
+            Only admin can access this endpoint
+            This grades new scores with the scale version, existing scores keep their grades
+            until they are recomputed
+        """
+    )
+    @admin_required()
+    def put(self, scale_id):
+        """
+            Activate a grading scale version
+        """
+        scale = db.session.get(GradingScale, scale_id)
+        if not scale:
+            return {'message': 'Grading scale not found'}, HTTPStatus.NOT_FOUND
+        scale.activate()
+        scale.save()
+        grading_scales.invalidate()
+        return admin_namespace.marshal(scale, grading_scale_field), HTTPStatus.OK
@@ -0,0 +1,195 @@
+import asyncio
+import io
+import time
+from http import HTTPStatus
+from a2wsgi import WSGIMiddleware
+from a2wsgi.wsgi import build_environ
+from flask import current_app, request
+from flask_jwt_extended import decode_token
+from werkzeug.exceptions import HTTPException
+from . import create_app
+from .config.config import config_dict
+from .courses.views import course_retrieve_model, course_list_filters
+from .models.course import Course
+from .models.token import RevokedToken
+from .utils import db
+from .utils.async_db import async_db
+from .utils.blocklist import token_blocklist, SQLRevocationStore
+from .utils.conditional import weak_etag, is_not_modified, set_validators
+from .utils.instrumentation import instrumentation
+from .utils.pagination import get_limit, get_fields, decode_cursor, encode_cursor, page_response
+from .utils.routing import replica_router
+from .utils.serializers import get_serializer, json_response, projected_columns
+
+
+async def course_list(session):
+    """
+    GET /courses/ on the asyncio engine, same responses as CourseList.get
+    """
+    limit = get_limit()
+    fields = get_fields(course_retrieve_model)
+    filters = course_list_filters()
+
+    count, last_updated = (await session.execute(
+        db.select(db.func.count(Course.id), db.func.max(Course.updated_at)).where(*filters)
+    )).one()
+    etag = weak_etag(request.full_path, count, last_updated)
+    if is_not_modified(etag):
+        return set_validators(current_app.response_class(status=HTTPStatus.NOT_MODIFIED), etag)
+
+    statement = db.select(*projected_columns(Course, fields)).where(*filters)
+    cursor = request.args.get('cursor')
+    if cursor:
+        statement = statement.where(Course.id > decode_cursor(cursor))
+    rows = (await session.execute(statement.order_by(Course.id).limit(limit + 1))).all()
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(rows[-1].id)
+    return set_validators(page_response(rows, course_retrieve_model, fields, next_cursor), etag)
+
+
+async def course_detail(session, course_id):
+    """
+    GET /courses/<course_id> on the asyncio engine, same responses as GetDeleteCourse.get
+    """
+    version = (await session.execute(
+        db.select(Course.updated_at).filter_by(id=course_id)
+    )).first()
+    if not version:
+        return json_response({'message': 'Course not found'}, HTTPStatus.NOT_FOUND)
+
+    etag = weak_etag('course', course_id, version.updated_at)
+    if is_not_modified(etag, version.updated_at):
+        response = current_app.response_class(status=HTTPStatus.NOT_MODIFIED)
+    else:
+        course = (await session.execute(
+            db.select(*projected_columns(Course, course_retrieve_model.keys())).filter_by(id=course_id)
+        )).one()
+        response = json_response(get_serializer(course_retrieve_model).one(course), HTTPStatus.OK)
+    return set_validators(response, etag, version.updated_at)
+
+
+# endpoints served on the event loop, everything else goes to the WSGI app
+ASYNC_HANDLERS = {
+    'courses_course_list': course_list,
+    'courses_get_delete_course': course_detail,
+}
+
+
+class AsyncApp:
+    """
+    Serves the API over ASGI, with the hot catalog reads on the event loop.
+
+    GET requests to the endpoints of ASYNC_HANDLERS are answered by
+    coroutines that query through the asyncio engine, so a process keeps
+    serving other requests while those queries wait on the database. They
+    run inside a Flask request context and reuse the view helpers, so the
+    responses, ETags and pagination links are the ones of the sync views.
+
+    Every other request, and any hot read whose token is missing, invalid,
+    expired or revoked, is handed to the unchanged Flask app running on a
+    pool of ASGI_WSGI_THREADS threads, which also produces the usual error
+    responses. The response cache is not consulted on the event loop: these
+    reads are cheap on the async engine and never block the process.
+    """
+
+    def __init__(self, app):
+        self.app = app
+        # the hot reads are matched against the url map before any request context exists
+        app.ensure_setup()
+        self.wsgi = WSGIMiddleware(app, workers=app.config['ASGI_WSGI_THREADS'])
+        async_db.init_app(app)
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            return await self.lifespan(receive, send)
+        if scope['type'] == 'http' and scope['method'] == 'GET':
+            response = await self.handle(scope)
+            if response is not None:
+                return await self.send_response(response, send)
+        return await self.wsgi(scope, receive, send)
+
+    async def handle(self, scope):
+        """
+        Answer a GET on the event loop, None when the WSGI app has to answer it.
+        """
+        environ = build_environ(scope, io.BytesIO())
+        try:
+            endpoint, args = self.app.url_map.bind_to_environ(environ).match()
+        except HTTPException:
+            return None
+        handler = ASYNC_HANDLERS.get(endpoint)
+        if handler is None:
+            return None
+        claims = await self.authenticate(environ)
+        if claims is None:
+            return None
+
+        start = time.perf_counter()
+        bind = None
+        if async_db.has_replica and not await asyncio.to_thread(replica_router.is_sticky, claims['sub']):
+            bind = 'replica'
+        with self.app.request_context(environ):
+            try:
+                async with async_db.session(bind) as session:
+                    response = await handler(session, **args)
+            except HTTPException:
+                # bad query arguments, let the WSGI app produce the error
+                return None
+            self.record(endpoint, response, time.perf_counter() - start)
+        return response
+
+    async def authenticate(self, environ):
+        """
+        Return the claims of a valid, unrevoked access token, or None.
+        """
+        header = environ.get('HTTP_AUTHORIZATION', '')
+        if not header.startswith('Bearer '):
+            return None
+        try:
+            with self.app.app_context():
+                claims = decode_token(header[len('Bearer '):])
+        except Exception:
+            # whatever is wrong with the token, the WSGI app answers with its usual error
+            return None
+        if claims.get('type') != 'access' or await self.is_revoked(claims['jti']):
+            return None
+        return claims
+
+    async def is_revoked(self, jti):
+        revoked = token_blocklist.cached(jti)
+        if revoked is not None:
+            return revoked
+        if isinstance(token_blocklist.store, SQLRevocationStore):
+            # always ask the primary, a lagging replica would accept a token just revoked
+            async with async_db.session() as session:
+                row = (await session.execute(db.select(RevokedToken.id).filter_by(jti=jti))).first()
+            return token_blocklist.remember(jti, row is not None)
+        return await asyncio.to_thread(token_blocklist.is_revoked, jti)
+
+    def record(self, endpoint, response, duration):
+        if not instrumentation.enabled:
+            return
+        instrumentation.registry.inc('http_requests_total', {'method': 'GET', 'endpoint': endpoint, 'status': response.status_code})
+        instrumentation.registry.observe('http_request_duration_seconds', {'method': 'GET', 'endpoint': endpoint}, duration)
+
+    async def send_response(self, response, send):
+        body = response.get_data()
+        headers = [(name.lower().encode('latin1'), value.encode('latin1')) for name, value in response.headers.items()]
+        await send({'type': 'http.response.start', 'status': response.status_code, 'headers': headers})
+        await send({'type': 'http.response.body', 'body': body})
+
+    async def lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                await async_db.dispose()
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+
+def create_asgi_app(config=config_dict['dev']):
+    return AsyncApp(create_app(config=config))
@@ -3,12 +3,12 @@ from flask import request
 from flask_restx import Namespace, Resource
 from ..models.user import User, Student, Admin, Lecturer
 from ..utils import db, generate_random_string, send_email, generate_reset_token
-from ..utils.blocklist import BLOCKLIST
-from werkzeug.security import generate_password_hash, check_password_hash
+from ..utils.blocklist import token_blocklist
+from ..utils.passwords import password_hasher
 from http import HTTPStatus
 from flask_jwt_extended import create_access_token, create_refresh_token, jwt_required, get_jwt_identity, get_jwt
 from .serializers_utils import login_field, password_reset_field, pasword_reset_request_field, signup_field, lecturer_signup_field
-from ..decorators import admin_required
+from ..decorators import admin_required, role_claims
 
 auth_namespace = Namespace('auth', description="Namespace for Authentication")
 
@@ -62,7 +62,7 @@ class SignUp(Resource):
                 email = data.get('email'),
                 name = data.get('name'),
                 username=username,
-                password_hash = generate_password_hash(data.get('password')),
+                password_hash = password_hasher.hash(data.get('password')),
                 matric_no = admission,
                 user_type = 'student'
             )
@@ -72,7 +72,7 @@ class SignUp(Resource):
                 email = data.get('email'),
                 name = data.get('name'),
                 username=username,
-                password_hash = generate_password_hash(data.get('password')),
+                password_hash = password_hasher.hash(data.get('password')),
                 nomination=nomination,
                 user_type = 'admin',
                 is_admin=True
@@ -125,7 +125,7 @@ class SignUpLecturer(Resource):
             email = data.get('email'),
             name = data.get('name'),
             username=username,
-            password_hash = generate_password_hash(data.get('password')),
+            password_hash = password_hasher.hash(data.get('password')),
             staff_no = staff,
             user_type = 'lecturer'
         )
@@ -162,13 +162,19 @@ class Login(Resource):
 
         user = User.query.filter_by(email=email).first()
 
-        if not user or not check_password_hash(user.password_hash, password):
+        if not user or not password_hasher.verify(user.password_hash, password):
             return {
                 'message': 'Invalid email or password'
             }, HTTPStatus.UNAUTHORIZED
+
+        # upgrade hashes made with an older algorithm or cost while the password is at hand
+        if password_hasher.needs_rehash(user.password_hash):
+            user.password_hash = password_hasher.hash(password)
+            db.session.commit()
         
-        access_token = create_access_token(identity=user.id)
-        refresh_token = create_refresh_token(identity=user.id)
+        claims = role_claims(user)
+        access_token = create_access_token(identity=user.id, additional_claims=claims)
+        refresh_token = create_refresh_token(identity=user.id, additional_claims=claims)
 
         response = {
             'message': 'Login Successful',
@@ -192,9 +198,16 @@ class Refresh(Resource):
         """
             Generate Refresh Token
         """
-        username = get_jwt_identity()
+        user_id = get_jwt_identity()
+
+        # re-read the role so a refreshed token always carries the current one
+        user = User.query.filter_by(id=user_id).first()
+        if not user:
+            return {
+                'message': 'User does not exist'
+            }, HTTPStatus.UNAUTHORIZED
 
-        access_token = create_access_token(identity=username)
+        access_token = create_access_token(identity=user.id, additional_claims=role_claims(user))
 
         return {
             "access_token": access_token
@@ -215,10 +228,7 @@ class Logout(Resource):
             Log the User Out by revoking Access/refresh token
         """
         token = get_jwt()
-        jti = token['jti']
-        token_type = token['type']
-        # user_identity = get_jwt_identity()
-        BLOCKLIST.add(jti)
+        token_blocklist.revoke(token)
 
         return {
             'message': 'Successfully logged out and token revoked successfully.'
@@ -287,7 +297,7 @@ class PasswordReset(Resource):
             }, HTTPStatus.BAD_REQUEST
 
         if password == confirm_password:
-            hashed_password = generate_password_hash(confirm_password)
+            hashed_password = password_hasher.hash(confirm_password)
             user.password_hash = hashed_password
             user.password_reset_token = None
             db.session.commit()
@@ -1,6 +1,7 @@
 import os
 from  decouple import config
 from datetime import timedelta
+from ..utils.pool import InstrumentedQueuePool
 
 BASE_DIR = os.path.dirname(os.path.realpath(__file__))
 
@@ -10,28 +11,158 @@ uri = os.getenv('DATABASE_URL', default_uri) # or other relevant config var
 if uri.startswith('postgres://'):
     uri = uri.replace('postgres://', 'postgresql://', 1)
 
+# optional read replica, GET requests of the student and course endpoints read from it
+replica_uri = os.getenv('DATABASE_REPLICA_URL', '')
+if replica_uri.startswith('postgres://'):
+    replica_uri = replica_uri.replace('postgres://', 'postgresql://', 1)
+
 class Config:
     SECRET_KEY = config('SECRET_KEY', 'secret')
     JWT_ACCESS_TOKEN_EXPIRES = timedelta(minutes=30)
     JWT_REFRESH_TOKEN_EXPIRES = timedelta(days=30)
     JWT_SECRET_KEY = config('JWT_SECRET_KEY')
+    # compare the role_version claim against the user row on guarded routes, the row is read
+    # through the user identity cache below, so other workers see a role change within USER_CACHE_TTL.
+    # Turning it off skips the lookup, a changed role then lasts until the token expires
+    JWT_ROLE_VERSION_CHECK = config('JWT_ROLE_VERSION_CHECK', True, cast=bool)
+    # process-local user identity cache, the ttl bounds how long other workers
+    # may keep serving a role that was changed elsewhere
+    USER_CACHE_MAXSIZE = config('USER_CACHE_MAXSIZE', 2048, cast=int)
+    USER_CACHE_TTL = config('USER_CACHE_TTL', 60, cast=int)
+    # token revocation: 'sql' uses the revoked_tokens table, 'kv' a redis server
+    # at REVOCATION_KV_URL (or an in-process stand-in when the url is empty)
+    REVOCATION_BACKEND = config('REVOCATION_BACKEND', 'sql')
+    REVOCATION_KV_URL = config('REVOCATION_KV_URL', '')
+    REVOCATION_CACHE_MAXSIZE = config('REVOCATION_CACHE_MAXSIZE', 10000, cast=int)
+    REVOCATION_POSITIVE_TTL = config('REVOCATION_POSITIVE_TTL', 3600, cast=int)
+    REVOCATION_NEGATIVE_TTL = config('REVOCATION_NEGATIVE_TTL', 5, cast=int)
+    REVOCATION_PURGE_INTERVAL = config('REVOCATION_PURGE_INTERVAL', 3600, cast=int)
+    # course catalog response cache: 'local' keeps entries and tag versions per worker, so
+    # writes on other workers are only seen once entries expire, 'kv' shares both through
+    # the redis server at RESPONSE_CACHE_KV_URL (or an in-process stand-in when the url is empty)
+    RESPONSE_CACHE_ENABLED = config('RESPONSE_CACHE_ENABLED', True, cast=bool)
+    RESPONSE_CACHE_BACKEND = config('RESPONSE_CACHE_BACKEND', 'local')
+    RESPONSE_CACHE_KV_URL = config('RESPONSE_CACHE_KV_URL', '')
+    RESPONSE_CACHE_MAXSIZE = config('RESPONSE_CACHE_MAXSIZE', 1024, cast=int)
+    RESPONSE_CACHE_TTL = config('RESPONSE_CACHE_TTL', 60, cast=int)
+    # after writing, a user reads from the primary for this many seconds so the replica can
+    # catch up, recent writers are shared through REPLICA_STICKY_KV_URL or kept per process
+    READ_YOUR_WRITES_WINDOW = config('READ_YOUR_WRITES_WINDOW', 5, cast=int)
+    REPLICA_STICKY_KV_URL = config('REPLICA_STICKY_KV_URL', '')
+    # per-request timing and SQL accounting, logged as JSON and served at /metrics
+    INSTRUMENTATION_ENABLED = config('INSTRUMENTATION_ENABLED', True, cast=bool)
+    METRICS_ENABLED = config('METRICS_ENABLED', True, cast=bool)
+    # bearer token scrapers send to /metrics, the endpoint is not served while it is empty
+    METRICS_TOKEN = config('METRICS_TOKEN', '')
+    # warn about a possible N+1 when one statement shape runs this many times in a request
+    SQL_REPEAT_THRESHOLD = config('SQL_REPEAT_THRESHOLD', 10, cast=int)
+    # fraction of requests run under cProfile, profiles go to PROFILE_DIR or the log
+    PROFILE_SAMPLE_RATE = config('PROFILE_SAMPLE_RATE', 0.0, cast=float)
+    PROFILE_DIR = config('PROFILE_DIR', '')
+    # werkzeug method string, algorithm and cost, older hashes are upgraded on login
+    PASSWORD_HASH_METHOD = config('PASSWORD_HASH_METHOD', 'pbkdf2:sha256:260000')
+    PASSWORD_SALT_LENGTH = config('PASSWORD_SALT_LENGTH', 16, cast=int)
+    # hashing processes per uwsgi worker (0 hashes inline), plus how many more operations may
+    # queue for them and for how long before the request is refused with 503. Off by default:
+    # uwsgi.ini runs one request thread per worker, which waits for its hash either way
+    PASSWORD_HASH_WORKERS = config('PASSWORD_HASH_WORKERS', 0, cast=int)
+    PASSWORD_HASH_MAX_PENDING = config('PASSWORD_HASH_MAX_PENDING', 16, cast=int)
+    PASSWORD_HASH_QUEUE_TIMEOUT = config('PASSWORD_HASH_QUEUE_TIMEOUT', 5, cast=float)
+    PASSWORD_HASH_START_METHOD = config('PASSWORD_HASH_START_METHOD', 'spawn')
+    # python interpreter the hashing processes start with, under uwsgi sys.executable is uwsgi itself
+    PASSWORD_HASH_PYTHON = config('PASSWORD_HASH_PYTHON', '')
+    PAGINATION_DEFAULT_LIMIT = config('PAGINATION_DEFAULT_LIMIT', 50, cast=int)
+    PAGINATION_MAX_LIMIT = config('PAGINATION_MAX_LIMIT', 500, cast=int)
+    # rows per statement of the bulk upload endpoints, below SQLite's bound parameter limit
+    BULK_BATCH_SIZE = config('BULK_BATCH_SIZE', 500, cast=int)
+    # sent with the ETag of cacheable GETs, clients must revalidate before reusing a response
+    HTTP_CACHE_CONTROL = config('HTTP_CACHE_CONTROL', 'private, no-cache')
+    # Swagger document prebuilt by "flask build-openapi", generated live instead only in DevConfig
+    # when the artifact is missing
+    OPENAPI_ARTIFACT_DIR = config('OPENAPI_ARTIFACT_DIR', os.path.join(os.path.dirname(BASE_DIR), 'openapi'))
+    OPENAPI_LIVE_FALLBACK = False
+    OPENAPI_CACHE_CONTROL = config('OPENAPI_CACHE_CONTROL', 'public, no-cache')
+    # build the API routes on the first request instead of in create_app. Only worth it for
+    # processes that may never serve a request (flask commands, tests), a serving worker
+    # just pays the same time on its first request
+    LAZY_API_REGISTRATION = config('LAZY_API_REGISTRATION', False, cast=bool)
+    # seconds a worker keeps the active grading scale before reading it again
+    GRADING_SCALE_CACHE_TTL = config('GRADING_SCALE_CACHE_TTL', 60, cast=int)
+    # rows fetched per round trip by the streaming exports
+    EXPORT_CHUNK_SIZE = config('EXPORT_CHUNK_SIZE', 1000, cast=int)
+    # ASGI mode (asgi.py): the hot catalog GETs are served on the event loop through the asyncio
+    # engine, other requests run the WSGI app on ASGI_WSGI_THREADS threads per server process
+    ASYNC_DATABASE_URL = config('ASYNC_DATABASE_URL', '')
+    ASYNC_DATABASE_REPLICA_URL = config('ASYNC_DATABASE_REPLICA_URL', '')
+    ASYNC_DB_POOL_SIZE = config('ASYNC_DB_POOL_SIZE', 10, cast=int)
+    ASYNC_DB_MAX_OVERFLOW = config('ASYNC_DB_MAX_OVERFLOW', 10, cast=int)
+    ASGI_WSGI_THREADS = config('ASGI_WSGI_THREADS', 20, cast=int)
+    MAIL_SERVER = config('MAIL_SERVER', 'smtp.gmail.com')
+    MAIL_PORT = config('MAIL_PORT', 587, cast=int)
+    MAIL_USE_TLS = config('MAIL_USE_TLS', True, cast=bool)
+    # set in the environment, without them emails stay in the outbox
+    MAIL_USERNAME = config('MAIL_USERNAME', '')
+    MAIL_PASSWORD = config('MAIL_PASSWORD', '')
+    MAIL_DEFAULT_SENDER = config('MAIL_DEFAULT_SENDER', MAIL_USERNAME)
+    # background outbox dispatcher, only started once MAIL_USERNAME and MAIL_PASSWORD are set
+    MAIL_DISPATCH_ENABLED = config('MAIL_DISPATCH_ENABLED', True, cast=bool)
+    MAIL_WORKERS = config('MAIL_WORKERS', 2, cast=int)
+    MAIL_POOL_SIZE = config('MAIL_POOL_SIZE', 2, cast=int)
+    MAIL_BATCH_SIZE = config('MAIL_BATCH_SIZE', 20, cast=int)
+    MAIL_MAX_ATTEMPTS = config('MAIL_MAX_ATTEMPTS', 5, cast=int)
+    MAIL_RETRY_BACKOFF = config('MAIL_RETRY_BACKOFF', 30, cast=int)
+    MAIL_POLL_INTERVAL = config('MAIL_POLL_INTERVAL', 10, cast=int)
+    MAIL_CLAIM_LEASE = config('MAIL_CLAIM_LEASE', 300, cast=int)
     
 class DevConfig(Config):
     DEBUG = True
+    OPENAPI_LIVE_FALLBACK = True
     SQLALCHEMY_TRACK_MODIFICATIONS = False
-    SQLALCHEMY_ECHO = True
+    # the request log already reports query counts and timings, echo prints every statement
+    SQLALCHEMY_ECHO = config('SQLALCHEMY_ECHO', False, cast=bool)
     SQLALCHEMY_DATABASE_URI = 'sqlite:///' + os.path.join(BASE_DIR, 'db.sqlite3')
+    SQLALCHEMY_ENGINE_OPTIONS = {
+        'poolclass': InstrumentedQueuePool,
+        'pool_size': config('DB_POOL_SIZE', 5, cast=int),
+        'max_overflow': config('DB_MAX_OVERFLOW', 10, cast=int),
+        'pool_timeout': config('DB_POOL_TIMEOUT', 30, cast=int),
+    }
 
 class TestConfig(Config):
     TESTING = True
+    # tests send the outbox explicitly
+    MAIL_DISPATCH_ENABLED = False
+    # cheap hashes, inline
+    PASSWORD_HASH_METHOD = 'pbkdf2:sha256:1000'
+    PASSWORD_HASH_WORKERS = 0
+    METRICS_TOKEN = 'test-metrics-token'
+    LAZY_API_REGISTRATION = True
     SQLALCHEMY_TRACK_MODIFICATIONS = False
     SQLALCHEMY_ECHO = True
     SQLALCHEMY_DATABASE_URI = 'sqlite://'
 
 class ProdConfig(Config):
     SQLALCHEMY_DATABASE_URI = uri
+    # the replica engine gets the same SQLALCHEMY_ENGINE_OPTIONS as the primary
+    SQLALCHEMY_BINDS = {'replica': replica_uri} if replica_uri else {}
     SQLALCHEMY_TRACK_MODIFICATIONS = False
     DEBUG = config('DEBUG', False, cast=bool)
+    DB_STATEMENT_TIMEOUT_MS = config('DB_STATEMENT_TIMEOUT_MS', 30000, cast=int)
+    # every uwsgi process opens up to pool_size + max_overflow connections, keep
+    # processes * (DB_POOL_SIZE + DB_MAX_OVERFLOW) below the server's max_connections
+    SQLALCHEMY_ENGINE_OPTIONS = {
+        'poolclass': InstrumentedQueuePool,
+        'pool_size': config('DB_POOL_SIZE', 5, cast=int),
+        'max_overflow': config('DB_MAX_OVERFLOW', 5, cast=int),
+        # seconds to wait for a free connection before failing the request
+        'pool_timeout': config('DB_POOL_TIMEOUT', 10, cast=int),
+        # replace connections before idle timeouts on the server or proxies close them
+        'pool_recycle': config('DB_POOL_RECYCLE', 1800, cast=int),
+        'pool_pre_ping': config('DB_POOL_PRE_PING', True, cast=bool),
+        'connect_args': {
+            'options': '-c statement_timeout={}'.format(DB_STATEMENT_TIMEOUT_MS)
+        },
+    }
 
 config_dict = {
     'dev': DevConfig,
@@ -1,16 +1,21 @@
-from flask import request
-from flask_restx import Resource, Namespace
+from flask import current_app, request
+from flask_restx import Resource, Namespace, abort
 from flask_jwt_extended import jwt_required
 from ..models.user import Lecturer, Student
 from ..models.course import Course, StudentCourse
 from ..utils import db
+from ..utils.serializers import get_serializer, json_response, projected_columns
+from ..utils.pagination import get_limit, get_fields, get_datetime_arg, keyset_paginate, page_response
+from ..utils.conditional import weak_etag, conditional_response
+from ..utils.routing import replica_router
+from ..utils.response_cache import response_cache
 from http import HTTPStatus
 from ..utils import generate_random_string
-from ..student.serializers_utils import student_model, course_retrieve_model, create_course_model, student_register_for_course_model, course_lecturer_model, course_model
-from ..decorators import admin_required, lecturer_required, admin_or_lecturer_required
+from ..student.serializers_utils import student_model, course_retrieve_model, create_course_model, student_register_for_course_model, course_lecturer_model, course_model, bulk_student_course_model
+from ..decorators import admin_required, lecturer_required, admin_or_lecturer_required, is_course_lecturer
 
 
-courses_namespace = Namespace('courses', description="Namespace for course")
+courses_namespace = Namespace('courses', description="Namespace for course", decorators=[replica_router.route_reads])
 
 create_course_field = courses_namespace.model('Course Creation', create_course_model)
 
@@ -24,22 +29,66 @@ student_field = courses_namespace.model('Student Model', student_model)
 
 student_course_field = courses_namespace.model("Course List Model", course_model)
 
+bulk_student_course_field = courses_namespace.model("Bulk Course Registration Model", bulk_student_course_model)
+
+
+def course_list_filters():
+    """
+    Build the filters of the course list from the query string.
+    """
+    filters = []
+    lecturer_id = request.args.get('lecturer_id', type=int)
+    if lecturer_id:
+        filters.append(Course.lecturer_id == lecturer_id)
+    created_after = get_datetime_arg('created_after')
+    if created_after:
+        filters.append(Course.created_at >= created_after)
+    created_before = get_datetime_arg('created_before')
+    if created_before:
+        filters.append(Course.created_at < created_before)
+    return filters
+
 
 @courses_namespace.route('/')
 class CourseList(Resource):
-    @courses_namespace.marshal_with(course_retrieve_model)
+    @courses_namespace.response(HTTPStatus.OK, 'Success', [course_retrieve_model])
     @courses_namespace.doc(
         description="""
             Every user can access this endpoint
-            This returns all the courses available
-        """
+            This returns the courses available, one page at a time
+            The next page is linked in the Link and X-Next-Cursor headers
+            Send the ETag back in If-None-Match to get a 304 when the page has not changed
+        """,
+        params={
+            'limit': 'Page size',
+            'cursor': 'Cursor of the next page',
+            'fields': 'Comma separated list of fields to return',
+            'lecturer_id': 'Only courses taught by this lecturer',
+            'created_after': 'Only courses created at or after this ISO 8601 datetime',
+            'created_before': 'Only courses created before this ISO 8601 datetime'
+        }
     )
     @jwt_required()
+    @response_cache.cached('courses')
     def get(self):
         """List all courses available"""
 
-        courses = Course.query.all()
-        return courses, HTTPStatus.OK
+        limit = get_limit()
+        fields = get_fields(course_retrieve_model)
+        filters = course_list_filters()
+
+        # any insert, update or delete in the filtered set changes the count or the latest update
+        count, last_updated = db.session.execute(
+            db.select(db.func.count(Course.id), db.func.max(Course.updated_at)).where(*filters)
+        ).one()
+        etag = weak_etag(request.full_path, count, last_updated)
+
+        def build():
+            query = db.session.query(*projected_columns(Course, fields)).filter(*filters)
+            courses, next_cursor = keyset_paginate(query, Course.id, limit)
+            return page_response(courses, course_retrieve_model, fields, next_cursor)
+
+        return conditional_response(etag, None, build)
 
 
     @courses_namespace.expect(create_course_field)
@@ -65,6 +114,8 @@ class CourseList(Resource):
                 course_code=code,
                 lecturer_id=lecturer.id,
                 name=data.get('name'),
+                credit_units=data.get('credit_units') or 3,
+                term=data.get('term'),
             )
             try:
                 course.save()
@@ -78,21 +129,30 @@ class CourseList(Resource):
 
 @courses_namespace.route('/<int:course_id>')
 class GetDeleteCourse(Resource):
-    @courses_namespace.marshal_with(course_retrieve_model)
+    @courses_namespace.response(HTTPStatus.OK, 'Success', course_retrieve_model)
     @courses_namespace.doc(
         description="""
             Every user can access this endpoint
             This returns a course by id
+            Send the ETag back in If-None-Match to get a 304 when the course has not changed
         """
     )
     @jwt_required()
+    @response_cache.cached('course:{course_id}')
     def get(self, course_id):
         """Get a course by ID"""
-        course = Course.get_by_id(course_id)
-        if not course:
+        version = db.session.execute(
+            db.select(Course.updated_at).filter_by(id=course_id)
+        ).first()
+        if not version:
             return {'message': 'Course not found'}, HTTPStatus.NOT_FOUND
-        else:
-            return course, HTTPStatus.OK
+
+        def build():
+            course = db.session.get(Course, course_id)
+            return json_response(get_serializer(course_retrieve_model).one(course), HTTPStatus.OK)
+
+        etag = weak_etag('course', course_id, version.updated_at)
+        return conditional_response(etag, version.updated_at, build)
 
     @courses_namespace.doc(
         description="""
@@ -117,7 +177,7 @@ class GetDeleteCourse(Resource):
 
 @courses_namespace.route('/<int:course_id>/students')
 class CourseStudents(Resource):
-    @courses_namespace.marshal_with(student_field)
+    @courses_namespace.response(HTTPStatus.OK, 'Success', [student_field])
     @courses_namespace.doc(
         description="""
             Only admin and lecturers can access this endpoint
@@ -125,14 +185,18 @@ class CourseStudents(Resource):
         """
     )
     @admin_or_lecturer_required()
+    @response_cache.cached('course:{course_id}', 'enrollment:{course_id}', 'students')
     def get(self, course_id):
         """
             List all registered students in a course
         """
 
-        course = Course.get_by_id(course_id)
-        get_course_student = StudentCourse.get_students_in_course_by(course.id)
-        return get_course_student, HTTPStatus.OK
+        if not Course.exists(course_id):
+            return {'message': 'Not Found'}, HTTPStatus.NOT_FOUND
+
+        columns = projected_columns(Student, student_field.keys())
+        get_course_student = StudentCourse.get_student_rows_in_course(course_id, columns)
+        return json_response(get_serializer(student_field).many(get_course_student), HTTPStatus.OK)
     
 
 @courses_namespace.route('/addcourse/<int:course_id>')
@@ -204,3 +268,126 @@ class AddDeleteCourse(Resource):
                 return {
                     'message': "{} removed from the {} course".format(student.name, course.name)
                 }, HTTPStatus.OK
+
+
+def resolve_students(data):
+    """
+        Resolve the student ids and matric numbers of a bulk request with a single IN query
+
+        Returns:
+            (student_ids, not_found) where not_found lists the unknown ids and matric numbers
+    """
+    if not isinstance(data, dict):
+        abort(HTTPStatus.BAD_REQUEST, 'Expected a JSON object')
+    requested_ids = data.get('student_ids') or []
+    requested_matric_nos = data.get('matric_nos') or []
+    if not isinstance(requested_ids, list) or not all(
+        # true and false are ints to isinstance
+        isinstance(student_id, int) and not isinstance(student_id, bool) for student_id in requested_ids
+    ):
+        abort(HTTPStatus.BAD_REQUEST, 'student_ids must be a list of integers')
+    if not isinstance(requested_matric_nos, list) or not all(isinstance(matric_no, str) for matric_no in requested_matric_nos):
+        abort(HTTPStatus.BAD_REQUEST, 'matric_nos must be a list of strings')
+    requested_ids = list(dict.fromkeys(requested_ids))
+    requested_matric_nos = list(dict.fromkeys(requested_matric_nos))
+
+    found = {}
+    batch_size = current_app.config['BULK_BATCH_SIZE']
+    for start in range(0, max(len(requested_ids), len(requested_matric_nos)), batch_size):
+        rows = db.session.execute(
+            db.select(Student.id, Student.matric_no).where(db.or_(
+                Student.id.in_(requested_ids[start:start + batch_size]),
+                Student.matric_no.in_(requested_matric_nos[start:start + batch_size])
+            ))
+        )
+        for row in rows:
+            found[row.id] = row.matric_no
+
+    found_matric_nos = set(found.values())
+    not_found = {
+        'student_ids': [student_id for student_id in requested_ids if student_id not in found],
+        'matric_nos': [matric_no for matric_no in requested_matric_nos if matric_no not in found_matric_nos]
+    }
+    return sorted(found), not_found
+
+
+@courses_namespace.route('/addcourse/<int:course_id>/bulk')
+class BulkAddDeleteCourse(Resource):
+    @courses_namespace.expect(bulk_student_course_field)
+    @courses_namespace.doc(
+        description="""
+            Only lecturer can access this endpoint
+            It allows a lecturer to add many students to their course at once,
+            by student id and/or matric number. Students already registered are skipped.
+        """
+    )
+    @lecturer_required()
+    def post(self, course_id):
+        """
+            Register many Students to a course
+        """
+        course = Course.query.filter_by(id=course_id).first()
+        if not course:
+            return {'message': 'Course not found'}, HTTPStatus.NOT_FOUND
+        if not is_course_lecturer(course):
+            return {'message': 'Only the lecturer of this course can change its students'}, HTTPStatus.FORBIDDEN
+
+        student_ids, not_found = resolve_students(request.get_json(silent=True))
+        enrolled, already_enrolled = [], []
+        batch_size = current_app.config['BULK_BATCH_SIZE']
+        try:
+            for start in range(0, len(student_ids), batch_size):
+                new, existing = StudentCourse.bulk_enroll(course.id, student_ids[start:start + batch_size])
+                enrolled += new
+                already_enrolled += existing
+            db.session.commit()
+            response_cache.invalidate(f'enrollment:{course.id}')
+        except:
+            db.session.rollback()
+            return {'message': 'An error occurred while registering the students'}, HTTPStatus.INTERNAL_SERVER_ERROR
+
+        return {
+            'message': "{} students registered for the {} course".format(len(enrolled), course.name),
+            'enrolled': enrolled,
+            'already_enrolled': already_enrolled,
+            'not_found': not_found
+        }, HTTPStatus.CREATED if enrolled else HTTPStatus.OK
+
+    @courses_namespace.expect(bulk_student_course_field)
+    @courses_namespace.doc(
+        description="""
+            Only lecturer can access this endpoint
+            It allows a lecturer to remove many students from their course at once
+        """
+    )
+    @lecturer_required()
+    def delete(self, course_id):
+        """
+            Delete many Students from a course
+        """
+        course = Course.query.filter_by(id=course_id).first()
+        if not course:
+            return {'message': 'Course not found'}, HTTPStatus.NOT_FOUND
+        if not is_course_lecturer(course):
+            return {'message': 'Only the lecturer of this course can change its students'}, HTTPStatus.FORBIDDEN
+
+        student_ids, not_found = resolve_students(request.get_json(silent=True))
+        removed, not_enrolled = [], []
+        batch_size = current_app.config['BULK_BATCH_SIZE']
+        try:
+            for start in range(0, len(student_ids), batch_size):
+                gone, missing = StudentCourse.bulk_unenroll(course.id, student_ids[start:start + batch_size])
+                removed += gone
+                not_enrolled += missing
+            db.session.commit()
+            response_cache.invalidate(f'enrollment:{course.id}')
+        except:
+            db.session.rollback()
+            return {'message': 'An error occurred while removing the students'}, HTTPStatus.INTERNAL_SERVER_ERROR
+
+        return {
+            'message': "{} students removed from the {} course".format(len(removed), course.name),
+            'removed': removed,
+            'not_enrolled': not_enrolled,
+            'not_found': not_found
+        }, HTTPStatus.OK
@@ -1,95 +1,176 @@
-from flask_jwt_extended import get_jwt, verify_jwt_in_request
+from flask import current_app
+from flask_jwt_extended import get_jwt, get_jwt_identity, verify_jwt_in_request
 from functools import wraps
 from .models.user import User
+from .utils import db
+from .utils.cache import user_identity_cache
+from .utils.instrumentation import instrumentation
 from http import HTTPStatus
 
 
+def load_user_identity(ui:int):
+    """
+        Load the identity of a user from the database
+
+        Only the columns needed for authorization are selected.
+
+        Args:
+            ui (int): User id
+    """
+
+    row = db.session.execute(
+        db.select(User.user_type, User.is_admin, User.role_version).filter_by(id=ui)
+    ).first()
+
+    if row:
+        return row.user_type, bool(row.is_admin), row.role_version or 0
+    else:
+        return None
+
+
+def get_user_identity(ui:int):
+    """
+        Get the (user_type, is_admin, role_version) of a user
+
+        Served from the process-local identity cache, the database is
+        only hit on a miss or after the entry expired.
+
+        Args:
+            ui (int): User id
+    """
+
+    return user_identity_cache.get_or_load(ui, load_user_identity)
+
+
 def get_user_type(ui:int):
     """
         Get user type
-        
+
         Args:
             ui (int): User id
     """
 
-    user = User.query.filter_by(id=ui).first()
+    identity = get_user_identity(ui)
 
-    if user:
-        return user.user_type
+    if identity:
+        return identity[0]
     else:
         return None
-    
 
-def admin_required():
+
+def get_role_version(ui:int):
     """
-        Admin required decorator
+        Get the role version of a user, at most USER_CACHE_TTL seconds old
+
+        Args:
+            ui (int): User id
+    """
+
+    identity = get_user_identity(ui)
+
+    if identity:
+        return identity[2]
+    else:
+        return None
+
+
+def role_claims(user):
+    """
+        Build the role claims embedded in the access and refresh tokens
+
+        Args:
+            user (User): The authenticated user
+    """
+
+    return {
+        'user_type': user.user_type,
+        'is_admin': bool(user.is_admin),
+        'role_version': user.role_version or 0
+    }
+
+
+def get_claimed_user_type(claims):
+    """
+        Resolve the user type of the current request from the JWT claims
+
+        Tokens minted before role claims existed fall back to a database lookup.
+        When JWT_ROLE_VERSION_CHECK is enabled, a token whose role_version no longer
+        matches the user's row is rejected. The role version is read through the
+        process-local identity cache, so a role change takes effect at once on the
+        worker that saved it and within USER_CACHE_TTL seconds on the others.
+
+        Args:
+            claims (dict): The decoded JWT
+    """
+
+    user_type = claims.get('user_type')
+    if user_type is None:
+        return get_user_type(claims['sub'])
+
+    if current_app.config.get('JWT_ROLE_VERSION_CHECK', True):
+        if get_role_version(claims['sub']) != claims.get('role_version', 0):
+            return None
+
+    return user_type
+
+
+def is_course_lecturer(course):
+    """
+        Whether the current request is made by the lecturer teaching the course
+
+        Args:
+            course (Course): The course the request writes to
+    """
+
+    return str(course.lecturer_id) == str(get_jwt_identity())
+
+
+def roles_required(*roles, message):
+    """
+        Generic role required decorator
+
+        Args:
+            roles (str): User types allowed to access the route
+            message (str): Error message returned when access is denied
     """
     def wrapper(fn):
         @wraps(fn)
         def decorator(*args, **kwargs):
-            verify_jwt_in_request()
-            claims = get_jwt()
-            print(claims)
-            if get_user_type(claims['sub']) == 'admin':
+            with instrumentation.timer('auth'):
+                verify_jwt_in_request()
+                allowed = get_claimed_user_type(get_jwt()) in roles
+            if allowed:
                 return fn(*args, **kwargs)
             return {
-                'message': 'Admin access required'
+                'message': message
             }, HTTPStatus.UNAUTHORIZED
         return decorator
     return wrapper
 
+
+def admin_required():
+    """
+        Admin required decorator
+    """
+    return roles_required('admin', message='Admin access required')
+
+
 def lecturer_required():
     """
         Lecturer required decorator
     """
-    def wrapper(fn):
-        @wraps(fn)
-        def decorator(*args, **kwargs):
-            verify_jwt_in_request()
-            user_id = get_jwt()
-            print(user_id)
-            if get_user_type(user_id['sub']) == 'lecturer':
-                return fn(*args, **kwargs)
-            return {
-                'message': 'Lecturer access required'
-            }, HTTPStatus.UNAUTHORIZED
-        return decorator
-    return wrapper
+    return roles_required('lecturer', message='Lecturer access required')
 
 
 def student_required():
     """
         Student required decorator
     """
-    def wrapper(fn):
-        @wraps(fn)
-        def decorator(*args, **kwargs):
-            verify_jwt_in_request()
-            user_id = get_jwt()
-            print(user_id)
-            if get_user_type(user_id['sub']) == 'student':
-                return fn(*args, **kwargs)
-            return {
-                'message': 'Student access required'
-            }, HTTPStatus.UNAUTHORIZED
-        return decorator
-    return wrapper
+    return roles_required('student', message='Student access required')
 
 
 def admin_or_lecturer_required():
     """
         Admin or lecturer required decorator
     """
-    def wrapper(fn):
-        @wraps(fn)
-        def decorator(*args, **kwargs):
-            verify_jwt_in_request()
-            user_id = get_jwt()
-            print(user_id)
-            if get_user_type(user_id['sub']) == 'admin' or get_user_type(user_id['sub']) == 'lecturer':
-                return fn(*args, **kwargs)
-            return {
-                'message': 'Admin or lecturer access required'
-            }, HTTPStatus.UNAUTHORIZED
-        return decorator
-    return wrapper
+    return roles_required('admin', 'lecturer', message='Admin or lecturer access required')
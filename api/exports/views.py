@@ -0,0 +1,132 @@
+import csv
+import io
+from datetime import datetime
+from flask import Response, current_app, request, stream_with_context
+from flask_restx import Namespace, Resource
+from ..models.user import Student
+from ..models.course import StudentCourse, Score
+from ..utils import db
+from ..utils.serializers import dumps
+from ..utils.routing import replica_router
+from http import HTTPStatus
+from ..decorators import admin_required
+
+
+exports_namespace = Namespace('exports', description='Bulk data exports', decorators=[replica_router.route_reads])
+
+EXPORT_FORMATS = {
+    'ndjson': 'application/x-ndjson',
+    'csv': 'text/csv',
+}
+
+format_param = {'format': 'ndjson (default) or csv'}
+
+
+def export_value(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return value
+
+
+def stream_export(statement, name):
+    """
+        Stream the rows of a select statement as NDJSON or CSV
+
+        The rows are fetched from a server-side cursor in chunks of
+        EXPORT_CHUNK_SIZE and written out chunk by chunk, so memory use does
+        not grow with the size of the table.
+    """
+    export_format = request.args.get('format', 'ndjson')
+    if export_format not in EXPORT_FORMATS:
+        return {'message': 'format must be one of: {}'.format(', '.join(EXPORT_FORMATS))}, HTTPStatus.BAD_REQUEST
+
+    chunk_size = current_app.config['EXPORT_CHUNK_SIZE']
+    columns = [column.name for column in statement.selected_columns]
+
+    def generate():
+        result = db.session.execute(statement.execution_options(yield_per=chunk_size))
+        try:
+            if export_format == 'csv':
+                buffer = io.StringIO()
+                writer = csv.writer(buffer)
+                writer.writerow(columns)
+                for partition in result.partitions():
+                    writer.writerows([export_value(value) for value in row] for row in partition)
+                    yield buffer.getvalue()
+                    buffer.seek(0)
+                    buffer.truncate()
+                yield buffer.getvalue()
+            else:
+                for partition in result.partitions():
+                    yield b''.join(
+                        dumps({column: export_value(value) for column, value in zip(columns, row)}) + b'\n'
+                        for row in partition
+                    )
+        finally:
+            result.close()
+
+    return Response(
+        stream_with_context(generate()),
+        mimetype=EXPORT_FORMATS[export_format],
+        headers={'Content-Disposition': f'attachment; filename={name}.{export_format}'}
+    )
+
+
+@exports_namespace.route('/students')
+class ExportStudents(Resource):
+    @exports_namespace.doc(
+        description="""
+            Only admin can access this endpoint
+            This streams the full student roster
+        """,
+        params=format_param
+    )
+    @admin_required()
+    def get(self):
+        """
+            Export all students
+        """
+        statement = db.select(
+            Student.id, Student.name, Student.username, Student.email, Student.matric_no, Student.created_at
+        ).order_by(Student.id)
+        return stream_export(statement, 'students')
+
+
+@exports_namespace.route('/enrollments')
+class ExportEnrollments(Resource):
+    @exports_namespace.doc(
+        description="""
+            Only admin can access this endpoint
+            This streams every course registration
+        """,
+        params=format_param
+    )
+    @admin_required()
+    def get(self):
+        """
+            Export all course registrations
+        """
+        statement = db.select(
+            StudentCourse.id, StudentCourse.student_id, StudentCourse.course_id, StudentCourse.created_at
+        ).order_by(StudentCourse.id)
+        return stream_export(statement, 'enrollments')
+
+
+@exports_namespace.route('/scores')
+class ExportScores(Resource):
+    @exports_namespace.doc(
+        description="""
+            Only admin can access this endpoint
+            This streams the grade book
+        """,
+        params=format_param
+    )
+    @admin_required()
+    def get(self):
+        """
+            Export all scores
+        """
+        statement = db.select(
+            Score.id, Score.student_id, Score.course_id, Score.score, Score.percent, Score.gpa, Score.created_at
+        ).order_by(Score.id)
+        return stream_export(statement, 'scores')
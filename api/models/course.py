@@ -1,14 +1,18 @@
-from ..utils import db
+from ..utils import db, dialect_insert
+from ..utils.response_cache import response_cache
 from datetime import datetime
 from ..models.user import Student
 
 class Course(db.Model):
     __tablename__ = 'courses'
     id = db.Column(db.Integer(), primary_key=True)
-    name = db.Column(db.String(100), nullable=False)
+    name = db.Column(db.String(100), nullable=False, index=True)
     course_code = db.Column(db.String(10), unique=True)
-    lecturer_id = db.Column(db.Integer, db.ForeignKey('lecturers.id'))
+    lecturer_id = db.Column(db.Integer, db.ForeignKey('lecturers.id'), index=True)
+    credit_units = db.Column(db.Integer(), nullable=False, default=3, server_default='3')
+    term = db.Column(db.String(20), nullable=True)
     created_at = db.Column(db.DateTime() , nullable=False , default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime(), nullable=False, default=datetime.utcnow, onupdate=datetime.utcnow)
 
     def __repr__(self):
         return f"Course('{self.name}', '{self.course_code}')"
@@ -16,18 +20,29 @@ class Course(db.Model):
     def save(self):
         db.session.add(self)
         db.session.commit()
+        response_cache.invalidate('courses', f'course:{self.id}')
 
     def delete(self):
         db.session.delete(self)
         db.session.commit()
+        response_cache.invalidate('courses', f'course:{self.id}', f'enrollment:{self.id}')
 
     @classmethod
     def get_by_id(cls, id):
         return cls.query.get_or_404(id)
+
+    @classmethod
+    def exists(cls, id):
+        return db.session.execute(db.select(cls.id).filter_by(id=id)).first() is not None
     
     
 class StudentCourse(db.Model):
     __tablename__ = 'student_courses'
+    __table_args__ = (
+        # also serves lookups by student_id alone, course_id needs its own index
+        db.Index('ix_student_courses_student_id_course_id', 'student_id', 'course_id', unique=True),
+        db.Index('ix_student_courses_course_id', 'course_id'),
+    )
     id = db.Column(db.Integer(), primary_key=True)
     student_id = db.Column(db.Integer(), db.ForeignKey('students.id'))
     course_id = db.Column(db.Integer(), db.ForeignKey('courses.id'))
@@ -36,15 +51,72 @@ class StudentCourse(db.Model):
     def save(self):
         db.session.add(self)
         db.session.commit()
+        response_cache.invalidate(f'enrollment:{self.course_id}')
 
     def delete(self):
         db.session.delete(self)
         db.session.commit()
+        response_cache.invalidate(f'enrollment:{self.course_id}')
 
     @classmethod
     def get_by_id(cls, id):
         return cls.query.get_or_404(id)
-    
+
+    @classmethod
+    def get_enrolled_student_ids(cls, course_id, student_ids):
+        """
+        Return which of student_ids are registered for the course, in one query.
+        """
+        rows = db.session.execute(
+            db.select(cls.student_id).where(cls.course_id == course_id, cls.student_id.in_(student_ids))
+        )
+        return {row.student_id for row in rows}
+
+    @classmethod
+    def bulk_enroll(cls, course_id, student_ids):
+        """
+        Register students for a course, skipping those already registered.
+
+        Writes a single multi-row INSERT ... ON CONFLICT DO NOTHING and
+        takes the new registrations from its RETURNING clause, so
+        overlapping requests enrolling the same students both succeed and
+        each reports only the registrations it made. Nothing is committed,
+        the caller invalidates enrollment:<course_id> after committing.
+
+        Returns:
+            (enrolled, already_enrolled) lists of student ids
+        """
+        student_ids = list(dict.fromkeys(student_ids))
+        if not student_ids:
+            return [], []
+        inserted = set(db.session.execute(
+            dialect_insert(cls)
+            .values([{'student_id': student_id, 'course_id': course_id} for student_id in student_ids])
+            .on_conflict_do_nothing(index_elements=['student_id', 'course_id'])
+            .returning(cls.student_id)
+        ).scalars())
+        return (
+            [student_id for student_id in student_ids if student_id in inserted],
+            [student_id for student_id in student_ids if student_id not in inserted]
+        )
+
+    @classmethod
+    def bulk_unenroll(cls, course_id, student_ids):
+        """
+        Remove students from a course with a single DELETE. Nothing is committed,
+        the caller invalidates enrollment:<course_id> after committing.
+
+        Returns:
+            (removed, not_enrolled) lists of student ids
+        """
+        existing = cls.get_enrolled_student_ids(course_id, student_ids)
+        removed = [student_id for student_id in student_ids if student_id in existing]
+        if removed:
+            db.session.execute(
+                db.delete(cls).where(cls.course_id == course_id, cls.student_id.in_(removed))
+            )
+        return removed, [student_id for student_id in student_ids if student_id not in existing]
+
     @classmethod
     def get_students_in_course_by(cls, course_id):
         students = Student.query\
@@ -62,17 +134,71 @@ class StudentCourse(db.Model):
             .filter(Student.id == student_id).all()
 
         return courses
+
+    @classmethod
+    def get_student_rows_in_course(cls, course_id, columns):
+        """
+        Return the given Student columns of the students registered for a course, as rows.
+        """
+        return db.session.query(*columns)\
+            .join(StudentCourse, StudentCourse.student_id == Student.id)\
+            .filter(StudentCourse.course_id == course_id)\
+            .order_by(Student.id).all()
+
+    @classmethod
+    def get_course_rows_by_student_id(cls, student_id, columns):
+        """
+        Return the given Course columns of the courses a student registered for, as rows.
+        """
+        return db.session.query(*columns)\
+            .join(StudentCourse, StudentCourse.course_id == Course.id)\
+            .filter(StudentCourse.student_id == student_id)\
+            .order_by(Course.id).all()
+
+    @classmethod
+    def get_course_grades_by_student_id(cls, student_id):
+        """
+        Return the courses of a student with their scores in a single query.
+
+        Starts from the students table so an unknown student yields no row and
+        a student without courses yields a single row with a null course id.
+        Scores are left joined, so ungraded courses have null score columns.
+        """
+        students = Student.__table__
+        rows = db.session.query(
+                Course.id.label('course_id'),
+                Course.name.label('course_name'),
+                Course.course_code,
+                Score.score,
+                Score.gpa,
+                Score.percent
+            )\
+            .select_from(students)\
+            .outerjoin(StudentCourse, StudentCourse.student_id == students.c.id)\
+            .outerjoin(Course, Course.id == StudentCourse.course_id)\
+            .outerjoin(Score, db.and_(Score.student_id == StudentCourse.student_id, Score.course_id == StudentCourse.course_id))\
+            .filter(students.c.id == student_id)\
+            .order_by(Course.id)
+
+        return rows
     
 
 class Score(db.Model):
     __tablename__ = 'scores'
+    __table_args__ = (
+        db.Index('ix_scores_student_id_course_id', 'student_id', 'course_id', unique=True),
+        db.Index('ix_scores_course_id', 'course_id'),
+    )
     id = db.Column(db.Integer(), primary_key=True)
     student_id = db.Column(db.Integer(), db.ForeignKey('students.id'))
     course_id = db.Column(db.Integer(), db.ForeignKey('courses.id'))
     score = db.Column(db.Float, nullable=False)
     percent = db.Column(db.String(10), nullable=True)
     gpa = db.Column(db.Float)
+    # the grading scale version percent and gpa were computed with
+    scale_id = db.Column(db.Integer(), db.ForeignKey('grading_scales.id'), nullable=True)
     created_at = db.Column(db.DateTime() , nullable=False , default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime(), nullable=False, default=datetime.utcnow, onupdate=datetime.utcnow)
 
     def __init__(self, student_id, course_id, score, percent):
         self.student_id = student_id
@@ -91,4 +217,73 @@ class Score(db.Model):
     @classmethod
     def get_by_id(cls, id):
         return cls.query.get_or_404(id)
-    
\ No newline at end of file
+    
+    @classmethod
+    def lock(cls, course_id, student_ids):
+        """
+        Lock the scores of the students in a course, returns their (id, student_id, gpa) rows by student.
+        """
+        return {
+            row.student_id: row
+            for row in db.session.execute(
+                db.select(cls.id, cls.student_id, cls.gpa)
+                .where(cls.course_id == course_id, cls.student_id.in_(student_ids))
+                .order_by(cls.student_id)
+                .with_for_update()
+            )
+        }
+
+    @classmethod
+    def bulk_upsert(cls, course_id, scores, scale_id=None):
+        """
+        Insert or update the scores of many students of a course.
+
+        Existing scores are locked with one SELECT ... FOR UPDATE, so the
+        old GPAs handed to the transcript update are the ones overwritten
+        even when another request grades the same students. The new rows
+        are written with a single multi-row INSERT ... ON CONFLICT DO
+        NOTHING, rows a concurrent request inserted first are locked and
+        updated instead. The changed rows are written with a single
+        executemany UPDATE by primary key. Nothing is committed.
+
+        Args:
+            course_id (int): The graded course
+            scores (list): (student_id, score, percent, gpa) tuples
+            scale_id (int): The grading scale the scores were graded with
+
+        Returns:
+            (changes, created, updated) where changes lists the
+            (student_id, old_gpa, new_gpa) tuples for the transcript update
+        """
+        existing = cls.lock(course_id, [student_id for student_id, _, _, _ in scores])
+
+        inserted = set()
+        new_rows = [
+            {'student_id': student_id, 'course_id': course_id, 'score': score, 'percent': percent, 'gpa': gpa, 'scale_id': scale_id}
+            for student_id, score, percent, gpa in scores if student_id not in existing
+        ]
+        if new_rows:
+            inserted = set(db.session.execute(
+                dialect_insert(cls)
+                .values(new_rows)
+                .on_conflict_do_nothing(index_elements=['student_id', 'course_id'])
+                .returning(cls.student_id)
+            ).scalars())
+            raced = [row['student_id'] for row in new_rows if row['student_id'] not in inserted]
+            if raced:
+                existing.update(cls.lock(course_id, raced))
+
+        inserts, updates, changes = [], [], []
+        for student_id, score, percent, gpa in scores:
+            if student_id in inserted:
+                inserts.append(student_id)
+                changes.append((student_id, None, gpa))
+            else:
+                row = existing[student_id]
+                updates.append({'id': row.id, 'score': score, 'percent': percent, 'gpa': gpa, 'scale_id': scale_id})
+                changes.append((student_id, row.gpa, gpa))
+
+        if updates:
+            db.session.execute(db.update(cls), updates)
+
+        return changes, len(inserts), len(updates)
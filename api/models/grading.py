@@ -0,0 +1,67 @@
+from ..utils import db
+from ..utils.grading import Scale
+from datetime import datetime
+
+
+class GradingScale(db.Model):
+    """
+    A version of a grading scale, its bands are never edited once saved.
+
+    A changed scale is saved as the next version of the same name, and at
+    most one version of any name is active. Scores record the scale they
+    were graded with in scale_id.
+    """
+    __tablename__ = 'grading_scales'
+    __table_args__ = (
+        db.UniqueConstraint('name', 'version', name='uq_grading_scales_name_version'),
+    )
+    id = db.Column(db.Integer(), primary_key=True)
+    name = db.Column(db.String(50), nullable=False)
+    version = db.Column(db.Integer(), nullable=False)
+    is_active = db.Column(db.Boolean(), nullable=False, default=False, index=True)
+    created_at = db.Column(db.DateTime(), nullable=False, default=datetime.utcnow)
+    bands = db.relationship('GradingBand', backref='scale', order_by='GradingBand.min_score', lazy='selectin')
+
+    def __repr__(self):
+        return f"GradingScale('{self.name}', '{self.version}')"
+
+    def save(self):
+        db.session.add(self)
+        db.session.commit()
+
+    @classmethod
+    def get_active(cls):
+        return cls.query.filter_by(is_active=True).first()
+
+    @classmethod
+    def next_version(cls, name):
+        latest = db.session.execute(db.select(db.func.max(cls.version)).filter_by(name=name)).scalar()
+        return (latest or 0) + 1
+
+    def activate(self):
+        """
+        Make this the only active scale, nothing is committed.
+        """
+        db.session.execute(db.update(GradingScale).where(GradingScale.id != self.id).values(is_active=False))
+        self.is_active = True
+
+    def compile(self):
+        return Scale(
+            [(band.min_score, band.letter, band.gpa) for band in self.bands],
+            name=self.name, version=self.version, id=self.id
+        )
+
+
+class GradingBand(db.Model):
+    __tablename__ = 'grading_bands'
+    __table_args__ = (
+        db.UniqueConstraint('scale_id', 'min_score', name='uq_grading_bands_scale_id_min_score'),
+    )
+    id = db.Column(db.Integer(), primary_key=True)
+    scale_id = db.Column(db.Integer(), db.ForeignKey('grading_scales.id'), nullable=False)
+    min_score = db.Column(db.Float(), nullable=False)
+    letter = db.Column(db.String(5), nullable=False)
+    gpa = db.Column(db.Float(), nullable=False)
+
+    def __repr__(self):
+        return f"GradingBand('{self.letter}', '{self.min_score}')"
@@ -0,0 +1,35 @@
+from ..utils import db
+from datetime import datetime
+
+
+class OutboundEmail(db.Model):
+    """
+    An email waiting in the outbox, sent by the background mail dispatcher.
+    """
+    __tablename__ = 'outbound_emails'
+    __table_args__ = (
+        db.Index('ix_outbound_emails_status_next_attempt_at', 'status', 'next_attempt_at'),
+    )
+    id = db.Column(db.Integer(), primary_key=True)
+    recipient = db.Column(db.String(120), nullable=False)
+    subject = db.Column(db.String(200), nullable=False)
+    body = db.Column(db.Text(), nullable=False)
+    status = db.Column(db.String(10), nullable=False, default='pending')
+    attempts = db.Column(db.Integer(), nullable=False, default=0)
+    next_attempt_at = db.Column(db.DateTime(), nullable=False, default=datetime.utcnow)
+    claim_token = db.Column(db.String(32), nullable=True, index=True)
+    locked_until = db.Column(db.DateTime(), nullable=True)
+    last_error = db.Column(db.Text(), nullable=True)
+    created_at = db.Column(db.DateTime(), nullable=False, default=datetime.utcnow)
+    sent_at = db.Column(db.DateTime(), nullable=True)
+
+    def __repr__(self):
+        return f"OutboundEmail('{self.recipient}', '{self.status}')"
+
+    def save(self):
+        db.session.add(self)
+        db.session.commit()
+
+    def delete(self):
+        db.session.delete(self)
+        db.session.commit()
@@ -0,0 +1,124 @@
+from ..utils import db, dialect_insert
+from datetime import datetime
+
+
+class StudentTranscript(db.Model):
+    """
+    Running GPA totals of a student, updated whenever one of their scores is written.
+
+    The cumulative figures and the per-term breakdown live on a single row, so
+    reading a transcript is one primary key lookup. terms maps a term name to
+    {'credits', 'quality_points', 'gpa'}.
+    """
+    __tablename__ = 'student_transcripts'
+    student_id = db.Column(db.Integer(), db.ForeignKey('students.id'), primary_key=True)
+    total_credits = db.Column(db.Integer(), nullable=False, default=0)
+    quality_points = db.Column(db.Float(), nullable=False, default=0.0)
+    gpa = db.Column(db.Float(), nullable=False, default=0.0)
+    graded_courses = db.Column(db.Integer(), nullable=False, default=0)
+    terms = db.Column(db.JSON(), nullable=False, default=dict)
+    updated_at = db.Column(db.DateTime(), nullable=False, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    def __repr__(self):
+        return f"StudentTranscript('{self.student_id}', '{self.gpa}')"
+
+    def save(self):
+        db.session.add(self)
+        db.session.commit()
+
+    def delete(self):
+        db.session.delete(self)
+        db.session.commit()
+
+    @classmethod
+    def get_by_student_id(cls, student_id):
+        return db.session.get(cls, student_id)
+
+    def apply(self, term, credits, old_gpa, new_gpa):
+        """
+        Replace the contribution of one course grade, old_gpa is None for a new grade.
+        """
+        credit_delta = credits if old_gpa is None else 0
+        points_delta = new_gpa * credits - (old_gpa * credits if old_gpa is not None else 0)
+
+        self.total_credits = (self.total_credits or 0) + credit_delta
+        self.quality_points = (self.quality_points or 0) + points_delta
+        self.graded_courses = (self.graded_courses or 0) + (1 if old_gpa is None else 0)
+        self.gpa = round(self.quality_points / self.total_credits, 2) if self.total_credits else 0.0
+
+        # reassign the dict so the JSON column is flagged as modified
+        terms = dict(self.terms or {})
+        key = term or 'unassigned'
+        summary = dict(terms.get(key, {'credits': 0, 'quality_points': 0.0, 'gpa': 0.0}))
+        summary['credits'] += credit_delta
+        summary['quality_points'] += points_delta
+        summary['gpa'] = round(summary['quality_points'] / summary['credits'], 2) if summary['credits'] else 0.0
+        terms[key] = summary
+        self.terms = terms
+
+    @classmethod
+    def apply_score_changes(cls, course, changes):
+        """
+        Fold score changes of a course into the transcripts of its students.
+
+        The transcripts are loaded with a single SELECT ... FOR UPDATE, so
+        concurrent score writes for a student apply their changes one after
+        the other instead of to the same stale totals. Missing transcripts
+        are created with INSERT ... ON CONFLICT DO NOTHING and then locked
+        like the others, a concurrent request creating the same row is not
+        an error. They are updated in the current session, the caller
+        commits them together with the scores.
+
+        Args:
+            course (Course): The graded course
+            changes (list): (student_id, old_gpa, new_gpa) tuples, old_gpa is
+                None when the student had no score for the course yet
+        """
+        # a fixed lock order, two requests locking the same students can't deadlock
+        student_ids = sorted({student_id for student_id, _, _ in changes})
+        transcripts = cls.lock(student_ids)
+        missing = [student_id for student_id in student_ids if student_id not in transcripts]
+        if missing:
+            cls.create_empty(missing)
+            transcripts.update(cls.lock(missing))
+        for student_id, old_gpa, new_gpa in changes:
+            transcripts[student_id].apply(course.term, course.credit_units, old_gpa, new_gpa)
+
+    @classmethod
+    def create_empty(cls, student_ids):
+        """
+        Insert empty transcripts for the students, those that already have one are left alone.
+        """
+        db.session.execute(
+            dialect_insert(cls)
+            .values([
+                {'student_id': student_id, 'total_credits': 0, 'quality_points': 0.0, 'gpa': 0.0,
+                 'graded_courses': 0, 'terms': {}}
+                for student_id in student_ids
+            ])
+            .on_conflict_do_nothing(index_elements=['student_id'])
+        )
+
+    @classmethod
+    def lock_student_ids(cls, student_ids):
+        """
+        Lock the transcripts of the students like lock(), returns the ids of those that exist.
+        """
+        return set(db.session.execute(
+            db.select(cls.student_id)
+            .where(cls.student_id.in_(student_ids))
+            .order_by(cls.student_id)
+            .with_for_update()
+        ).scalars())
+
+    @classmethod
+    def lock(cls, student_ids):
+        """
+        Load the transcripts of the students with FOR UPDATE, refreshing any already in the session.
+        """
+        statement = db.select(cls)\
+            .where(cls.student_id.in_(student_ids))\
+            .order_by(cls.student_id)\
+            .with_for_update()\
+            .execution_options(populate_existing=True)
+        return {transcript.student_id: transcript for transcript in db.session.execute(statement).scalars()}
@@ -1,4 +1,6 @@
 from ..utils import db
+from ..utils.cache import user_identity_cache
+from ..utils.response_cache import response_cache
 from datetime import datetime
 
 
@@ -11,8 +13,10 @@ class User(db.Model):
     password_hash = db.Column(db.Text(), nullable=False)
     user_type = db.Column(db.String(15))
     is_admin = db.Column(db.Boolean(), default=False)
+    role_version = db.Column(db.Integer(), nullable=False, default=0, server_default='0')
     password_reset_token = db.Column(db.String(50), nullable=True)
     created_at = db.Column(db.DateTime(), default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime(), nullable=False, default=datetime.utcnow, onupdate=datetime.utcnow)
 
     __mapper_args__ = {
         'polymorphic_on': user_type,
@@ -25,10 +29,12 @@ class User(db.Model):
     def save(self):
         db.session.add(self)
         db.session.commit()
+        user_identity_cache.invalidate(self.id)
 
     def delete(self):
         db.session.delete(self)
         db.session.commit()
+        user_identity_cache.invalidate(self.id)
 
     @classmethod
     def get_by_id(cls, id):
@@ -47,10 +53,12 @@ class Admin(User):
     def save(self):
         db.session.add(self)
         db.session.commit()
+        user_identity_cache.invalidate(self.id)
 
     def delete(self):
         db.session.delete(self)
         db.session.commit()
+        user_identity_cache.invalidate(self.id)
 
     @classmethod
     def get_by_id(cls, id):
@@ -71,15 +79,27 @@ class Student(User):
     def save(self):
         db.session.add(self)
         db.session.commit()
+        user_identity_cache.invalidate(self.id)
+        response_cache.invalidate('students')
 
     def delete(self):
         db.session.delete(self)
         db.session.commit()
+        user_identity_cache.invalidate(self.id)
+        response_cache.invalidate('students')
 
     @classmethod
     def get_by_id(cls, id):
         return cls.query.get_or_404(id)
 
+    @classmethod
+    def exists(cls, id):
+        """
+        Check that a student exists without loading the user row.
+        """
+        students = cls.__table__
+        return db.session.execute(db.select(students.c.id).where(students.c.id == id)).first() is not None
+
 
 class Lecturer(User):
     __tablename__ = 'lecturers'
@@ -94,11 +114,34 @@ class Lecturer(User):
     def save(self):
         db.session.add(self)
         db.session.commit()
+        user_identity_cache.invalidate(self.id)
 
     def delete(self):
         db.session.delete(self)
         db.session.commit()
+        user_identity_cache.invalidate(self.id)
 
     @classmethod
     def get_by_id(cls, id):
         return cls.query.get_or_404(id)
+
+
+@db.event.listens_for(User, 'before_update', propagate=True)
+def bump_role_version(mapper, connection, target):
+    """
+    Bump the role version whenever the user type or admin flag changes,
+    so tokens carrying the old role claims are rejected.
+    """
+    state = db.inspect(target)
+    if state.attrs.user_type.history.has_changes() or state.attrs.is_admin.history.has_changes():
+        target.role_version = (target.role_version or 0) + 1
+
+
+@db.event.listens_for(User, 'before_update', propagate=True)
+def touch_updated_at(mapper, connection, target):
+    """
+    Stamp updated_at on every change, including changes that only touch the
+    students or lecturers table, which the users.updated_at onupdate misses.
+    """
+    if db.session.is_modified(target, include_collections=False):
+        target.updated_at = datetime.utcnow()
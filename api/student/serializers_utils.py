@@ -28,18 +28,27 @@ course_retrieve_model =  {
     'name': fields.String(required=True, description="A course name"),
     'course_code': fields.String(description="A course code"),
     'lecturer_id': fields.Integer(), 
+    'credit_units': fields.Integer(description="Course credit units"),
+    'term': fields.String(description="Term the course is taught in"),
     'created_at': fields.DateTime( description="Course creation date"),
 }
 
 create_course_model = {
     'name': fields.String(required=True, description="A course name"),
-    'lecturer_id': fields.Integer(required=True, description="Course Lecturer ID")
+    'lecturer_id': fields.Integer(required=True, description="Course Lecturer ID"),
+    'credit_units': fields.Integer(required=False, description="Course credit units"),
+    'term': fields.String(required=False, description="Term the course is taught in")
 }
 
 student_register_for_course_model = {
     'student_id': fields.Integer(required=True, description='ID of student'),
 }
 
+bulk_student_course_model = {
+    'student_ids': fields.List(fields.Integer, required=False, description='IDs of students'),
+    'matric_nos': fields.List(fields.String, required=False, description='Admission Numbers of students'),
+}
+
 course_lecturer_model = {
     'username': fields.String(required=True, description='Username of the Lecturer'),
     'email': fields.String(required=True, description='Lecturer email address'),
@@ -54,3 +63,12 @@ gpa_model = {
     'score': fields.String(required=True, description="Grade"),
     'percent': fields.String(required=True, description="Percentage")
 }
+
+
+transcript_model = {
+    'student_id': fields.Integer(required=True, description="Student ID"),
+    'gpa': fields.Float(required=True, description="Cumulative GPA"),
+    'total_credits': fields.Integer(required=True, description="Graded credit units"),
+    'graded_courses': fields.Integer(required=True, description="Number of graded courses"),
+    'terms': fields.Raw(description="Credits and GPA per term")
+}
\ No newline at end of file
@@ -1,14 +1,22 @@
-from flask import request
+import csv
+import io
+from flask import current_app, request
 from flask_restx import Namespace, Resource
 from ..models.user import Student
+from ..utils.serializers import get_serializer, json_response, projected_columns
+from ..utils.pagination import get_limit, get_fields, get_datetime_arg, keyset_paginate, page_response
+from ..utils.conditional import weak_etag, conditional_response
+from ..utils.routing import replica_router
 from ..models.course import Course, StudentCourse, Score
-from ..utils import db, letter_grade_to_gpa, grade
+from ..models.transcript import StudentTranscript
+from ..utils import db
+from ..utils.grading import grading_scales, default_scale
 from http import HTTPStatus
-from .serializers_utils import student_model, student_score_model, course_model, course_retrieve_model, update_student_model, gpa_model
-from ..decorators import admin_required, lecturer_required, admin_or_lecturer_required
+from .serializers_utils import student_model, student_score_model, course_model, course_retrieve_model, update_student_model, gpa_model, transcript_model
+from ..decorators import admin_required, lecturer_required, admin_or_lecturer_required, is_course_lecturer
 
 
-student_namespace = Namespace('students', description='Students related operations')
+student_namespace = Namespace('students', description='Students related operations', decorators=[replica_router.route_reads])
 
 student_field = student_namespace.model("Students List Model", student_model)
 
@@ -22,30 +30,56 @@ course_retrieve_field = student_namespace.model("Course Retrieve Model", course_
 
 gpa_field = student_namespace.model("GPA Model", gpa_model)
 
+transcript_field = student_namespace.model("Transcript Model", transcript_model)
+
 @student_namespace.route('/')
 class GetStudentList(Resource):
-    @student_namespace.marshal_with(student_field)
+    @student_namespace.response(HTTPStatus.OK, 'Success', [student_field])
     @student_namespace.doc(
         description="""
             Only admin can access this endpoint
-            This returns all the students in the academy
-        """
+            This returns the students in the academy, one page at a time
+            The next page is linked in the Link and X-Next-Cursor headers
+        """,
+        params={
+            'limit': 'Page size',
+            'cursor': 'Cursor of the next page',
+            'fields': 'Comma separated list of fields to return',
+            'matric_no': 'Matric number prefix',
+            'created_after': 'Only students created at or after this ISO 8601 datetime',
+            'created_before': 'Only students created before this ISO 8601 datetime'
+        }
     )
     @admin_required()
     def get(self):
         """
             Get all students
         """
-        students = Student.query.all()
-        return students , HTTPStatus.OK
+        limit = get_limit()
+        fields = get_fields(student_field)
+
+        query = db.session.query(*projected_columns(Student, fields))
+        matric_no = request.args.get('matric_no')
+        if matric_no:
+            query = query.filter(Student.matric_no.startswith(matric_no, autoescape=True))
+        created_after = get_datetime_arg('created_after')
+        if created_after:
+            query = query.filter(Student.created_at >= created_after)
+        created_before = get_datetime_arg('created_before')
+        if created_before:
+            query = query.filter(Student.created_at < created_before)
+
+        students, next_cursor = keyset_paginate(query, Student.id, limit)
+        return page_response(students, student_field, fields, next_cursor)
 
 @student_namespace.route('/<int:student_id>')
 class GetUpdateDeleteStudent(Resource):
-    @student_namespace.marshal_with(student_field)
+    @student_namespace.response(HTTPStatus.OK, 'Success', student_field)
     @student_namespace.doc(
         description="""
             Only admins and lecturers can access this route
             This allow the retrieval of a particular student 
+            Send the ETag back in If-None-Match to get a 304 when the student has not changed
         """
     )
     @admin_or_lecturer_required()
@@ -53,11 +87,19 @@ class GetUpdateDeleteStudent(Resource):
         """
             Get a student by ID
         """
-        student = Student.query.filter_by(id=student_id).first()
-        if not student:
+        version = db.session.execute(
+            db.select(Student.updated_at).where(Student.id == student_id)
+        ).first()
+        if not version:
             return {'message': 'Student not found'}, HTTPStatus.NOT_FOUND
-        if student:
-            return student, HTTPStatus.OK
+
+        def build():
+            columns = projected_columns(Student, student_field.keys())
+            student = db.session.query(*columns).filter(Student.id == student_id).one()
+            return json_response(get_serializer(student_field).one(student), HTTPStatus.OK)
+
+        etag = weak_etag('student', student_id, version.updated_at)
+        return conditional_response(etag, version.updated_at, build)
     
     @student_namespace.expect(update_student_field)
     @student_namespace.marshal_with(student_field)
@@ -101,7 +143,7 @@ class GetUpdateDeleteStudent(Resource):
 
 @student_namespace.route('/<int:student_id>/courses')
 class GetStudentCourses(Resource):
-    @student_namespace.marshal_with(course_retrieve_field)
+    @student_namespace.response(HTTPStatus.OK, 'Success', [course_retrieve_field])
     @student_namespace.doc(
         description="""
             Only admins and lecturers can access this route
@@ -113,12 +155,12 @@ class GetStudentCourses(Resource):
         """
             Get a student courses by ID
         """
-        student = Student.query.filter_by(id=student_id).first()
-        if not student:
+        if not Student.exists(student_id):
             return {'message': 'Student not found'}, HTTPStatus.NOT_FOUND
         
-        student_courses = StudentCourse.get_courses_by_student_id(student_id)
-        return student_courses, HTTPStatus.OK
+        columns = projected_columns(Course, course_retrieve_field.keys())
+        student_courses = StudentCourse.get_course_rows_by_student_id(student_id, columns)
+        return json_response(get_serializer(course_retrieve_field).many(student_courses), HTTPStatus.OK)
                 
 
 @student_namespace.route('/studentcourse/score/<int:course_id>')
@@ -135,30 +177,35 @@ class UpdateStudentCourseScore(Resource):
         """
             Update a Student course score by the Course Lecturer
         """
-        data = request.get_json()
-        student_id = data.get('student_id')
-        score_value = data.get('score')
-        
+        data = request.get_json(silent=True)
+        if not isinstance(data, dict):
+            return {'message': 'Expected a JSON object'}, HTTPStatus.BAD_REQUEST
+        # validated like the rows of a bulk upload
+        parsed, error = parse_bulk_score_row(data)
+        if error:
+            return {'message': error}, HTTPStatus.BAD_REQUEST
+        student_id, score_value = parsed
+
         # check if student and course exist
         student = Student.query.filter_by(id=student_id).first()
         course = Course.query.filter_by(id=course_id).first()
         if not student or not course:
             return {'message': 'Student or course not found'}, HTTPStatus.NOT_FOUND
+        if not is_course_lecturer(course):
+            return {'message': 'Only the lecturer of this course can grade it'}, HTTPStatus.FORBIDDEN
 
         # check if student is registered for the course
         student_in_course = StudentCourse.query.filter_by(course_id=course.id, student_id=student.id).first() 
         if student_in_course:
-            # check if the student already have a score in the course
-            score = Score.query.filter_by(student_id=student_id, course_id=course_id).first()
-            gpa = grade(score_value)
-            if score:
-                score.score = score_value
-                score.percent = gpa
-            else:
-                # create a new score object and save to database
-                score = Score(student_id=student_id, course_id=course_id, score=score_value , percent=gpa)
+            scale = grading_scales.active()
+            percent, gpa = scale.grade(score_value)
             try:
-                score.save()
+                # the score row is locked or created like in a bulk upload, so a concurrent
+                # upload for the student can neither fail this write nor skew the transcript
+                changes, _, _ = Score.bulk_upsert(course.id, [(student.id, score_value, percent, gpa)], scale.id)
+                # keep the transcript in step with the score, in the same transaction
+                StudentTranscript.apply_score_changes(course, changes)
+                db.session.commit()
                 return {'message': 'Score added successfully'}, HTTPStatus.CREATED
             except:
                 db.session.rollback()
@@ -166,37 +213,194 @@ class UpdateStudentCourseScore(Resource):
         return {'message': 'The student is not registered for this course'}, HTTPStatus.BAD_REQUEST
         
 
+def read_bulk_scores():
+    """
+        Read the rows of a bulk score upload
+
+        text/csv bodies are read line by line from the request stream and must
+        have a student_id,score header, any other body must be a JSON array of
+        {"student_id": ..., "score": ...} objects. Returns (rows, error message).
+    """
+    if request.mimetype == 'text/csv':
+        stream = io.TextIOWrapper(request.stream, encoding='utf-8', newline='')
+        reader = csv.DictReader(stream)
+        try:
+            # reads the header line
+            fieldnames = reader.fieldnames or []
+        except (UnicodeDecodeError, csv.Error):
+            return None, 'Malformed CSV upload'
+        if not {'student_id', 'score'} <= set(fieldnames):
+            return None, 'The CSV upload needs a student_id,score header'
+        return reader, None
+    data = request.get_json(silent=True)
+    if not isinstance(data, list):
+        return None, 'Expected a JSON array or a text/csv body'
+    return data, None
+
+
+def parse_bulk_score_row(row):
+    """
+        Validate one uploaded row, returning (student_id, score) or an error message
+    """
+    if not isinstance(row, dict):
+        return None, 'Row must be an object'
+    # int() and float() would take true and false for 1 and 0
+    if isinstance(row.get('student_id'), bool):
+        return None, 'Invalid student_id'
+    if isinstance(row.get('score'), bool):
+        return None, 'Invalid score'
+    try:
+        student_id = int(row.get('student_id'))
+    except (TypeError, ValueError):
+        return None, 'Invalid student_id'
+    try:
+        score = float(row.get('score'))
+    except (TypeError, ValueError):
+        return None, 'Invalid score'
+    if not 0 <= score <= 100:
+        return None, 'Score must be between 0 and 100'
+    return (student_id, score), None
+
+
+@student_namespace.route('/studentcourse/score/<int:course_id>/bulk')
+class BulkUpdateStudentCourseScore(Resource):
+    @student_namespace.expect([student_score_field])
+    @student_namespace.doc(
+        description="""
+            Only course lecturer can access this route
+            This allow the upload of many student scores of a course at once,
+            as a JSON array or as text/csv with a student_id,score header.
+            All the scores are saved in a single transaction and the
+            response lists the rows that were rejected.
+        """
+    )
+    @lecturer_required()
+    def put(self, course_id):
+        """
+            Upload many Student course scores by the Course Lecturer
+        """
+        course = Course.query.filter_by(id=course_id).first()
+        if not course:
+            return {'message': 'Course not found'}, HTTPStatus.NOT_FOUND
+        if not is_course_lecturer(course):
+            return {'message': 'Only the lecturer of this course can grade it'}, HTTPStatus.FORBIDDEN
+
+        rows, error = read_bulk_scores()
+        if error:
+            return {'message': error}, HTTPStatus.BAD_REQUEST
+
+        batch_size = current_app.config['BULK_BATCH_SIZE']
+        errors = []
+        created = updated = 0
+        seen = set()
+        batch = []
+
+        scale = grading_scales.active()
+
+        def flush(batch):
+            enrolled = StudentCourse.get_enrolled_student_ids(course.id, [student_id for _, student_id, _ in batch])
+            graded = []
+            for row_number, student_id, score_value in batch:
+                if student_id not in enrolled:
+                    errors.append({'row': row_number, 'student_id': student_id, 'error': 'The student is not registered for this course'})
+                    continue
+                graded.append((student_id, score_value))
+            if not graded:
+                return 0, 0
+            # the whole batch is graded at once
+            letters, gpas = scale.grade_many([score_value for _, score_value in graded])
+            scores = [
+                (student_id, score_value, letter, gpa)
+                for (student_id, score_value), letter, gpa in zip(graded, letters, gpas)
+            ]
+            changes, new, changed = Score.bulk_upsert(course.id, scores, scale.id)
+            StudentTranscript.apply_score_changes(course, changes)
+            return new, changed
+
+        try:
+            for row_number, row in enumerate(rows, start=1):
+                parsed, error = parse_bulk_score_row(row)
+                if error:
+                    errors.append({'row': row_number, 'error': error})
+                    continue
+                student_id, score_value = parsed
+                if student_id in seen:
+                    errors.append({'row': row_number, 'student_id': student_id, 'error': 'Duplicate student_id'})
+                    continue
+                seen.add(student_id)
+                batch.append((row_number, student_id, score_value))
+                if len(batch) >= batch_size:
+                    new, changed = flush(batch)
+                    created, updated = created + new, updated + changed
+                    batch = []
+            if batch:
+                new, changed = flush(batch)
+                created, updated = created + new, updated + changed
+            db.session.commit()
+        except (UnicodeDecodeError, csv.Error):
+            db.session.rollback()
+            return {'message': 'Malformed CSV upload'}, HTTPStatus.BAD_REQUEST
+        except:
+            db.session.rollback()
+            return {'message': 'An error occurred while saving student course scores'}, HTTPStatus.INTERNAL_SERVER_ERROR
+
+        errors.sort(key=lambda error: error['row'])
+        return {
+            'message': 'Scores uploaded successfully',
+            'created': created,
+            'updated': updated,
+            'errors': errors
+        }, HTTPStatus.OK
+
+
 @student_namespace.route('/<int:student_id>/<int:course_id>/gpa')
 class GetStudentGPA(Resource):
-    @student_namespace.marshal_with(gpa_field)
+    @student_namespace.response(HTTPStatus.OK, 'Success', gpa_field)
     @student_namespace.doc(
         description="""
             Only admins and lecturers can access this route
-            This allow the calculation of a particular student course GPA
+            This allow the retrieval of a particular student course GPA
         """
     )
     @admin_or_lecturer_required()
     def get(self, student_id, course_id):
         """
-            Calculate a Student Course GPA
+            Get a Student Course GPA
         """
-        student = Student.query.filter_by(id=student_id).first()
-        course = Course.query.filter_by(id=course_id).first()
-        if not student or not course:
-            return {'message': 'Student or course not found'}, HTTPStatus.NOT_FOUND
-        
-        if student:
-            # Calculate the gpa here
-            student_courses = StudentCourse.get_courses_by_student_id(student_id)
-            if not student_courses:
-                return {'message': 'Student not registered for any course'}, HTTPStatus.NOT_FOUND
-            
-            score = Score.query.filter_by(student_id=student_id, course_id=course_id).first()
-            grades = score.percent.split(",")
-            gpa = sum(letter_grade_to_gpa(grade) for grade in grades) / len(grades)
-            score.gpa = round(gpa, 2)
-            db.session.commit()
-            return score, HTTPStatus.OK
+        score = Score.query.filter_by(student_id=student_id, course_id=course_id).first()
+        if not score:
+            return {'message': 'Student has no score for this course'}, HTTPStatus.NOT_FOUND
+
+        if score.gpa is None:
+            # scores written before the gpa was stored with them, and before grading scales, computed without writing
+            score = {
+                'student_id': score.student_id,
+                'gpa': default_scale.gpa(score.percent),
+                'score': score.score,
+                'percent': score.percent
+            }
+        # marshalled here, marshal_with would turn the 404 message into null fields
+        return student_namespace.marshal(score, gpa_field), HTTPStatus.OK
+
+
+@student_namespace.route('/<int:student_id>/transcript')
+class GetStudentTranscript(Resource):
+    @student_namespace.response(HTTPStatus.OK, 'Success', transcript_field)
+    @student_namespace.doc(
+        description="""
+            Only admins and lecturers can access this route
+            This allow the retrieval of a particular student cumulative and per term GPA
+        """
+    )
+    @admin_or_lecturer_required()
+    def get(self, student_id):
+        """
+            Get a Student transcript
+        """
+        transcript = StudentTranscript.get_by_student_id(student_id)
+        if not transcript:
+            return {'message': 'Student has no graded course'}, HTTPStatus.NOT_FOUND
+        return student_namespace.marshal(transcript, transcript_field), HTTPStatus.OK
 
 
 @student_namespace.route('/<int:student_id>/courses/grades')
@@ -213,34 +417,35 @@ class GetStudentCoursesGrades(Resource):
         """
             Get a student all courses and grades by ID
         """
-        student = Student.query.filter_by(id=student_id).first()
-        if not student:
-            return {'message': 'Student not found'}, HTTPStatus.NOT_FOUND
-        
-        student_courses = StudentCourse.get_courses_by_student_id(student_id)
-        if not student_courses:
-            return {'message': 'Student not registered for any course'}, HTTPStatus.NOT_FOUND
-        
+        rows = StudentCourse.get_course_grades_by_student_id(student_id)
+
         student_courses_grades = []
-        for student_course in student_courses:
-            course = Course.query.filter_by(id=student_course.id).first()
-            score = Score.query.filter_by(student_id=student_id, course_id=student_course.id).first()
-            if score:
+        found = False
+        for row in rows:
+            found = True
+            if row.course_id is None:
+                continue
+            if row.score is not None:
                 student_courses_grades.append({
-                    'course_id': course.id,
-                    'course_name': course.name,
-                    'course_code': course.course_code,
-                    'course_score': score.score,
-                    'course_gpa': score.gpa,
-                    'course_percent': score.percent
+                    'course_id': row.course_id,
+                    'course_name': row.course_name,
+                    'course_code': row.course_code,
+                    'course_score': row.score,
+                    'course_gpa': row.gpa,
+                    'course_percent': row.percent
                 })
             else:
                 student_courses_grades.append({
-                    'course_id': course.id,
-                    'course_name': course.name,
-                    'course_code': course.course_code,
+                    'course_id': row.course_id,
+                    'course_name': row.course_name,
+                    'course_code': row.course_code,
                     'course_score': 'Not yet graded',
                     'course_gpa': 'Not yet graded',
                     'course_percent': 'Not yet graded'
                 })
+
+        if not found:
+            return {'message': 'Student not found'}, HTTPStatus.NOT_FOUND
+        if not student_courses_grades:
+            return {'message': 'Student not registered for any course'}, HTTPStatus.NOT_FOUND
         return student_courses_grades, HTTPStatus.OK
@@ -0,0 +1,101 @@
+import os
+import tempfile
+import unittest
+from sqlalchemy import create_engine
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from .. import create_app
+from ..config.config import config_dict
+from ..utils import db
+from ..models.user import Admin
+from ..decorators import role_claims
+from ..utils.pool import InstrumentedQueuePool, pool_status
+from flask_jwt_extended import create_access_token
+
+
+class TestAdmin(unittest.TestCase):
+
+    def setUp(self):
+        self.app = create_app(config=config_dict['test'])
+
+        self.client = self.app.test_client()
+
+        self.appctx = self.app.app_context()
+
+        self.appctx.push()
+
+        db.create_all()
+
+        admin = Admin(
+            name='Test Admin',
+            email='admin@aotem.com',
+            username='testadmin',
+            password_hash='password',
+            user_type='admin',
+            is_admin=True
+        )
+        admin.save()
+
+        token = create_access_token(identity=admin.id, additional_claims=role_claims(admin))
+
+        self.headers = {
+            'Authorization': f'Bearer {token}'
+        }
+
+    def tearDown(self):
+        db.drop_all()
+
+        self.appctx.pop()
+
+        self.app = None
+
+        self.client = None
+
+    def test_cache_stats(self):
+        self.client.get('/courses/', headers=self.headers)
+        self.client.get('/courses/', headers=self.headers)
+
+        response = self.client.get('/admin/cache-stats', headers=self.headers)
+
+        assert response.status_code == 200
+        assert response.json['response_cache']['hits'] == 1
+        assert response.json['response_cache']['hit_rate'] == 0.5
+        assert 'hit_rate' in response.json['user_identity_cache']
+
+    def test_pool_stats(self):
+        response = self.client.get('/admin/pool-stats', headers=self.headers)
+
+        assert response.status_code == 200
+        assert response.json['pool'] == type(db.engine.pool).__name__
+
+        response = self.client.get('/admin/pool-stats')
+
+        assert response.status_code == 401
+
+    def test_instrumented_pool(self):
+        with tempfile.TemporaryDirectory() as directory:
+            engine = create_engine(
+                'sqlite:///' + os.path.join(directory, 'pool.sqlite3'),
+                poolclass=InstrumentedQueuePool, pool_size=1, max_overflow=1, pool_timeout=0.05
+            )
+
+            first = engine.connect()
+            second = engine.connect()
+            status = pool_status(engine.pool)
+
+            assert status['checked_out'] == 2
+            assert status['overflow'] == 1
+
+            with self.assertRaises(PoolTimeoutError):
+                engine.connect()
+
+            first.close()
+            second.close()
+            status = pool_status(engine.pool)
+
+            assert status['checked_out'] == 0
+            assert status['checkouts'] == 3
+            assert status['timeouts'] == 1
+            assert status['peak_overflow'] == 1
+            assert status['wait_max_ms'] >= 50
+
+            engine.dispose()
@@ -0,0 +1,243 @@
+import asyncio
+import importlib.util
+import os
+import tempfile
+import unittest
+from .. import create_app
+from ..config.config import TestConfig
+from ..utils import db
+from ..models.user import Admin, Lecturer
+from ..models.course import Course
+from ..decorators import role_claims
+from flask_jwt_extended import create_access_token
+
+ASGI_INSTALLED = all(importlib.util.find_spec(name) for name in ('a2wsgi', 'aiosqlite'))
+
+
+def make_scope(method, path, query_string='', headers=None):
+    return {
+        'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1',
+        'method': method, 'scheme': 'http', 'path': path, 'root_path': '',
+        'query_string': query_string.encode(), 'server': ('localhost', 80), 'client': ('127.0.0.1', 5000),
+        'headers': [(name.lower().encode(), value.encode()) for name, value in {'host': 'localhost', **(headers or {})}.items()],
+    }
+
+
+def asgi_request(app, method, path, query_string='', headers=None):
+    """
+    Prepare one request through an ASGI app, returns (coroutine function, sent messages).
+    """
+    scope = make_scope(method, path, query_string, headers)
+    messages = [{'type': 'http.request', 'body': b'', 'more_body': False}]
+    sent = []
+
+    async def receive():
+        return messages.pop(0) if messages else {'type': 'http.disconnect'}
+
+    async def send(message):
+        sent.append(message)
+
+    async def run():
+        await app(scope, receive, send)
+
+    return run, sent
+
+
+def response_of(sent):
+    start = sent[0]
+    headers = {name.decode().lower(): value.decode() for name, value in start['headers']}
+    return start['status'], headers, b''.join(message.get('body', b'') for message in sent[1:])
+
+
+@unittest.skipUnless(ASGI_INSTALLED, 'a2wsgi and aiosqlite are needed for the ASGI mode')
+class TestAsgi(unittest.TestCase):
+
+    def setUp(self):
+        from ..asgi import AsyncApp
+        from ..utils.async_db import async_db
+
+        self.directory = tempfile.TemporaryDirectory()
+
+        class AsgiConfig(TestConfig):
+            SQLALCHEMY_ECHO = False
+            SQLALCHEMY_DATABASE_URI = 'sqlite:///' + os.path.join(self.directory.name, 'asgi.sqlite3')
+
+        self.app = create_app(config=AsgiConfig)
+
+        self.asgi = AsyncApp(self.app)
+
+        self.async_db = async_db
+
+        self.client = self.app.test_client()
+
+        self.appctx = self.app.app_context()
+
+        self.appctx.push()
+
+        db.create_all()
+
+        admin = Admin(name='Test Admin', email='admin@aotem.com', username='testadmin',
+                      password_hash='password', user_type='admin', is_admin=True)
+        admin.save()
+        lecturer = Lecturer(name='Test Lecturer', email='lecturer@aotem.com', username='testlecturer',
+                            password_hash='password', staff_no='LCT@TEST', user_type='lecturer')
+        lecturer.save()
+        for i in range(3):
+            Course(name=f'Course {i}', course_code=f'CRS{i}', lecturer_id=lecturer.id, term='First').save()
+
+        self.course_id = Course.query.first().id
+
+        token = create_access_token(identity=admin.id, additional_claims=role_claims(admin))
+
+        self.headers = {
+            'Authorization': f'Bearer {token}'
+        }
+
+    def tearDown(self):
+        db.drop_all()
+
+        self.appctx.pop()
+
+        self.directory.cleanup()
+
+        self.app = None
+
+        self.client = None
+
+    def fetch(self, *requests):
+        """
+        Send the requests through the ASGI app on one event loop.
+        """
+        runs = [asgi_request(self.asgi, *args) for args in requests]
+
+        async def run_all():
+            for run, _ in runs:
+                await run()
+            await self.async_db.dispose()
+
+        asyncio.run(run_all())
+        return [response_of(sent) for _, sent in runs]
+
+    def served_async(self, path, query_string=''):
+        """
+        Whether the GET is answered on the event loop rather than by the WSGI app.
+        """
+        async def handle():
+            try:
+                return await self.asgi.handle(make_scope('GET', path, query_string, self.headers))
+            finally:
+                await self.async_db.dispose()
+
+        return asyncio.run(handle()) is not None
+
+    def test_course_detail_matches_wsgi(self):
+        sync_response = self.client.get(f'/courses/{self.course_id}', headers=self.headers)
+
+        (status, headers, body), = self.fetch(('GET', f'/courses/{self.course_id}', '', self.headers))
+
+        assert status == 200
+
+        assert body == sync_response.get_data()
+
+        assert headers['etag'] == sync_response.headers['ETag']
+
+        assert headers['last-modified'] == sync_response.headers['Last-Modified']
+
+        # Revalidation answers 304 without the body
+        (status, headers, body), = self.fetch(
+            ('GET', f'/courses/{self.course_id}', '', {**self.headers, 'If-None-Match': sync_response.headers['ETag']})
+        )
+
+        assert status == 304
+
+        assert body == b''
+
+        (status, headers, body), = self.fetch(('GET', '/courses/999', '', self.headers))
+
+        assert status == 404
+
+    def test_course_list_matches_wsgi(self):
+        sync_response = self.client.get('/courses/?limit=2&fields=id,name', headers=self.headers)
+
+        (status, headers, body), = self.fetch(('GET', '/courses/', 'limit=2&fields=id,name', self.headers))
+
+        assert status == 200
+
+        assert body == sync_response.get_data()
+
+        assert headers['etag'] == sync_response.headers['ETag']
+
+        assert headers['link'] == sync_response.headers['Link']
+
+        # Second page through the cursor
+        cursor = headers['x-next-cursor']
+        sync_response = self.client.get(f'/courses/?limit=2&cursor={cursor}', headers=self.headers)
+
+        (status, headers, body), = self.fetch(('GET', '/courses/', f'limit=2&cursor={cursor}', self.headers))
+
+        assert body == sync_response.get_data()
+
+        assert 'link' not in headers
+
+    def test_wsgi_fallback(self):
+        assert self.served_async(f'/courses/{self.course_id}')
+
+        assert not self.served_async('/students/')
+
+        # Bad arguments are answered by the WSGI app with its usual error
+        assert not self.served_async('/courses/', 'limit=0')
+
+        responses = self.fetch(
+            ('GET', '/courses/', '', {}),
+            ('GET', '/courses/', 'limit=0', self.headers),
+            ('GET', '/students/', '', self.headers),
+            ('DELETE', f'/courses/{self.course_id}', '', self.headers),
+        )
+
+        assert [status for status, _, _ in responses] == [401, 400, 200, 200]
+
+        assert Course.query.count() == 2
+
+    def test_revoked_token_falls_back(self):
+        logout = self.client.post('/auth/logout', headers=self.headers)
+
+        assert logout.status_code == 200
+
+        (status, headers, body), = self.fetch(('GET', '/courses/', '', self.headers))
+
+        assert status == 401
+
+        assert b'token_revoked' in body
+
+    def test_sessions_in_arrival_order(self):
+        from ..utils.async_db import AsyncDatabase
+
+        self.app.config.update(ASYNC_DB_POOL_SIZE=1, ASYNC_DB_MAX_OVERFLOW=1)
+        async_db = AsyncDatabase()
+        async_db.init_app(self.app)
+        order = []
+        open_sessions = []
+
+        async def read(name, hold):
+            async with async_db.session() as session:
+                order.append(name)
+                open_sessions.append(name)
+                await session.execute(db.select(Course.id))
+                await hold
+                open_sessions.remove(name)
+
+        async def run_all():
+            release = asyncio.get_running_loop().create_future()
+            holding = [asyncio.create_task(read(f'holding {i}', release)) for i in range(2)]
+            await asyncio.sleep(0.1)
+            waiting = [asyncio.create_task(read(f'waiting {i}', asyncio.sleep(0.01))) for i in range(4)]
+            await asyncio.sleep(0.1)
+            # no more sessions than the pool has connections
+            assert open_sessions == ['holding 0', 'holding 1']
+            release.set_result(None)
+            await asyncio.gather(*holding, *waiting)
+            await async_db.dispose()
+
+        asyncio.run(run_all())
+
+        assert order == ['holding 0', 'holding 1', 'waiting 0', 'waiting 1', 'waiting 2', 'waiting 3']
@@ -1,9 +1,17 @@
+import sys
+import threading
+import time
 import unittest
 from .. import create_app
 from ..config.config import config_dict
 from ..utils import db
+from ..utils.cache import user_identity_cache
+from ..utils.blocklist import token_blocklist
+from ..utils.passwords import password_hasher, PasswordHasher
+from ..decorators import get_user_identity
 from ..models.user import User, Admin
-from flask_jwt_extended import create_access_token
+from ..models.token import RevokedToken
+from flask_jwt_extended import create_access_token, decode_token
 
 
 class TestAuth(unittest.TestCase):
@@ -128,3 +136,211 @@ class TestAuth(unittest.TestCase):
         }
 
         
+
+    def test_role_claims(self):
+        # Register and sign an admin in
+        admin_signup_data = {
+            "name": "Test User",
+            "email": "admin@aotem.com",
+            "user_type": "admin",
+            "password": "password"
+        }
+        self.client.post('/auth/signup', json=admin_signup_data)
+
+        admin_login_response = self.client.post('/auth/login', json={
+            "email": "admin@aotem.com",
+            "password": "password"
+        })
+
+        assert admin_login_response.status_code == 200
+
+        token = admin_login_response.json['access_token']
+
+        claims = decode_token(token)
+
+        assert claims['user_type'] == 'admin'
+
+        assert claims['role_version'] == 0
+
+        headers = {
+            'Authorization': f'Bearer {token}'
+        }
+
+        # The role comes from the claims, guarded routes work
+        response = self.client.get('/students/', headers=headers)
+
+        assert response.status_code == 200
+
+        # A role change bumps the role version and invalidates the token
+        admin = Admin.query.filter_by(email=admin_signup_data['email']).first()
+        admin.is_admin = False
+        admin.save()
+
+        assert admin.role_version == 1
+
+        response = self.client.get('/students/', headers=headers)
+
+        assert response.status_code == 401
+
+    def test_user_identity_cache(self):
+        self.client.post('/auth/signup', json={
+            "name": "Test User",
+            "email": "admin@aotem.com",
+            "user_type": "admin",
+            "password": "password"
+        })
+
+        admin = Admin.query.filter_by(email="admin@aotem.com").first()
+
+        user_identity_cache.clear()
+
+        assert get_user_identity(admin.id) == ('admin', True, 0)
+
+        assert get_user_identity(admin.id) == ('admin', True, 0)
+
+        assert user_identity_cache.hits == 1
+
+        assert user_identity_cache.misses == 1
+
+        # Saving the user drops the cached identity
+        admin.is_admin = False
+        admin.save()
+
+        assert get_user_identity(admin.id) == ('admin', False, 1)
+
+        assert user_identity_cache.misses == 2
+
+    def test_logout_revokes_token(self):
+        self.client.post('/auth/signup', json={
+            "name": "Test User",
+            "email": "admin@aotem.com",
+            "user_type": "admin",
+            "password": "password"
+        })
+
+        login_response = self.client.post('/auth/login', json={
+            "email": "admin@aotem.com",
+            "password": "password"
+        })
+
+        headers = {
+            'Authorization': f'Bearer {login_response.json["access_token"]}'
+        }
+
+        # The token is looked up once, then served from the worker cache
+        assert self.client.get('/courses/', headers=headers).status_code == 200
+
+        logout_response = self.client.post('/auth/logout', headers=headers)
+
+        assert logout_response.status_code == 200
+
+        assert RevokedToken.query.count() == 1
+
+        response = self.client.get('/courses/', headers=headers)
+
+        assert response.status_code == 401
+
+        assert response.json['error'] == 'token_revoked'
+
+        # Other workers only see the revocation through the shared store
+        token_blocklist.revoked_cache.clear()
+
+        token_blocklist.not_revoked_cache.clear()
+
+        assert self.client.get('/courses/', headers=headers).status_code == 401
+
+        # Expired revocations are purged
+        assert token_blocklist.store.purge_expired(time.time() + 3600) == 1
+
+        assert RevokedToken.query.count() == 0
+
+    def test_rehash_on_login(self):
+        self.client.post('/auth/signup', json={
+            "name": "Test User",
+            "email": "admin@aotem.com",
+            "user_type": "admin",
+            "password": "password"
+        })
+
+        admin = Admin.query.filter_by(email="admin@aotem.com").first()
+
+        assert admin.password_hash.startswith('pbkdf2:sha256:1000$')
+
+        # Raising the cost upgrades the stored hash on the next login
+        password_hasher.method = 'pbkdf2:sha256:2000'
+
+        response = self.client.post('/auth/login', json={
+            "email": "admin@aotem.com",
+            "password": "password"
+        })
+
+        assert response.status_code == 200
+
+        db.session.refresh(admin)
+
+        assert admin.password_hash.startswith('pbkdf2:sha256:2000$')
+
+        assert not password_hasher.needs_rehash(admin.password_hash)
+
+        # A wrong password leaves the hash alone
+        password_hasher.method = 'pbkdf2:sha256:3000'
+
+        response = self.client.post('/auth/login', json={
+            "email": "admin@aotem.com",
+            "password": "wrong"
+        })
+
+        assert response.status_code == 401
+
+        db.session.refresh(admin)
+
+        assert admin.password_hash.startswith('pbkdf2:sha256:2000$')
+
+    def test_password_hasher_busy(self):
+        self.client.post('/auth/signup', json={
+            "name": "Test User",
+            "email": "admin@aotem.com",
+            "user_type": "admin",
+            "password": "password"
+        })
+
+        self.app.config.update(PASSWORD_HASH_WORKERS=1, PASSWORD_HASH_MAX_PENDING=0, PASSWORD_HASH_QUEUE_TIMEOUT=0)
+        password_hasher.init_app(self.app)
+
+        # The only slot is taken, the login is refused instead of queueing
+        password_hasher._slots.acquire()
+        try:
+            response = self.client.post('/auth/login', json={
+                "email": "admin@aotem.com",
+                "password": "password"
+            })
+        finally:
+            password_hasher._slots.release()
+
+        assert response.status_code == 503
+
+        assert response.headers['Retry-After'] == '1'
+
+        assert password_hasher.stats()['rejected'] == 1
+
+        assert 'password_hash_rejected_total 1' in self.client.get('/metrics', headers={
+            'Authorization': 'Bearer test-metrics-token'
+        }).get_data(as_text=True)
+
+    def test_password_hasher_pool(self):
+        hasher = PasswordHasher()
+        hasher.method = 'pbkdf2:sha256:1000'
+        hasher.workers = 1
+        # the interpreter to start, as set under uwsgi
+        hasher.python = sys.executable
+        hasher._slots = threading.BoundedSemaphore(1)
+        try:
+            pwhash = hasher.hash('password')
+
+            assert hasher.verify(pwhash, 'password')
+
+            assert not hasher.verify(pwhash, 'wrong')
+
+            assert hasher.stats()['in_flight'] == 0
+        finally:
+            hasher.shutdown()
@@ -4,6 +4,8 @@ from ..config.config import config_dict
 from ..utils import db
 from ..models.user import User, Admin, Lecturer, Student
 from ..models.course import Course, StudentCourse
+from ..decorators import role_claims
+from ..utils.response_cache import ResponseCache, response_cache
 from flask_jwt_extended import create_access_token
 
 class TestCourses(unittest.TestCase):
@@ -43,3 +45,258 @@ class TestCourses(unittest.TestCase):
         headers = {
             'Authorization': f'Bearer {token}'
         }
+
+    def test_bulk_enrollment(self):
+        lecturer = Lecturer(
+            name='Test Lecturer',
+            email='lecturer@aotem.com',
+            username='testlecturer',
+            password_hash='password',
+            staff_no='LCT@00001',
+            user_type='lecturer'
+        )
+        lecturer.save()
+
+        course = Course(name='Course', course_code='CRS001', lecturer_id=lecturer.id)
+        course.save()
+        course_id = course.id
+
+        for i in range(4):
+            db.session.add(Student(
+                name=f'Student {i}',
+                email=f'student{i}@aotem.com',
+                username=f'student{i}',
+                password_hash='password',
+                matric_no=f'STD@{i:05d}',
+                user_type='student'
+            ))
+        db.session.commit()
+        student_ids = [student.id for student in Student.query.order_by(Student.id)]
+
+        token = create_access_token(identity=lecturer.id, additional_claims=role_claims(lecturer))
+
+        headers = {
+            'Authorization': f'Bearer {token}'
+        }
+
+        data = {
+            'student_ids': [student_ids[0], student_ids[1], 999],
+            'matric_nos': ['STD@00002', 'STD@99999']
+        }
+
+        response = self.client.post(f'/courses/addcourse/{course_id}/bulk', json=data, headers=headers)
+
+        assert response.status_code == 201
+
+        assert response.json['enrolled'] == student_ids[:3]
+
+        assert response.json['not_found'] == {'student_ids': [999], 'matric_nos': ['STD@99999']}
+
+        # Only the lecturer of the course can change its students
+        other = Lecturer(name='Other Lecturer', email='other@aotem.com', username='otherlecturer',
+                         password_hash='password', staff_no='LCT@00002', user_type='lecturer')
+        other.save()
+        token = create_access_token(identity=other.id, additional_claims=role_claims(other))
+        other_headers = {
+            'Authorization': f'Bearer {token}'
+        }
+
+        response = self.client.post(f'/courses/addcourse/{course_id}/bulk', json={'student_ids': [student_ids[3]]},
+                                    headers=other_headers)
+
+        assert response.status_code == 403
+
+        response = self.client.delete(f'/courses/addcourse/{course_id}/bulk', json=data, headers=other_headers)
+
+        assert response.status_code == 403
+
+        # Registering again is a no-op
+        response = self.client.post(f'/courses/addcourse/{course_id}/bulk', json=data, headers=headers)
+
+        assert response.status_code == 200
+
+        assert response.json['already_enrolled'] == student_ids[:3]
+
+        assert StudentCourse.query.count() == 3
+
+        response = self.client.delete(f'/courses/addcourse/{course_id}/bulk',
+            json={'student_ids': [student_ids[0], student_ids[3]]}, headers=headers)
+
+        assert response.json['removed'] == [student_ids[0]]
+
+        assert response.json['not_enrolled'] == [student_ids[3]]
+
+        # Registrations already committed by an overlapping request are skipped by the insert itself
+        enrolled, already_enrolled = StudentCourse.bulk_enroll(course_id, [student_ids[3], student_ids[1], student_ids[3]])
+
+        assert (enrolled, already_enrolled) == ([student_ids[3]], [student_ids[1]])
+
+        db.session.rollback()
+
+        assert StudentCourse.query.count() == 2
+
+        for body in ({'student_ids': 'all'}, {'student_ids': [True]}, [student_ids[2]]):
+            response = self.client.post(f'/courses/addcourse/{course_id}/bulk', json=body, headers=headers)
+
+            assert response.status_code == 400, body
+
+        response = self.client.delete(f'/courses/addcourse/{course_id}/bulk', json=[student_ids[0]], headers=headers)
+
+        assert response.status_code == 400
+
+        assert StudentCourse.query.count() == 2
+
+    def test_conditional_get(self):
+        lecturer = Lecturer(
+            name='Test Lecturer',
+            email='lecturer@aotem.com',
+            username='testlecturer',
+            password_hash='password',
+            staff_no='LCT@00001',
+            user_type='lecturer'
+        )
+        lecturer.save()
+
+        course = Course(name='Course', course_code='CRS001', lecturer_id=lecturer.id)
+        course.save()
+        course_id = course.id
+
+        token = create_access_token(identity=lecturer.id, additional_claims=role_claims(lecturer))
+
+        headers = {
+            'Authorization': f'Bearer {token}'
+        }
+
+        response = self.client.get(f'/courses/{course_id}', headers=headers)
+        etag = response.headers['ETag']
+        last_modified = response.headers['Last-Modified']
+
+        assert response.status_code == 200
+        assert etag.startswith('W/')
+        assert response.headers['Cache-Control'] == 'private, no-cache'
+        assert response.json['course_code'] == 'CRS001'
+
+        response = self.client.get(f'/courses/{course_id}', headers={**headers, 'If-None-Match': etag})
+
+        assert response.status_code == 304
+        assert response.get_data() == b''
+
+        response = self.client.get(f'/courses/{course_id}', headers={
+            **headers, 'If-Modified-Since': last_modified
+        })
+
+        assert response.status_code == 304
+
+        list_response = self.client.get('/courses/', headers=headers)
+        list_etag = list_response.headers['ETag']
+
+        assert list_response.status_code == 200
+        assert self.client.get('/courses/', headers={**headers, 'If-None-Match': list_etag}).status_code == 304
+
+        course = db.session.get(Course, course_id)
+        course.name = 'Renamed Course'
+        course.save()
+
+        response = self.client.get(f'/courses/{course_id}', headers={**headers, 'If-None-Match': etag})
+
+        assert response.status_code == 200
+        assert response.json['name'] == 'Renamed Course'
+        assert self.client.get('/courses/', headers={**headers, 'If-None-Match': list_etag}).status_code == 200
+
+        response = self.client.get('/courses/0', headers=headers)
+
+        assert response.status_code == 404
+
+    def test_response_cache(self):
+        lecturer = Lecturer(
+            name='Test Lecturer',
+            email='lecturer@aotem.com',
+            username='testlecturer',
+            password_hash='password',
+            staff_no='LCT@00001',
+            user_type='lecturer'
+        )
+        lecturer.save()
+
+        course = Course(name='Course', course_code='CRS001', lecturer_id=lecturer.id)
+        course.save()
+        course_id = course.id
+        other = Course(name='Other Course', course_code='CRS002', lecturer_id=lecturer.id)
+        other.save()
+        other_id = other.id
+
+        student = Student(
+            name='Test Student',
+            email='student@aotem.com',
+            username='teststudent',
+            password_hash='password',
+            matric_no='STD@00001',
+            user_type='student'
+        )
+        student.save()
+        student_id = student.id
+
+        token = create_access_token(identity=lecturer.id, additional_claims=role_claims(lecturer))
+
+        headers = {
+            'Authorization': f'Bearer {token}'
+        }
+
+        response = self.client.get(f'/courses/{course_id}/students', headers=headers)
+
+        assert response.headers['X-Cache'] == 'MISS'
+        assert response.json == []
+
+        response = self.client.get(f'/courses/{course_id}/students', headers=headers)
+
+        assert response.headers['X-Cache'] == 'HIT'
+        assert self.client.get(f'/courses/{other_id}', headers=headers).headers['X-Cache'] == 'MISS'
+
+        # StudentCourse.save only invalidates the enrollment of its own course
+        self.client.post(f'/courses/addcourse/{course_id}', json={'student_id': student_id}, headers=headers)
+
+        response = self.client.get(f'/courses/{course_id}/students', headers=headers)
+
+        assert response.headers['X-Cache'] == 'MISS'
+        assert [row['id'] for row in response.json] == [str(student_id)]
+        assert self.client.get(f'/courses/{other_id}', headers=headers).headers['X-Cache'] == 'HIT'
+
+        course = db.session.get(Course, course_id)
+        course.name = 'Renamed Course'
+        course.save()
+
+        response = self.client.get(f'/courses/{course_id}', headers=headers)
+
+        assert response.headers['X-Cache'] == 'MISS'
+        assert response.json['name'] == 'Renamed Course'
+
+        # a cached response still answers conditional requests
+        etag = self.client.get(f'/courses/{course_id}', headers=headers).headers['ETag']
+        response = self.client.get(f'/courses/{course_id}', headers={**headers, 'If-None-Match': etag})
+
+        assert response.status_code == 304
+        assert response.headers['X-Cache'] == 'HIT'
+
+        stats = response_cache.stats()
+
+        assert stats['hits'] == 4
+        assert stats['stale'] == 1
+
+    def test_shared_response_cache(self):
+        self.app.config['RESPONSE_CACHE_BACKEND'] = 'kv'
+        response_cache.init_app(self.app)
+
+        # a second worker sharing the key-value server
+        worker = ResponseCache()
+        worker.init_app(self.app)
+        worker.client = response_cache.client
+
+        with self.app.test_request_context('/courses/1'):
+            response = self.app.response_class('{"id": 1}', mimetype='application/json')
+            response_cache.set(response_cache.make_key(), response, ['course:1'], response_cache.tag_versions(['course:1']))
+
+            assert worker.get(worker.make_key()).body == '{"id": 1}'
+
+            response_cache.invalidate('course:1')
+
+            assert worker.get(worker.make_key()) is None
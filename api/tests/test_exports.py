@@ -0,0 +1,102 @@
+import csv
+import io
+import json
+import unittest
+from .. import create_app
+from ..config.config import config_dict
+from ..utils import db
+from ..models.user import Admin, Student
+from ..models.course import Course, StudentCourse, Score
+from ..decorators import role_claims
+from flask_jwt_extended import create_access_token
+
+
+class TestExports(unittest.TestCase):
+
+    def setUp(self):
+        self.app = create_app(config=config_dict['test'])
+        self.app.config['EXPORT_CHUNK_SIZE'] = 2
+
+        self.client = self.app.test_client()
+
+        self.appctx = self.app.app_context()
+
+        self.appctx.push()
+
+        db.create_all()
+
+        admin = Admin(
+            name='Test Admin',
+            email='admin@aotem.com',
+            username='testadmin',
+            password_hash='password',
+            user_type='admin',
+            is_admin=True
+        )
+        admin.save()
+
+        token = create_access_token(identity=admin.id, additional_claims=role_claims(admin))
+
+        self.headers = {
+            'Authorization': f'Bearer {token}'
+        }
+
+        for i in range(5):
+            db.session.add(Student(
+                name=f'Student {i}',
+                email=f'student{i}@aotem.com',
+                username=f'student{i}',
+                password_hash='password',
+                matric_no=f'STD@{i:05d}',
+                user_type='student'
+            ))
+        course = Course(name='Physics', course_code='PHY101')
+        db.session.add(course)
+        db.session.commit()
+
+        self.student_ids = [student.id for student in Student.query.order_by(Student.id)]
+        for student_id in self.student_ids:
+            db.session.add(StudentCourse(student_id=student_id, course_id=course.id))
+            db.session.add(Score(student_id, course.id, 75.0, '75.0%'))
+        db.session.commit()
+
+    def tearDown(self):
+        db.drop_all()
+
+        self.appctx.pop()
+
+        self.app = None
+
+        self.client = None
+
+    def test_export_students_ndjson(self):
+        response = self.client.get('/exports/students', headers=self.headers)
+
+        assert response.status_code == 200
+        assert response.mimetype == 'application/x-ndjson'
+        assert response.is_streamed
+
+        rows = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+        assert [row['id'] for row in rows] == self.student_ids
+        assert rows[0]['matric_no'] == 'STD@00000'
+        assert 'password_hash' not in rows[0]
+
+    def test_export_csv(self):
+        response = self.client.get('/exports/scores?format=csv', headers=self.headers)
+
+        assert response.status_code == 200
+        assert response.mimetype == 'text/csv'
+        assert response.headers['Content-Disposition'] == 'attachment; filename=scores.csv'
+
+        rows = list(csv.DictReader(io.StringIO(response.get_data(as_text=True))))
+        assert len(rows) == 5
+        assert rows[0]['score'] == '75.0'
+
+        response = self.client.get('/exports/enrollments?format=csv', headers=self.headers)
+        rows = list(csv.DictReader(io.StringIO(response.get_data(as_text=True))))
+        assert [int(row['student_id']) for row in rows] == self.student_ids
+
+    def test_export_rejects_unknown_format(self):
+        response = self.client.get('/exports/students?format=xml', headers=self.headers)
+
+        assert response.status_code == 400
@@ -0,0 +1,208 @@
+import unittest
+from unittest import mock
+from .. import create_app
+from ..config.config import config_dict
+from ..utils import db, grade, letter_grade_to_gpa
+from ..utils.grading import Scale, default_scale, grading_scales
+from ..models.user import Admin, Student, Lecturer
+from ..models.course import Course, StudentCourse, Score
+from ..models.grading import GradingScale
+from ..decorators import role_claims
+from flask_jwt_extended import create_access_token
+
+
+def ladder(score):
+    # the if/elif grading the default scale replaces
+    for minimum, letter in ((95, 'A+'), (90, 'A'), (85, 'A-'), (80, 'B+'), (75, 'B'), (70, 'B-'),
+                            (65, 'C+'), (60, 'C'), (55, 'C-'), (50, 'D+'), (45, 'D')):
+        if score >= minimum:
+            return letter
+    return 'F'
+
+
+PASS_FAIL = [
+    {'min_score': 0, 'letter': 'F', 'gpa': 0},
+    {'min_score': 50, 'letter': 'P', 'gpa': 4},
+]
+
+
+class TestGradingScale(unittest.TestCase):
+
+    def test_default_scale_matches_ladder(self):
+        scores = [step / 4 for step in range(-20, 421)]
+
+        assert [grade(score) for score in scores] == [ladder(score) for score in scores]
+
+        letters, gpas = default_scale.grade_many(scores)
+
+        assert letters == [ladder(score) for score in scores]
+
+        assert gpas == [letter_grade_to_gpa(letter) for letter in letters]
+
+        assert letter_grade_to_gpa('A-') == 3.7
+
+        assert letter_grade_to_gpa('Z') is None
+
+    def test_grade_many_without_numpy(self):
+        scale = Scale([(0, 'F', 0.0), (50, 'P', 4.0)])
+
+        with mock.patch('api.utils.grading.load_numpy', return_value=None):
+            assert scale.grade_many([10, 50, 99.5]) == (['F', 'P', 'P'], [0.0, 4.0, 4.0])
+
+        assert scale.grade_many([]) == ([], [])
+
+        assert scale.grade(-5) == ('F', 0.0)
+
+
+class TestGradingScaleEndpoints(unittest.TestCase):
+
+    def setUp(self):
+        self.app = create_app(config=config_dict['test'])
+
+        self.client = self.app.test_client()
+
+        self.appctx = self.app.app_context()
+
+        self.appctx.push()
+
+        db.create_all()
+
+        admin = Admin(name='Test Admin', email='admin@aotem.com', username='testadmin',
+                      password_hash='password', user_type='admin', is_admin=True)
+        admin.save()
+
+        token = create_access_token(identity=admin.id, additional_claims=role_claims(admin))
+
+        self.headers = {
+            'Authorization': f'Bearer {token}'
+        }
+
+    def tearDown(self):
+        db.drop_all()
+
+        self.appctx.pop()
+
+        self.app = None
+
+        self.client = None
+
+    def test_create_and_activate_scale(self):
+        # without a scale in the database the default one grades
+        assert grading_scales.active() is default_scale
+
+        response = self.client.post('/admin/grading-scales', json={'name': 'pass-fail', 'bands': PASS_FAIL}, headers=self.headers)
+
+        assert response.status_code == 201
+
+        assert response.json['version'] == 1
+
+        assert response.json['is_active'] is False
+
+        assert [band['letter'] for band in response.json['bands']] == ['F', 'P']
+
+        response = self.client.post('/admin/grading-scales', json={'name': 'pass-fail', 'bands': PASS_FAIL, 'is_active': True},
+                                    headers=self.headers)
+
+        assert response.json['version'] == 2
+
+        active = grading_scales.active()
+
+        assert (active.name, active.version, active.id) == ('pass-fail', 2, response.json['id'])
+
+        first_id = GradingScale.query.filter_by(version=1).first().id
+
+        response = self.client.put(f'/admin/grading-scales/{first_id}/activate', headers=self.headers)
+
+        assert response.json['is_active'] is True
+
+        assert GradingScale.query.filter_by(is_active=True).count() == 1
+
+        assert grading_scales.active().version == 1
+
+        response = self.client.get('/admin/grading-scales', headers=self.headers)
+
+        assert [scale['version'] for scale in response.json] == [2, 1]
+
+    def test_invalid_scale(self):
+        response = self.client.post('/admin/grading-scales', json={'name': 'empty', 'bands': []}, headers=self.headers)
+
+        assert response.status_code == 400
+
+        bands = PASS_FAIL + [{'min_score': 50, 'letter': 'Q', 'gpa': 3}]
+
+        response = self.client.post('/admin/grading-scales', json={'name': 'twice', 'bands': bands}, headers=self.headers)
+
+        assert response.status_code == 400
+
+        # the second P would shadow the first one in the GPA lookup
+        bands = PASS_FAIL + [{'min_score': 90, 'letter': 'P', 'gpa': 3}]
+
+        response = self.client.post('/admin/grading-scales', json={'name': 'letters', 'bands': bands}, headers=self.headers)
+
+        assert response.json['message'] == 'Two bands have the same letter'
+
+        for min_score, gpa in (('nan', 4), ('inf', 4), (50, 'nan')):
+            bands = [PASS_FAIL[0], {'min_score': min_score, 'letter': 'P', 'gpa': gpa}]
+
+            response = self.client.post('/admin/grading-scales', json={'name': 'finite', 'bands': bands}, headers=self.headers)
+
+            assert response.status_code == 400
+
+        assert GradingScale.query.count() == 0
+
+    def test_version_created_concurrently(self):
+        response = self.client.post('/admin/grading-scales', json={'name': 'pass-fail', 'bands': PASS_FAIL}, headers=self.headers)
+
+        assert response.status_code == 201
+
+        # another request read the same latest version and saved it first
+        with mock.patch.object(GradingScale, 'next_version', return_value=1):
+            response = self.client.post('/admin/grading-scales', json={'name': 'pass-fail', 'bands': PASS_FAIL, 'is_active': True},
+                                        headers=self.headers)
+
+        assert response.status_code == 409
+
+        assert GradingScale.query.count() == 1
+
+        assert grading_scales.active() is default_scale
+
+        response = self.client.post('/admin/grading-scales', json={'name': 'pass-fail', 'bands': PASS_FAIL}, headers=self.headers)
+
+        assert response.json['version'] == 2
+
+    def test_scores_graded_with_active_scale(self):
+        lecturer = Lecturer(name='Lecturer', email='lecturer@aotem.com', username='lecturer',
+                            password_hash='password', staff_no='LCT@00001', user_type='lecturer')
+        lecturer.save()
+        course = Course(name='Maths', course_code='MTH101', lecturer_id=lecturer.id)
+        course.save()
+        students = []
+        for i in range(2):
+            student = Student(name=f'Student {i}', email=f'student{i}@aotem.com', username=f'student{i}',
+                              password_hash='password', user_type='student', matric_no=f'STD@{i:05d}')
+            student.save()
+            db.session.add(StudentCourse(student_id=student.id, course_id=course.id))
+            students.append(student.id)
+        db.session.commit()
+
+        response = self.client.post('/admin/grading-scales', json={'name': 'pass-fail', 'bands': PASS_FAIL, 'is_active': True},
+                                    headers=self.headers)
+        scale_id = response.json['id']
+
+        token = create_access_token(identity=lecturer.id, additional_claims=role_claims(lecturer))
+        lecturer_headers = {
+            'Authorization': f'Bearer {token}'
+        }
+
+        self.client.put(f'/students/studentcourse/score/{course.id}', json={'student_id': students[0], 'score': 52},
+                        headers=lecturer_headers)
+        self.client.put(f'/students/studentcourse/score/{course.id}/bulk', json=[{'student_id': students[1], 'score': 30}],
+                        headers=lecturer_headers)
+
+        scores = {score.student_id: score for score in Score.query}
+
+        assert (scores[students[0]].percent, scores[students[0]].gpa) == ('P', 4.0)
+
+        assert (scores[students[1]].percent, scores[students[1]].gpa) == ('F', 0.0)
+
+        assert {score.scale_id for score in scores.values()} == {scale_id}
@@ -0,0 +1,81 @@
+import unittest
+from sqlalchemy.exc import IntegrityError
+from .. import create_app
+from ..config.config import config_dict
+from ..utils import db
+from ..models.user import Student
+from ..models.course import Course, StudentCourse, Score
+
+
+class TestIndexes(unittest.TestCase):
+
+    def setUp(self):
+        self.app = create_app(config=config_dict['test'])
+
+        self.appctx = self.app.app_context()
+
+        self.appctx.push()
+
+        db.create_all()
+
+    def tearDown(self):
+        db.drop_all()
+
+        self.appctx.pop()
+
+        self.app = None
+
+    def query_plan(self, query):
+        statement = query.statement.compile(db.engine, compile_kwargs={'literal_binds': True})
+        rows = db.session.execute(db.text(f'EXPLAIN QUERY PLAN {statement}')).all()
+        return ' | '.join(row[-1] for row in rows)
+
+    def assert_uses_index(self, query, index):
+        plan = self.query_plan(query)
+
+        assert f'INDEX {index}' in plan, plan
+
+    def test_enrollment_lookup_uses_index(self):
+        self.assert_uses_index(
+            StudentCourse.query.filter_by(student_id=1, course_id=1),
+            'ix_student_courses_student_id_course_id'
+        )
+
+    def test_score_lookup_uses_index(self):
+        self.assert_uses_index(
+            Score.query.filter_by(student_id=1, course_id=1),
+            'ix_scores_student_id_course_id'
+        )
+
+    def test_students_in_course_uses_index(self):
+        query = Student.query\
+            .join(StudentCourse, StudentCourse.student_id == Student.id)\
+            .filter(StudentCourse.course_id == 1)
+
+        self.assert_uses_index(query, 'ix_student_courses_course_id')
+
+    def test_courses_of_student_uses_index(self):
+        query = Course.query\
+            .join(StudentCourse, StudentCourse.course_id == Course.id)\
+            .filter(StudentCourse.student_id == 1)
+
+        self.assert_uses_index(query, 'ix_student_courses_student_id_course_id')
+
+    def test_course_scores_use_index(self):
+        self.assert_uses_index(Score.query.filter_by(course_id=1), 'ix_scores_course_id')
+
+    def test_course_lookups_use_indexes(self):
+        self.assert_uses_index(Course.query.filter_by(lecturer_id=1), 'ix_courses_lecturer_id')
+
+        self.assert_uses_index(Course.query.filter_by(name='Maths'), 'ix_courses_name')
+
+    def test_duplicate_enrollment_is_rejected(self):
+        db.session.add(StudentCourse(student_id=1, course_id=1))
+        db.session.commit()
+
+        db.session.add(StudentCourse(student_id=1, course_id=1))
+
+        with self.assertRaises(IntegrityError):
+            db.session.commit()
+
+        db.session.rollback()
@@ -0,0 +1,129 @@
+import os
+import tempfile
+import unittest
+from flask import g
+from .. import create_app
+from ..config.config import config_dict
+from ..utils import db
+from ..models.user import Admin, Student
+from ..decorators import role_claims
+from ..utils.instrumentation import instrumentation, statement_shape, RequestMetrics
+from flask_jwt_extended import create_access_token
+
+
+class NoMetricsTokenConfig(config_dict['test']):
+    METRICS_TOKEN = ''
+
+
+class TestInstrumentation(unittest.TestCase):
+
+    def setUp(self):
+        self.app = create_app(config=config_dict['test'])
+
+        self.client = self.app.test_client()
+
+        self.appctx = self.app.app_context()
+
+        self.appctx.push()
+
+        db.create_all()
+
+        admin = Admin(
+            name='Test Admin',
+            email='admin@aotem.com',
+            username='testadmin',
+            password_hash='password',
+            user_type='admin',
+            is_admin=True
+        )
+        admin.save()
+
+        token = create_access_token(identity=admin.id, additional_claims=role_claims(admin))
+
+        self.headers = {
+            'Authorization': f'Bearer {token}'
+        }
+
+    def tearDown(self):
+        db.drop_all()
+
+        self.appctx.pop()
+
+        self.app = None
+
+        self.client = None
+
+    def test_metrics_endpoint(self):
+        with self.assertLogs('api.utils.instrumentation', 'INFO') as logs:
+            response = self.client.get('/students/', headers=self.headers)
+
+        assert response.status_code == 200
+        assert '"endpoint": "students_get_student_list"' in logs.output[-1]
+        assert '"queries": ' in logs.output[-1]
+
+        response = self.client.get('/metrics', headers={'Authorization': 'Bearer test-metrics-token'})
+        body = response.get_data(as_text=True)
+
+        assert response.status_code == 200
+        assert response.mimetype == 'text/plain'
+        assert 'http_requests_total{endpoint="students_get_student_list",method="GET",status="200"} 1' in body
+        assert 'http_request_duration_seconds_count{endpoint="students_get_student_list",method="GET"} 1' in body
+        assert 'phase="auth"' in body
+        assert 'phase="serialization"' in body
+        assert 'db_queries_total{endpoint="students_get_student_list"}' in body
+
+    def test_metrics_need_the_token(self):
+        response = self.client.get('/metrics')
+
+        assert response.status_code == 401
+
+        response = self.client.get('/metrics', headers=self.headers)
+
+        assert response.status_code == 401
+
+        assert response.headers['WWW-Authenticate'] == 'Bearer'
+
+    def test_metrics_not_served_without_a_token(self):
+        app = create_app(config=NoMetricsTokenConfig)
+
+        response = app.test_client().get('/metrics')
+
+        assert response.status_code == 404
+
+    def test_statement_shape(self):
+        assert statement_shape('SELECT id\n  FROM users WHERE id IN (?, ?, ?)') == 'SELECT id FROM users WHERE id IN (?)'
+        assert statement_shape('SELECT id FROM users WHERE id IN (%(id_1_1)s, %(id_1_2)s)') == 'SELECT id FROM users WHERE id IN (?)'
+
+    def test_repeated_statements_are_reported(self):
+        ids = []
+        for i in range(3):
+            student = Student(
+                name=f'Student {i}',
+                email=f'student{i}@aotem.com',
+                username=f'student{i}',
+                password_hash='password',
+                matric_no=f'STD@{i:05d}',
+                user_type='student'
+            )
+            student.save()
+            ids.append(student.id)
+
+        instrumentation.repeat_threshold = 3
+        with self.app.test_request_context('/students/'):
+            g.request_metrics = RequestMetrics()
+            with self.assertLogs('api.utils.instrumentation', 'WARNING') as logs:
+                for student_id in ids:
+                    db.session.execute(db.select(Student.name).where(Student.id == student_id)).first()
+
+            assert g.request_metrics.queries == 3
+            assert len(g.request_metrics.repeated) == 1
+            assert 'Possible N+1' in logs.output[0]
+
+    def test_sampled_profiles(self):
+        with tempfile.TemporaryDirectory() as directory:
+            instrumentation.sample_rate = 1.0
+            instrumentation.profile_dir = directory
+
+            self.client.get('/students/', headers=self.headers)
+
+            assert [name for name in os.listdir(directory) if name.endswith('.prof')]
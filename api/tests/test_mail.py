@@ -0,0 +1,175 @@
+import os
+import socket
+import tempfile
+import time
+import unittest
+from datetime import datetime
+from aiosmtpd.controller import Controller
+from aiosmtpd.handlers import Message
+from .. import create_app
+from ..config.config import config_dict
+from ..utils import db
+from ..utils.mail import mail_dispatcher
+from ..models.mail import OutboundEmail
+
+
+class RecordingHandler(Message):
+    def __init__(self):
+        super().__init__()
+        self.messages = []
+
+    def handle_message(self, message):
+        self.messages.append(message)
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+class TestMail(unittest.TestCase):
+
+    def setUp(self):
+        self.handler = RecordingHandler()
+
+        self.port = free_port()
+
+        self.controller = Controller(self.handler, hostname='127.0.0.1', port=self.port)
+
+        self.controller.start()
+
+        class MailTestConfig(config_dict['test']):
+            MAIL_SERVER = '127.0.0.1'
+            MAIL_PORT = self.port
+            MAIL_USE_TLS = False
+            MAIL_USERNAME = ''
+            MAIL_BATCH_SIZE = 2
+            # the in-memory database is a single shared connection, concurrent
+            # workers would commit over each other's transactions
+            MAIL_WORKERS = 1
+
+        self.config = MailTestConfig
+
+        self.app = create_app(config=MailTestConfig)
+
+        self.appctx = self.app.app_context()
+
+        self.appctx.push()
+
+        db.create_all()
+
+    def tearDown(self):
+        mail_dispatcher.stop()
+
+        self.controller.stop()
+
+        db.drop_all()
+
+        self.appctx.pop()
+
+        self.app = None
+
+    def test_outbox_is_sent_over_a_pooled_connection(self):
+        for i in range(3):
+            mail_dispatcher.enqueue(f'user{i}@aotem.com', 'Hello', f'Message {i}')
+
+        assert OutboundEmail.query.filter_by(status='pending').count() == 3
+
+        assert mail_dispatcher.dispatch_pending() == 3
+
+        assert [message['To'] for message in self.handler.messages] == [f'user{i}@aotem.com' for i in range(3)]
+
+        assert OutboundEmail.query.filter_by(status='sent').count() == 3
+
+        # Two batches went over the same connection
+        assert mail_dispatcher.pool.connections_opened == 1
+
+    def test_failed_sends_are_retried_with_backoff(self):
+        # Nothing listens on this port
+        mail_dispatcher.pool.port = free_port()
+
+        email = mail_dispatcher.enqueue('user@aotem.com', 'Hello', 'Message')
+
+        assert mail_dispatcher.dispatch_pending() == 1
+
+        email = db.session.get(OutboundEmail, email.id)
+
+        assert email.status == 'pending'
+
+        assert email.attempts == 1
+
+        assert email.next_attempt_at > datetime.utcnow()
+
+        # Not due yet, nothing is sent
+        assert mail_dispatcher.dispatch_pending() == 0
+
+        mail_dispatcher.pool.port = self.port
+
+        email.next_attempt_at = datetime.utcnow()
+        db.session.commit()
+
+        assert mail_dispatcher.dispatch_pending() == 1
+
+        assert len(self.handler.messages) == 1
+
+    def test_dispatcher_needs_credentials(self):
+        self.app.config['MAIL_DISPATCH_ENABLED'] = True
+        mail_dispatcher.init_app(self.app)
+
+        assert not mail_dispatcher.enabled
+
+        mail_dispatcher.enqueue('user@aotem.com', 'Hello', 'Message')
+
+        assert not mail_dispatcher._threads
+
+        assert OutboundEmail.query.one().status == 'pending'
+
+        self.app.config.update(MAIL_USERNAME='outbox@aotem.com', MAIL_PASSWORD='secret')
+        mail_dispatcher.init_app(self.app)
+
+        assert mail_dispatcher.enabled
+
+    def test_background_workers_send_the_outbox(self):
+        mail_dispatcher.enabled = True
+
+        mail_dispatcher.enqueue('user@aotem.com', 'Hello', 'Message')
+
+        for _ in range(50):
+            if self.handler.messages:
+                break
+            time.sleep(0.1)
+
+        assert len(self.handler.messages) == 1
+
+
+    def test_concurrent_workers_send_each_email_once(self):
+        with tempfile.TemporaryDirectory() as directory:
+
+            class FileDatabaseConfig(self.config):
+                SQLALCHEMY_DATABASE_URI = 'sqlite:///' + os.path.join(directory, 'mail.sqlite3')
+                SQLALCHEMY_ECHO = False
+                MAIL_WORKERS = 3
+
+            app = create_app(config=FileDatabaseConfig)
+            with app.app_context():
+                db.create_all()
+                for i in range(10):
+                    db.session.add(OutboundEmail(recipient=f'user{i}@aotem.com', subject='Hello', body='Message'))
+                db.session.commit()
+
+                mail_dispatcher.enabled = True
+                mail_dispatcher.wake()
+
+                for _ in range(100):
+                    if len(self.handler.messages) >= 10:
+                        break
+                    time.sleep(0.1)
+                mail_dispatcher.stop()
+
+                assert sorted(message['To'] for message in self.handler.messages) == sorted(
+                    f'user{i}@aotem.com' for i in range(10)
+                )
+
+                db.drop_all()
+                db.engine.dispose()
@@ -0,0 +1,80 @@
+import gzip
+import os
+import tempfile
+import unittest
+from .. import create_app
+from ..config.config import TestConfig
+from ..utils.openapi import render_spec, load_manifest, SPEC_FILE
+
+
+class TestOpenApi(unittest.TestCase):
+
+    def setUp(self):
+        self.app = create_app(config=TestConfig)
+
+        self.client = self.app.test_client()
+
+        self.directory = self.app.config['OPENAPI_ARTIFACT_DIR']
+
+        self.manifest = load_manifest(self.directory)
+
+    def test_spec_artifact_is_current(self):
+        self.app.ensure_setup()
+
+        with self.app.app_context():
+            body = render_spec(self.app.extensions['api'])
+
+        with open(os.path.join(self.directory, SPEC_FILE), 'rb') as f:
+            assert f.read() == body, 'The API changed, run "flask build-openapi" and commit api/openapi'
+
+    def test_spec_served_from_artifact(self):
+        response = self.client.get('/swagger.json')
+
+        assert response.status_code == 200
+
+        assert response.headers['ETag'] == '"{}"'.format(self.manifest['etag'])
+
+        assert 'Content-Encoding' not in response.headers
+
+        assert response.json['info']['version'] == '1.0'
+
+        plain = response.get_data()
+
+        # Gzip for the clients that accept it, under its own ETag
+        response = self.client.get('/swagger.json', headers={'Accept-Encoding': 'gzip, deflate'})
+
+        assert response.headers['Content-Encoding'] == 'gzip'
+
+        assert response.headers['Vary'] == 'Accept-Encoding'
+
+        assert gzip.decompress(response.get_data()) == plain
+
+        # Pollers revalidate with a 304
+        response = self.client.get('/swagger.json', headers={'If-None-Match': response.headers['ETag'], 'Accept-Encoding': 'gzip'})
+
+        assert response.status_code == 304
+
+    def test_build_command_and_fallback(self):
+        with tempfile.TemporaryDirectory() as directory:
+
+            class NoArtifactConfig(TestConfig):
+                OPENAPI_ARTIFACT_DIR = directory
+
+            class LiveConfig(NoArtifactConfig):
+                OPENAPI_LIVE_FALLBACK = True
+
+            assert create_app(config=NoArtifactConfig).test_client().get('/swagger.json').status_code == 503
+
+            assert create_app(config=LiveConfig).test_client().get('/swagger.json').status_code == 200
+
+            result = self.app.test_cli_runner().invoke(args=['build-openapi', '--output', directory])
+
+            assert result.exit_code == 0, result.output
+
+            assert load_manifest(directory) == self.manifest
+
+            response = create_app(config=NoArtifactConfig).test_client().get('/swagger.json')
+
+            assert response.status_code == 200
+
+            assert response.headers['ETag'] == '"{}"'.format(self.manifest['etag'])
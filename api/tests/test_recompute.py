@@ -0,0 +1,200 @@
+import json
+import os
+import tempfile
+import unittest
+from unittest import mock
+from sqlalchemy.dialects import postgresql
+from .. import create_app
+from ..config.config import config_dict
+from ..utils import db
+from ..utils.recompute import values_update, grade_chunk
+from ..models.user import Student, Lecturer
+from ..models.course import Course, Score
+from ..models.transcript import StudentTranscript
+
+
+class TestRecompute(unittest.TestCase):
+
+    def setUp(self):
+        self.app = create_app(config=config_dict['test'])
+
+        self.appctx = self.app.app_context()
+
+        self.appctx.push()
+
+        db.create_all()
+
+        self.directory = tempfile.TemporaryDirectory()
+
+        self.checkpoint = os.path.join(self.directory.name, 'recompute.json')
+
+        lecturer = Lecturer(name='Test Lecturer', email='lecturer@aotem.com', username='testlecturer',
+                            password_hash='password', staff_no='LCT@00001', user_type='lecturer')
+        lecturer.save()
+        courses = [
+            Course(name='Maths', course_code='MTH101', lecturer_id=lecturer.id, credit_units=3, term='2023-1'),
+            Course(name='Physics', course_code='PHY101', lecturer_id=lecturer.id, credit_units=2, term='2023-2'),
+        ]
+        students = [
+            Student(name=f'Student {i}', email=f'student{i}@aotem.com', username=f'student{i}',
+                    password_hash='password', matric_no=f'STD@{i:05d}', user_type='student')
+            for i in range(4)
+        ]
+        db.session.add_all(courses + students)
+        db.session.commit()
+        self.student_ids = [student.id for student in students]
+
+        # stale grades, as left by scores written before gpa was stored
+        for student_id, values in zip(self.student_ids, ([96, 71], [58, 40], [85, None])):
+            for course, value in zip(courses, values):
+                if value is not None:
+                    db.session.add(Score(student_id=student_id, course_id=course.id, score=value, percent='F'))
+        # a transcript out of step with the scores, and one of a student without any
+        db.session.add(StudentTranscript(student_id=self.student_ids[0], total_credits=3, quality_points=1.0, gpa=0.33,
+                                         graded_courses=1, terms={}))
+        db.session.add(StudentTranscript(student_id=self.student_ids[3], total_credits=3, quality_points=12.0, gpa=4.0,
+                                         graded_courses=1, terms={}))
+        db.session.commit()
+
+    def tearDown(self):
+        db.drop_all()
+
+        self.appctx.pop()
+
+        self.directory.cleanup()
+
+        self.app = None
+
+    def recompute(self, *args):
+        return self.app.test_cli_runner().invoke(
+            args=['recompute-gpas', '--chunk-size', '2', '--checkpoint', self.checkpoint, *args]
+        )
+
+    def transcript(self, index):
+        db.session.expire_all()
+        return db.session.get(StudentTranscript, self.student_ids[index])
+
+    def test_recompute_gpas(self):
+        result = self.recompute('--workers', '0')
+
+        assert result.exit_code == 0, result.output
+
+        assert 'scores: 5/5 (100%), 5 changed' in result.output
+
+        grades = {(score.student_id, score.score): (score.percent, score.gpa) for score in Score.query}
+
+        assert grades[(self.student_ids[0], 96)] == ('A+', 4.0)
+
+        assert grades[(self.student_ids[1], 40)] == ('F', 0.0)
+
+        first = self.transcript(0)
+
+        assert (first.total_credits, first.graded_courses, first.gpa) == (5, 2, 3.48)
+
+        assert first.terms['2023-2'] == {'credits': 2, 'quality_points': 5.4, 'gpa': 2.7}
+
+        assert self.transcript(2).gpa == 3.7
+
+        assert (self.transcript(3).total_credits, self.transcript(3).gpa) == (0, 0.0)
+
+        assert not os.path.exists(self.checkpoint)
+
+        # nothing left to change on a second run
+        result = self.recompute('--workers', '0')
+
+        assert 'scores: 5/5 (100%), 0 changed' in result.output
+
+    def test_resume_from_checkpoint(self):
+        # a run interrupted after committing the chunk ending with the third score
+        last_id = db.session.execute(db.select(Score.id).order_by(Score.id).limit(1).offset(2)).scalar()
+        with open(self.checkpoint, 'w') as f:
+            json.dump({'phase': 'scores', 'last_id': last_id, 'scale_id': None, 'scale_version': 1}, f)
+
+        result = self.recompute('--workers', '1')
+
+        assert result.exit_code == 0, result.output
+
+        assert f'Resuming the scores after id {last_id}' in result.output
+
+        assert [score.percent for score in Score.query.order_by(Score.id)] == ['F', 'F', 'F', 'F', 'A-']
+
+        assert self.transcript(2).gpa == 3.7
+
+    def test_checkpoint_of_another_scale(self):
+        with open(self.checkpoint, 'w') as f:
+            json.dump({'phase': 'transcripts', 'last_id': 0, 'scale_id': 7, 'scale_version': 3}, f)
+
+        result = self.recompute('--workers', '0')
+
+        assert result.exit_code != 0
+
+        assert 'use --restart' in result.output
+
+        result = self.recompute('--workers', '0', '--restart')
+
+        assert result.exit_code == 0, result.output
+
+    def test_score_changed_during_recompute(self):
+        changed_id = db.session.execute(db.select(Score.id).order_by(Score.id).limit(1)).scalar()
+
+        def grade_then_change(scale, rows):
+            if rows[0][0] == changed_id:
+                # a lecturer regrades the first score after its chunk was read
+                db.session.execute(db.update(Score).filter_by(id=changed_id).values(score=30, percent='F', gpa=0.0))
+            return grade_chunk(scale, rows)
+
+        with mock.patch('api.utils.recompute.grade_chunk', side_effect=grade_then_change):
+            result = self.recompute('--workers', '0')
+
+        assert result.exit_code == 0, result.output
+
+        db.session.expire_all()
+        score = db.session.get(Score, changed_id)
+
+        assert (score.score, score.percent, score.gpa) == (30, 'F', 0.0)
+
+        assert self.transcript(2).gpa == 3.7
+
+    def test_transcript_created_during_recompute(self):
+        # another request created the transcript of a student after the chunk was locked
+        first_lock = StudentTranscript.lock_student_ids
+        calls = []
+
+        def lock_student_ids(student_ids):
+            calls.append(student_ids)
+            if len(calls) == 1:
+                db.session.add(StudentTranscript(student_id=self.student_ids[2], total_credits=3, quality_points=3.0,
+                                                 gpa=1.0, graded_courses=1, terms={}))
+                db.session.flush()
+                return first_lock([self.student_ids[0], self.student_ids[3]])
+            return first_lock(student_ids)
+
+        with mock.patch.object(StudentTranscript, 'lock_student_ids', side_effect=lock_student_ids):
+            result = self.recompute('--workers', '0')
+
+        assert result.exit_code == 0, result.output
+
+        assert (self.transcript(2).total_credits, self.transcript(2).gpa) == (3, 3.7)
+
+        assert (self.transcript(0).total_credits, self.transcript(0).gpa) == (5, 3.48)
+
+    def test_values_update_statement(self):
+        statement = values_update(StudentTranscript, 'student_id', [
+            {'student_id': 1, 'gpa': 3.5, 'terms': {}},
+            {'student_id': 2, 'gpa': 2.0, 'terms': {}},
+        ])
+        sql = str(statement.compile(dialect=postgresql.dialect()))
+
+        assert 'FROM (VALUES' in sql
+
+        assert 'student_transcripts.student_id = v.student_id' in sql
+
+        assert 'terms=CAST(v.terms AS JSON)' in sql
+
+        statement = values_update(Score, 'id', [{'id': 1, 'score': 80.0, 'percent': 'B+', 'gpa': 3.3}], match=('score',))
+        sql = str(statement.compile(dialect=postgresql.dialect()))
+
+        assert 'scores.id = v.id AND scores.score = v.score' in sql
+
+        # compared, not written
+        assert sql.startswith('UPDATE scores SET percent=')
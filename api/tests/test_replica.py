@@ -0,0 +1,136 @@
+import os
+import shutil
+import tempfile
+import time
+import unittest
+from .. import create_app
+from ..config.config import TestConfig
+from ..utils import db
+from ..models.user import Admin, Lecturer, Student
+from ..decorators import role_claims
+from flask_jwt_extended import create_access_token
+
+
+class TestReplica(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.primary = os.path.join(self.directory, 'primary.sqlite3')
+        self.replica = os.path.join(self.directory, 'replica.sqlite3')
+
+        class ReplicaConfig(TestConfig):
+            SQLALCHEMY_ECHO = False
+            SQLALCHEMY_DATABASE_URI = 'sqlite:///' + self.primary
+            SQLALCHEMY_BINDS = {'replica': 'sqlite:///' + self.replica}
+            READ_YOUR_WRITES_WINDOW = 1
+
+        self.app = create_app(config=ReplicaConfig)
+
+        self.client = self.app.test_client()
+
+        self.appctx = self.app.app_context()
+
+        self.appctx.push()
+
+        db.create_all()
+
+        admin = Admin(
+            name='Test Admin',
+            email='admin@aotem.com',
+            username='testadmin',
+            password_hash='password',
+            user_type='admin',
+            is_admin=True
+        )
+        admin.save()
+        lecturer = Lecturer(
+            name='Test Lecturer',
+            email='lecturer@aotem.com',
+            username='testlecturer',
+            password_hash='password',
+            staff_no='LCT@00001',
+            user_type='lecturer'
+        )
+        lecturer.save()
+        student = Student(
+            name='Test Student',
+            email='student@aotem.com',
+            username='teststudent',
+            password_hash='password',
+            matric_no='STD@00001',
+            user_type='student'
+        )
+        student.save()
+        self.student_id = student.id
+
+        self.admin_headers = {
+            'Authorization': 'Bearer {}'.format(create_access_token(identity=admin.id, additional_claims=role_claims(admin)))
+        }
+        self.lecturer_headers = {
+            'Authorization': 'Bearer {}'.format(create_access_token(identity=lecturer.id, additional_claims=role_claims(lecturer)))
+        }
+
+        self.replicate()
+
+    def tearDown(self):
+        db.session.remove()
+        for engine in db.engines.values():
+            engine.dispose()
+
+        self.appctx.pop()
+
+        # init_app registers an (empty) metadata per bind on the shared db object,
+        # drop it so the apps of the other tests do not look for a replica engine
+        db.metadatas.pop('replica', None)
+
+        shutil.rmtree(self.directory)
+
+        self.app = None
+
+        self.client = None
+
+    def replicate(self):
+        db.session.remove()
+        db.engines['replica'].dispose()
+        shutil.copyfile(self.primary, self.replica)
+
+    def rename_student(self, name):
+        # a write the replica has not received yet
+        db.session.execute(db.update(Student.__table__).where(Student.__table__.c.id == self.student_id).values(matric_no=name))
+        db.session.commit()
+
+    def get_matric_no(self, headers):
+        response = self.client.get(f'/students/{self.student_id}', headers=headers)
+        assert response.status_code == 200
+        return response.json['matric_no']
+
+    def test_reads_go_to_the_replica(self):
+        self.rename_student('STD@LAGGING')
+
+        assert self.get_matric_no(self.admin_headers) == 'STD@00001'
+
+        self.replicate()
+
+        assert self.get_matric_no(self.admin_headers) == 'STD@LAGGING'
+
+    def test_read_your_writes(self):
+        response = self.client.put(f'/students/{self.student_id}',
+            json={'name': 'Renamed Student', 'email': 'student@aotem.com'}, headers=self.admin_headers)
+
+        assert response.status_code == 200
+
+        # the writer reads its own change from the primary
+        response = self.client.get(f'/students/{self.student_id}', headers=self.admin_headers)
+
+        assert response.json['name'] == 'Renamed Student'
+
+        # other users keep reading the replica
+        response = self.client.get(f'/students/{self.student_id}', headers=self.lecturer_headers)
+
+        assert response.json['name'] == 'Test Student'
+
+        time.sleep(1.1)
+
+        response = self.client.get(f'/students/{self.student_id}', headers=self.admin_headers)
+
+        assert response.json['name'] == 'Test Student'
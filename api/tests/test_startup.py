@@ -0,0 +1,61 @@
+import os
+import subprocess
+import sys
+import unittest
+from .. import create_app
+from ..config.config import TestConfig
+from ..utils.startup import LazyGroup
+
+
+class EagerConfig(TestConfig):
+    LAZY_API_REGISTRATION = False
+
+
+class TestStartup(unittest.TestCase):
+
+    def rules(self, app):
+        return {rule.rule for rule in app.url_map.iter_rules()}
+
+    def test_lazy_api_registration(self):
+        app = create_app(config=TestConfig)
+
+        # Only the routes registered outside the API exist until the first request
+        assert '/courses/' not in self.rules(app)
+
+        assert '/metrics' in self.rules(app)
+
+        response = app.test_client().get('/swagger.json')
+
+        assert response.status_code == 200
+
+        assert '/courses/' in self.rules(app)
+
+        assert '/courses/' in response.json['paths']
+
+    def test_eager_api_registration(self):
+        app = create_app(config=EagerConfig)
+
+        assert '/courses/' in self.rules(app)
+
+    def test_migrate_commands_are_loaded_on_use(self):
+        app = create_app(config=TestConfig)
+
+        group = app.cli.commands['db']
+
+        assert isinstance(group, LazyGroup)
+
+        assert 'migrate' not in app.extensions
+
+        assert 'upgrade' in group.list_commands(None)
+
+        assert 'migrate' in app.extensions
+
+    def test_package_import_leaves_out_the_api(self):
+        # in a fresh interpreter, the test run has long imported them
+        output = subprocess.run(
+            [sys.executable, '-c', "import sys, api; print(sorted(m for m in ('flask_restx', 'api.courses.views', 'numpy') if m in sys.modules))"],
+            cwd=os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))),
+            capture_output=True, text=True, check=True, env={**os.environ, 'JWT_SECRET_KEY': 'test-secret'}
+        ).stdout
+
+        assert output.strip() == '[]'
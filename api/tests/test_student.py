@@ -0,0 +1,494 @@
+import unittest
+from contextlib import contextmanager
+from unittest import mock
+from .. import create_app
+from ..config.config import config_dict
+from ..utils import db
+from ..models.user import Admin, Lecturer, Student
+from ..models.course import Course, StudentCourse, Score
+from ..models.transcript import StudentTranscript
+from ..decorators import role_claims
+from ..utils.serializers import get_serializer
+from ..student.views import student_field, course_retrieve_field
+from flask_restx import marshal
+from flask_jwt_extended import create_access_token
+
+
+@contextmanager
+def count_queries():
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    db.event.listen(db.engine, 'before_cursor_execute', before_cursor_execute)
+    try:
+        yield statements
+    finally:
+        db.event.remove(db.engine, 'before_cursor_execute', before_cursor_execute)
+
+
+class TestStudent(unittest.TestCase):
+
+    def setUp(self):
+        self.app = create_app(config=config_dict['test'])
+
+        self.client = self.app.test_client()
+
+        self.appctx = self.app.app_context()
+
+        self.appctx.push()
+
+        db.create_all()
+
+        admin = Admin(
+            name='Test Admin',
+            email='admin@aotem.com',
+            username='testadmin',
+            password_hash='password',
+            user_type='admin',
+            is_admin=True
+        )
+        admin.save()
+
+        token = create_access_token(identity=admin.id, additional_claims=role_claims(admin))
+
+        self.headers = {
+            'Authorization': f'Bearer {token}'
+        }
+
+    def tearDown(self):
+        db.drop_all()
+
+        self.appctx.pop()
+
+        self.app = None
+
+        self.client = None
+
+    def create_students(self, count):
+        for i in range(count):
+            student = Student(
+                name=f'Student {i}',
+                email=f'student{i}@aotem.com',
+                username=f'student{i}',
+                password_hash='password',
+                matric_no=f'STD@{i:05d}',
+                user_type='student'
+            )
+            db.session.add(student)
+        db.session.commit()
+
+    def create_courses(self, count):
+        lecturer = Lecturer(
+            name='Test Lecturer',
+            email='lecturer@aotem.com',
+            username='testlecturer',
+            password_hash='password',
+            staff_no='LCT@00001',
+            user_type='lecturer'
+        )
+        lecturer.save()
+        courses = [Course(name=f'Course {i}', course_code=f'CRS{i:03d}', lecturer_id=lecturer.id) for i in range(count)]
+        db.session.add_all(courses)
+        db.session.commit()
+        return courses
+
+    def test_student_list_pagination(self):
+        self.create_students(5)
+
+        # First page
+        response = self.client.get('/students/?limit=2', headers=self.headers)
+
+        assert response.status_code == 200
+
+        assert [student['name'] for student in response.json] == ['Student 0', 'Student 1']
+
+        assert 'rel="next"' in response.headers['Link']
+
+        # Follow the cursor until the last page
+        names = [student['name'] for student in response.json]
+        while 'X-Next-Cursor' in response.headers:
+            cursor = response.headers['X-Next-Cursor']
+            response = self.client.get(f'/students/?limit=2&cursor={cursor}', headers=self.headers)
+            names += [student['name'] for student in response.json]
+
+        assert names == [f'Student {i}' for i in range(5)]
+
+        # Sparse fieldsets and filters
+        response = self.client.get('/students/?fields=name,matric_no&matric_no=STD@0000', headers=self.headers)
+
+        assert response.json[0] == {'name': 'Student 0', 'matric_no': 'STD@00000'}
+
+        assert len(response.json) == 5
+
+        response = self.client.get('/students/?matric_no=STD@00003', headers=self.headers)
+
+        assert [student['name'] for student in response.json] == ['Student 3']
+
+        # Invalid parameters
+        assert self.client.get('/students/?fields=password_hash', headers=self.headers).status_code == 400
+
+        assert self.client.get('/students/?cursor=bogus', headers=self.headers).status_code == 400
+
+    def test_student_courses_grades_query_count(self):
+        self.create_students(3)
+        courses = self.create_courses(5)
+
+        # Warm the identity cache so only the endpoint queries are counted
+        self.client.get('/students/1/courses/grades', headers=self.headers)
+
+        students = Student.query.order_by(Student.id).all()
+
+        query_counts = []
+        student_ids = [student.id for student in students]
+        course_ids = [course.id for course in courses]
+        for student_id, course_count in zip(student_ids, (1, 5)):
+            for course_id in course_ids[:course_count]:
+                db.session.add(StudentCourse(student_id=student_id, course_id=course_id))
+            db.session.add(Score(student_id=student_id, course_id=course_ids[0], score=90, percent='A'))
+            db.session.commit()
+
+            with count_queries() as statements:
+                response = self.client.get(f'/students/{student_id}/courses/grades', headers=self.headers)
+
+            assert response.status_code == 200
+
+            assert len(response.json) == course_count
+
+            assert response.json[0]['course_percent'] == 'A'
+
+            query_counts.append(len(statements))
+
+        assert query_counts == [1, 1]
+
+        assert response.json[1]['course_score'] == 'Not yet graded'
+
+        # Unknown students and students without courses
+        response = self.client.get('/students/999/courses/grades', headers=self.headers)
+
+        assert (response.status_code, response.json['message']) == (404, 'Student not found')
+
+        # the single row with a null course id of a student without courses
+        response = self.client.get(f'/students/{students[2].id}/courses/grades', headers=self.headers)
+
+        assert (response.status_code, response.json['message']) == (404, 'Student not registered for any course')
+
+    def test_score_updates_transcript(self):
+        self.create_students(1)
+        courses = self.create_courses(2)
+        courses[1].credit_units = 1
+        courses[1].term = '2023/2024-1'
+        student = Student.query.first()
+        for course in courses:
+            db.session.add(StudentCourse(student_id=student.id, course_id=course.id))
+        db.session.commit()
+        student_id, course_ids = student.id, [course.id for course in courses]
+
+        lecturer = Lecturer.query.first()
+        token = create_access_token(identity=lecturer.id, additional_claims=role_claims(lecturer))
+        lecturer_headers = {
+            'Authorization': f'Bearer {token}'
+        }
+
+        # A (4.0) on a 3 unit course, then C (2.0) on a 1 unit course
+        for course_id, score in zip(course_ids, (92, 61)):
+            response = self.client.put(f'/students/studentcourse/score/{course_id}',
+                json={'student_id': student_id, 'score': score}, headers=lecturer_headers)
+
+            assert response.status_code == 201
+
+        response = self.client.get(f'/students/{student_id}/transcript', headers=self.headers)
+
+        assert response.status_code == 200
+
+        assert response.json['gpa'] == 3.5
+
+        assert response.json['total_credits'] == 4
+
+        assert response.json['terms']['2023/2024-1']['gpa'] == 2.0
+
+        # Regrading replaces the previous contribution
+        self.client.put(f'/students/studentcourse/score/{course_ids[1]}',
+            json={'student_id': student_id, 'score': 96}, headers=lecturer_headers)
+
+        response = self.client.get(f'/students/{student_id}/transcript', headers=self.headers)
+
+        assert response.json['gpa'] == 4.0
+
+        assert response.json['graded_courses'] == 2
+
+        # Reading a course GPA does not write anything
+        with count_queries() as statements:
+            response = self.client.get(f'/students/{student_id}/{course_ids[1]}/gpa', headers=self.headers)
+
+        assert response.json['gpa'] == 4.0
+
+        assert all(statement.startswith('SELECT') for statement in statements)
+
+    def test_invalid_score_rejected(self):
+        self.create_students(1)
+        course = self.create_courses(1)[0]
+        student = Student.query.first()
+        db.session.add(StudentCourse(student_id=student.id, course_id=course.id))
+        db.session.commit()
+        student_id, course_id = student.id, course.id
+
+        lecturer = Lecturer.query.first()
+        token = create_access_token(identity=lecturer.id, additional_claims=role_claims(lecturer))
+        lecturer_headers = {
+            'Authorization': f'Bearer {token}'
+        }
+
+        for score in (250, -1, None, 'abc', float('nan'), True):
+            response = self.client.put(f'/students/studentcourse/score/{course_id}',
+                json={'student_id': student_id, 'score': score}, headers=lecturer_headers)
+
+            assert response.status_code == 400, score
+
+        response = self.client.put(f'/students/studentcourse/score/{course_id}', json=[], headers=lecturer_headers)
+
+        assert response.status_code == 400
+
+        assert Score.query.count() == 0
+
+        # numeric strings are read like the scores of a CSV upload
+        response = self.client.put(f'/students/studentcourse/score/{course_id}',
+            json={'student_id': student_id, 'score': '80'}, headers=lecturer_headers)
+
+        assert response.status_code == 201
+
+        assert Score.query.first().percent == 'B+'
+
+    def test_other_lecturer_cannot_grade(self):
+        self.create_students(1)
+        course = self.create_courses(1)[0]
+        student = Student.query.first()
+        db.session.add(StudentCourse(student_id=student.id, course_id=course.id))
+        other = Lecturer(name='Other Lecturer', email='other@aotem.com', username='otherlecturer',
+                         password_hash='password', staff_no='LCT@00002', user_type='lecturer')
+        other.save()
+        student_id, course_id = student.id, course.id
+
+        token = create_access_token(identity=other.id, additional_claims=role_claims(other))
+        other_headers = {
+            'Authorization': f'Bearer {token}'
+        }
+
+        response = self.client.put(f'/students/studentcourse/score/{course_id}',
+            json={'student_id': student_id, 'score': 80}, headers=other_headers)
+
+        assert response.status_code == 403
+
+        response = self.client.put(f'/students/studentcourse/score/{course_id}/bulk',
+            json=[{'student_id': student_id, 'score': 80}], headers=other_headers)
+
+        assert response.status_code == 403
+
+        assert Score.query.count() == 0
+
+    def test_missing_grades_not_found(self):
+        self.create_students(1)
+        course = self.create_courses(1)[0]
+        student_id = Student.query.first().id
+
+        response = self.client.get(f'/students/{student_id}/transcript', headers=self.headers)
+
+        assert (response.status_code, response.json) == (404, {'message': 'Student has no graded course'})
+
+        response = self.client.get(f'/students/{student_id}/{course.id}/gpa', headers=self.headers)
+
+        assert (response.status_code, response.json) == (404, {'message': 'Student has no score for this course'})
+
+    def test_transcript_created_concurrently(self):
+        self.create_students(1)
+        course = self.create_courses(1)[0]
+        student_id = Student.query.first().id
+
+        # another request committed the student's transcript after this one found none
+        db.session.execute(db.insert(StudentTranscript).values(
+            student_id=student_id, total_credits=3, quality_points=12.0, gpa=4.0, graded_courses=1,
+            terms={'unassigned': {'credits': 3, 'quality_points': 12.0, 'gpa': 4.0}}
+        ))
+        lock = StudentTranscript.lock
+        calls = []
+
+        def racing_lock(student_ids):
+            calls.append(student_ids)
+            return {} if len(calls) == 1 else lock(student_ids)
+
+        with mock.patch.object(StudentTranscript, 'lock', side_effect=racing_lock):
+            StudentTranscript.apply_score_changes(course, [(student_id, None, 2.0)])
+        db.session.commit()
+
+        transcript = StudentTranscript.get_by_student_id(student_id)
+
+        # the conflicting insert is skipped and the change applied to the locked row
+        assert (transcript.total_credits, transcript.graded_courses, transcript.gpa) == (6, 2, 3.0)
+
+        assert calls == [[student_id], [student_id]]
+
+    def test_score_inserted_concurrently(self):
+        self.create_students(2)
+        course = self.create_courses(1)[0]
+        student_ids = [student.id for student in Student.query.order_by(Student.id)]
+
+        # another request committed a score of the first student after this one found none
+        db.session.add(Score(student_id=student_ids[0], course_id=course.id, score=40, percent='F'))
+        db.session.query(Score).first().gpa = 0.0
+        db.session.commit()
+        lock = Score.lock
+        calls = []
+
+        def racing_lock(course_id, student_ids):
+            calls.append(student_ids)
+            return {} if len(calls) == 1 else lock(course_id, student_ids)
+
+        with mock.patch.object(Score, 'lock', side_effect=racing_lock):
+            changes, created, updated = Score.bulk_upsert(course.id, [(student_ids[0], 92, 'A', 4.0), (student_ids[1], 61, 'C', 2.0)])
+        db.session.commit()
+
+        # the conflicting row is updated and the transcript gets the gpa it replaced
+        assert (created, updated) == (1, 1)
+
+        assert changes == [(student_ids[0], 0.0, 4.0), (student_ids[1], None, 2.0)]
+
+        assert calls[1] == [student_ids[0]]
+
+        assert sorted((score.student_id, score.percent) for score in Score.query) == [(student_ids[0], 'A'), (student_ids[1], 'C')]
+
+    def test_bulk_score_upload(self):
+        self.create_students(4)
+        course = self.create_courses(1)[0]
+        course_id = course.id
+        student_ids = [student.id for student in Student.query.order_by(Student.id)]
+        for student_id in student_ids[:3]:
+            db.session.add(StudentCourse(student_id=student_id, course_id=course_id))
+        db.session.add(Score(student_id=student_ids[0], course_id=course_id, score=40, percent='F'))
+        db.session.commit()
+
+        lecturer = Lecturer.query.first()
+        token = create_access_token(identity=lecturer.id, additional_claims=role_claims(lecturer))
+        lecturer_headers = {
+            'Authorization': f'Bearer {token}'
+        }
+
+        scores = [
+            {'student_id': student_ids[0], 'score': 95},
+            {'student_id': student_ids[1], 'score': 72},
+            {'student_id': student_ids[3], 'score': 80},
+            {'student_id': student_ids[1], 'score': 10},
+            {'student_id': 'abc', 'score': 10}
+        ]
+
+        response = self.client.put(f'/students/studentcourse/score/{course_id}/bulk', json=scores, headers=lecturer_headers)
+
+        assert response.status_code == 200
+
+        assert response.json['created'] == 1
+
+        assert response.json['updated'] == 1
+
+        assert [error['row'] for error in response.json['errors']] == [3, 4, 5]
+
+        assert Score.query.filter_by(student_id=student_ids[0]).first().percent == 'A+'
+
+        assert Score.query.filter_by(student_id=student_ids[1]).first().gpa == 2.7
+
+        # CSV uploads are read from the request stream
+        csv_body = f'student_id,score\n{student_ids[2]},55\n{student_ids[1]},90\n'
+
+        response = self.client.put(f'/students/studentcourse/score/{course_id}/bulk',
+            data=csv_body, content_type='text/csv', headers=lecturer_headers)
+
+        assert (response.json['created'], response.json['updated']) == (1, 1)
+
+        assert Score.query.count() == 3
+
+        for body in (f'{student_ids[2]},55\n', b'student_id,score\n\xff\xfe,55\n', b'\xff\xfe\n'):
+            response = self.client.put(f'/students/studentcourse/score/{course_id}/bulk',
+                data=body, content_type='text/csv', headers=lecturer_headers)
+
+            assert response.status_code == 400, body
+
+        response = self.client.get(f'/students/{student_ids[1]}/transcript', headers=self.headers)
+
+        assert response.json['gpa'] == 4.0
+
+        assert response.json['graded_courses'] == 1
+
+    def test_compiled_serializer_matches_marshal(self):
+        self.create_students(3)
+        self.create_courses(2)
+        students = Student.query.all()
+        students[0].matric_no = None
+        courses = Course.query.all()
+
+        for model, objects in ((student_field, students), (course_retrieve_field, courses)):
+            assert get_serializer(model).many(objects) == marshal(objects, model)
+
+            assert get_serializer(model, ['name']).many(objects) == marshal(objects, model, mask='name')
+
+        row = {'id': 1, 'name': 'Maths', 'lecturer_id': '2', 'created_at': None}
+
+        assert get_serializer(course_retrieve_field).one(row) == marshal(row, course_retrieve_field)
+
+        db.session.rollback()
+
+    def test_read_endpoints_use_projected_queries(self):
+        self.create_students(2)
+        courses = self.create_courses(2)
+        student = Student.query.first()
+        student_id, course_ids = student.id, [course.id for course in courses]
+        for course_id in course_ids:
+            db.session.add(StudentCourse(student_id=student_id, course_id=course_id))
+        db.session.commit()
+
+        self.client.get('/students/', headers=self.headers)
+
+        with count_queries() as statements:
+            students = self.client.get('/students/', headers=self.headers)
+            student_courses = self.client.get(f'/students/{student_id}/courses', headers=self.headers)
+            course_students = self.client.get(f'/courses/{course_ids[0]}/students', headers=self.headers)
+
+        assert len(students.json) == 2
+
+        assert [course['id'] for course in student_courses.json] == course_ids
+
+        assert [student['id'] for student in course_students.json] == [str(student_id)]
+
+        assert not any('password_hash' in statement for statement in statements)
+
+        assert self.client.get('/students/999/courses', headers=self.headers).status_code == 404
+
+        assert self.client.get('/courses/999/students', headers=self.headers).status_code == 404
+
+    def test_student_conditional_get(self):
+        self.create_students(1)
+        student = Student.query.first()
+        student_id = student.id
+
+        response = self.client.get(f'/students/{student_id}', headers=self.headers)
+        etag = response.headers['ETag']
+
+        assert response.status_code == 200
+        assert response.json['matric_no'] == 'STD@00000'
+
+        with count_queries() as statements:
+            response = self.client.get(f'/students/{student_id}', headers={**self.headers, 'If-None-Match': etag})
+
+        assert response.status_code == 304
+        # the version check only, the student row itself is not loaded
+        assert len([statement for statement in statements if 'updated_at' in statement]) == 1
+        assert not [statement for statement in statements if 'matric_no' in statement]
+
+        # a change to the students table alone must still produce a new version
+        student = db.session.get(Student, student_id)
+        student.matric_no = 'STD@99999'
+        db.session.commit()
+
+        response = self.client.get(f'/students/{student_id}', headers={**self.headers, 'If-None-Match': etag})
+
+        assert response.status_code == 200
+        assert response.json['matric_no'] == 'STD@99999'
+        assert response.headers['ETag'] != etag
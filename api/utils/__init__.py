@@ -1,11 +1,24 @@
 import secrets
 import string
-import smtplib
-from email.mime.text import MIMEText
 from flask_sqlalchemy import SQLAlchemy
-from email.mime.multipart import MIMEMultipart
+from .routing import RoutingSession
+from .grading import default_scale
 
-db = SQLAlchemy()
+db = SQLAlchemy(session_options={'class_': RoutingSession})
+
+
+def dialect_insert(model):
+    """
+    Return an INSERT into model that supports on_conflict_do_nothing()/do_update().
+
+    Both Postgres and SQLite implement INSERT ... ON CONFLICT, with the
+    same construct in their SQLAlchemy dialects.
+    """
+    if db.engine.dialect.name == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+    return insert(model)
 
 
 def generate_reset_token(length):
@@ -23,10 +36,13 @@ def generate_random_string(length):
 
 def send_email(user_mail, token):
     """
-    Sends a password reset email to the specified email address.
+    Queues a password reset email to the specified user.
+
+    The email is written to the outbox and sent by the background mail
+    dispatcher, so the request does not wait on the mail server.
     """
-    sender_email = "temmyvibez15@gmail.com"
-    password = "lghbvsjfldnzitym"
+    from .mail import mail_dispatcher
+
     subject = "Password Reset Request"
     message = f""" 
     Hi {user_mail.name},
@@ -36,74 +52,18 @@ def send_email(user_mail, token):
     Regards,
     Team
     """
-    msg = MIMEMultipart()
-    msg['From'] = sender_email
-    msg['To'] = user_mail.email
-    msg['Subject'] = subject
-    msg.attach(MIMEText(message, 'plain'))
-
-    text = msg.as_string()
-    server = smtplib.SMTP('smtp.gmail.com', 587)
-    server.starttls()
-    server.login(sender_email, password)
-    server.sendmail(sender_email, user_mail.email, text)
-    server.quit()
+    return mail_dispatcher.enqueue(user_mail.email, subject, message)
 
 
 def grade(score):
-    if score >= 95:
-        return 'A+'
-    elif score >= 90:
-        return 'A'
-    elif score >= 85:
-        return 'A-'
-    elif score >= 80:
-        return 'B+'
-    elif score >= 75:
-        return 'B'
-    elif score >= 70:
-        return 'B-'
-    elif score >= 65:
-        return 'C+'
-    elif score >= 60:
-        return 'C'
-    elif score >= 55:
-        return 'C-'
-    elif score >= 50:
-        return 'D+'
-    elif score >= 45:
-        return 'D'
-    else:
-        return 'F'
+    """
+    Return the letter grade of a score on the default grading scale.
+    """
+    return default_scale.letter(score)
 
 
 def letter_grade_to_gpa(letter_grade):
     """
     Converts a letter grade to a GPA value.
     """
-    if letter_grade == "A+":
-        return 4.0
-    elif letter_grade == "A":
-        return 4.0
-    elif letter_grade == "A-":
-        return 3.7
-    elif letter_grade == "B+":
-        return 3.3
-    elif letter_grade == "B":
-        return 3.0
-    elif letter_grade == "B-":
-        return 2.7
-    elif letter_grade == "C+":
-        return 2.3
-    elif letter_grade == "C":
-        return 2.0
-    elif letter_grade == "C-":
-        return 1.7
-    elif letter_grade == "D+":
-        return 1.3
-    elif letter_grade == "D":
-        return 1.0
-    elif letter_grade == "F":
-        return 0.0
-    else:
-        return None
+    return default_scale.gpa(letter_grade)
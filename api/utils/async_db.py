@@ -0,0 +1,127 @@
+import asyncio
+from contextlib import asynccontextmanager
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+
+# async drivers used in place of the sync ones of SQLALCHEMY_DATABASE_URI
+ASYNC_DRIVERS = {
+    'postgresql': 'postgresql+asyncpg',
+    'sqlite': 'sqlite+aiosqlite',
+}
+
+
+def async_url(url):
+    """
+    Return the URL of the same database with the asyncio driver of its dialect.
+    """
+    url = make_url(url)
+    driver = ASYNC_DRIVERS.get(url.get_backend_name())
+    if driver is None:
+        raise ValueError(f'No asyncio driver known for {url.get_backend_name()}, set ASYNC_DATABASE_URL')
+    return url.set(drivername=driver)
+
+
+def async_engine_options(app, url):
+    if url.get_backend_name() == 'sqlite' and url.database in (None, '', ':memory:'):
+        return {}
+    sync_options = app.config.get('SQLALCHEMY_ENGINE_OPTIONS') or {}
+    options = {
+        'pool_size': app.config.get('ASYNC_DB_POOL_SIZE', 10),
+        'max_overflow': app.config.get('ASYNC_DB_MAX_OVERFLOW', 10),
+        'pool_timeout': sync_options.get('pool_timeout', 30),
+        'pool_recycle': sync_options.get('pool_recycle', -1),
+        'pool_pre_ping': sync_options.get('pool_pre_ping', False),
+    }
+    if url.get_backend_name() == 'sqlite':
+        # aiosqlite opens a connection, and its thread, per checkout by default
+        options['poolclass'] = AsyncAdaptedQueuePool
+    statement_timeout = app.config.get('DB_STATEMENT_TIMEOUT_MS')
+    if statement_timeout and url.get_backend_name() == 'postgresql':
+        # asyncpg takes server settings instead of libpq's options string
+        options['connect_args'] = {'server_settings': {'statement_timeout': str(statement_timeout)}}
+    return options
+
+
+class AsyncDatabase:
+    """
+    SQLAlchemy asyncio engines for the primary database and the optional replica.
+
+    The engines point at the databases of SQLALCHEMY_DATABASE_URI and
+    SQLALCHEMY_BINDS['replica'] through the asyncio driver of each dialect,
+    or at ASYNC_DATABASE_URL and ASYNC_DATABASE_REPLICA_URL when set. An
+    engine belongs to the event loop it was created in, so they are made on
+    first use and made again if the loop changes.
+
+    Sessions wait their turn on a semaphore sized to the connections the
+    pool can hand out. The pool itself is not fair: a connection put back
+    goes to whichever coroutine asks next, not to the one waiting longest,
+    which left some requests queued for seconds under load.
+    """
+
+    def __init__(self):
+        self.urls = {}
+        self.options = {}
+        self._engines = {}
+        self._slots = {}
+        self._loop = None
+
+    def init_app(self, app):
+        primary = app.config.get('ASYNC_DATABASE_URL') or app.config['SQLALCHEMY_DATABASE_URI']
+        self.urls = {None: async_url(primary)}
+        replica = app.config.get('ASYNC_DATABASE_REPLICA_URL') or (app.config.get('SQLALCHEMY_BINDS') or {}).get('replica')
+        if replica:
+            self.urls['replica'] = async_url(replica)
+        self.options = {key: async_engine_options(app, url) for key, url in self.urls.items()}
+        self._engines = {}
+        self._slots = {}
+        self._loop = None
+
+    @property
+    def has_replica(self):
+        return 'replica' in self.urls
+
+    def engine(self, bind=None):
+        loop = asyncio.get_running_loop()
+        if loop is not self._loop:
+            self._engines = {}
+            self._slots = {}
+            self._loop = loop
+        engine = self._engines.get(bind)
+        if engine is None:
+            engine = self._engines[bind] = create_async_engine(self.urls[bind], **self.options[bind])
+        return engine
+
+    def slots(self, bind=None):
+        options = self.options[bind]
+        if 'pool_size' not in options or options['max_overflow'] < 0:
+            # in-memory SQLite shares a single connection, a negative overflow sets no limit
+            return None
+        slots = self._slots.get(bind)
+        if slots is None:
+            slots = self._slots[bind] = asyncio.Semaphore(options['pool_size'] + options['max_overflow'])
+        return slots
+
+    @asynccontextmanager
+    async def session(self, bind=None):
+        """
+        Open an AsyncSession on the primary, or on the replica with bind='replica'.
+        """
+        engine = self.engine(bind)
+        slots = self.slots(bind)
+        if slots is None:
+            async with AsyncSession(engine, expire_on_commit=False) as session:
+                yield session
+            return
+        async with slots:
+            async with AsyncSession(engine, expire_on_commit=False) as session:
+                yield session
+
+    async def dispose(self):
+        engines, self._engines = self._engines, {}
+        self._slots = {}
+        for engine in engines.values():
+            await engine.dispose()
+
+
+async_db = AsyncDatabase()
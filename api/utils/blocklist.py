@@ -1 +1,145 @@
-BLOCKLIST = set()
\ No newline at end of file
+import time
+from datetime import datetime
+from sqlalchemy.exc import IntegrityError
+from . import db
+from .cache import LocalCache, LocalKeyValueClient, make_key_value_client
+from ..models.token import RevokedToken
+
+
+class SQLRevocationStore:
+    """
+    Revoked tokens kept in the revoked_tokens table.
+
+    Lookups go through the unique index on jti and expired rows are
+    deleted through the index on expires_at.
+    """
+
+    def add(self, jti, token_type, user_id, expires_at):
+        token = RevokedToken(
+            jti=jti,
+            token_type=token_type,
+            user_id=user_id,
+            expires_at=datetime.utcfromtimestamp(expires_at)
+        )
+        try:
+            token.save()
+        except IntegrityError:
+            # already revoked by another request
+            db.session.rollback()
+
+    def contains(self, jti):
+        # always ask the primary, a lagging replica would accept a token just revoked
+        return db.session.execute(
+            db.select(RevokedToken.id).filter_by(jti=jti),
+            bind_arguments={'bind': db.engine}
+        ).first() is not None
+
+    def purge_expired(self, now):
+        result = db.session.execute(
+            db.delete(RevokedToken).where(RevokedToken.expires_at < datetime.utcfromtimestamp(now))
+        )
+        db.session.commit()
+        return result.rowcount
+
+
+class KeyValueRevocationStore:
+    """
+    Revoked tokens kept in a key-value server, each key expiring with its token.
+    """
+
+    prefix = 'revoked:'
+
+    def __init__(self, client):
+        self.client = client
+
+    def add(self, jti, token_type, user_id, expires_at):
+        ttl = max(int(expires_at - time.time()), 1)
+        self.client.set(self.prefix + jti, token_type, ex=ttl)
+
+    def contains(self, jti):
+        return bool(self.client.exists(self.prefix + jti))
+
+    def purge_expired(self, now):
+        # the server expires keys on its own, only the local stand-in needs help
+        if isinstance(self.client, LocalKeyValueClient):
+            return self.client.purge_expired()
+        return 0
+
+
+class TokenBlocklist:
+    """
+    Revoked JWTs shared by every worker through a pluggable backend.
+
+    Each worker keeps a read-through cache in front of the backend: revoked
+    jtis are cached for a long time, since a revocation never goes away before
+    the token expires, while "not revoked" answers are only cached for a few
+    seconds so revocations made on other workers are picked up quickly.
+    Expired revocations are purged at most once per purge interval.
+    """
+
+    def __init__(self):
+        self.store = SQLRevocationStore()
+        self.revoked_cache = LocalCache()
+        self.not_revoked_cache = LocalCache()
+        self.purge_interval = 3600
+        self._last_purge = time.time()
+
+    def init_app(self, app):
+        backend = app.config.get('REVOCATION_BACKEND', 'sql')
+        if backend == 'sql':
+            self.store = SQLRevocationStore()
+        elif backend == 'kv':
+            self.store = KeyValueRevocationStore(make_key_value_client(app.config.get('REVOCATION_KV_URL')))
+        else:
+            raise ValueError(f'Unknown revocation backend: {backend}')
+
+        maxsize = app.config.get('REVOCATION_CACHE_MAXSIZE', 10000)
+        self.revoked_cache.configure(maxsize, app.config.get('REVOCATION_POSITIVE_TTL', 3600))
+        self.not_revoked_cache.configure(maxsize, app.config.get('REVOCATION_NEGATIVE_TTL', 5))
+        self.purge_interval = app.config.get('REVOCATION_PURGE_INTERVAL', 3600)
+
+    def revoke(self, token):
+        """
+        Revoke a decoded JWT.
+        """
+        jti = token['jti']
+        self.store.add(jti, token['type'], token.get('sub'), token['exp'])
+        self.revoked_cache.set(jti, True)
+        self.not_revoked_cache.invalidate(jti)
+        self.purge_if_due()
+
+    def is_revoked(self, jti):
+        revoked = self.cached(jti)
+        if revoked is None:
+            revoked = self.remember(jti, self.store.contains(jti))
+        return revoked
+
+    def cached(self, jti):
+        """
+        Answer from the worker caches, None when the backend has to be asked.
+        """
+        if self.revoked_cache.get(jti):
+            return True
+        if self.not_revoked_cache.get(jti):
+            return False
+        return None
+
+    def remember(self, jti, revoked):
+        """
+        Cache the answer of the backend for a jti.
+        """
+        if revoked:
+            self.revoked_cache.set(jti, True)
+        else:
+            self.not_revoked_cache.set(jti, True)
+        return revoked
+
+    def purge_if_due(self):
+        now = time.time()
+        if now - self._last_purge >= self.purge_interval:
+            self._last_purge = now
+            return self.store.purge_expired(now)
+        return 0
+
+
+token_blocklist = TokenBlocklist()
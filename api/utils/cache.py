@@ -0,0 +1,144 @@
+import threading
+import time
+from cachetools import TTLCache
+
+
+class LocalCache:
+    """
+    A bounded, thread safe, process-local cache with LRU eviction and a TTL.
+
+    Keeps hit and miss counters so the cache effectiveness can be reported.
+    """
+
+    def __init__(self, maxsize=1024, ttl=60):
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.configure(maxsize, ttl)
+
+    def configure(self, maxsize, ttl):
+        """
+        Resize the cache, dropping every entry.
+        """
+        with self._lock:
+            self._data = TTLCache(maxsize=maxsize, ttl=ttl)
+
+    def get(self, key, default=None):
+        with self._lock:
+            try:
+                value = self._data[key]
+            except KeyError:
+                self.misses += 1
+                return default
+            self.hits += 1
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = value
+
+    def get_or_load(self, key, loader):
+        """
+        Return the cached value for key, calling loader(key) on a miss.
+
+        None results are not cached.
+        """
+        value = self.get(key)
+        if value is None:
+            value = loader(key)
+            if value is not None:
+                self.set(key, value)
+        return value
+
+    def invalidate(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': len(self._data),
+                'maxsize': self._data.maxsize,
+                'ttl': self._data.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0
+            }
+
+
+class LocalKeyValueClient:
+    """
+    In-process stand-in for a key-value server such as Redis.
+
+    Implements the small subset of the redis client used by the revocation
+    store and the response cache. Data is not shared between processes,
+    so it is only meant for development and tests.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._data = {}
+
+    def _get(self, name):
+        item = self._data.get(name)
+        if item is None:
+            return None
+        if item[1] is not None and item[1] <= time.time():
+            del self._data[name]
+            return None
+        return item[0]
+
+    def set(self, name, value, ex=None):
+        with self._lock:
+            self._data[name] = (value, time.time() + ex if ex else None)
+        return True
+
+    def get(self, name):
+        with self._lock:
+            return self._get(name)
+
+    def mget(self, names):
+        with self._lock:
+            return [self._get(name) for name in names]
+
+    def incr(self, name, amount=1):
+        with self._lock:
+            value = int(self._get(name) or 0) + amount
+            self._data[name] = (value, None)
+            return value
+
+    def exists(self, name):
+        with self._lock:
+            return 0 if self._get(name) is None else 1
+
+    def purge_expired(self):
+        now = time.time()
+        with self._lock:
+            expired = [key for key, (_, expires) in self._data.items() if expires is not None and expires <= now]
+            for key in expired:
+                del self._data[key]
+        return len(expired)
+
+
+def make_key_value_client(url, setting='REVOCATION_KV_URL'):
+    """
+    Create a redis client for url, or the local stand-in when no url is given.
+    """
+    if not url:
+        return LocalKeyValueClient()
+    try:
+        import redis
+    except ImportError:
+        raise RuntimeError(f'The redis package is required to use {setting}')
+    return redis.Redis.from_url(url)
+
+
+# user_id -> (user_type, is_admin, role_version)
+user_identity_cache = LocalCache()
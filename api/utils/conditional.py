@@ -0,0 +1,58 @@
+import hashlib
+from datetime import timezone
+from http import HTTPStatus
+from flask import current_app, request
+
+
+def weak_etag(*parts):
+    """
+    Hash the parts identifying a version of a representation into an ETag value.
+    """
+    digest = hashlib.sha1('|'.join(str(part) for part in parts).encode()).hexdigest()
+    return digest[:32]
+
+
+def as_http_date(value):
+    """
+    Return a naive UTC datetime from the database as an aware one, truncated to whole seconds.
+    """
+    if value is None:
+        return None
+    return value.replace(microsecond=0, tzinfo=timezone.utc)
+
+
+def is_not_modified(etag, last_modified=None):
+    """
+    Check the request validators against the current version of a representation.
+
+    If-None-Match wins over If-Modified-Since when both are sent.
+    """
+    if request.if_none_match:
+        return request.if_none_match.contains_weak(etag)
+    if last_modified is not None and request.if_modified_since is not None:
+        return as_http_date(last_modified) <= request.if_modified_since
+    return False
+
+
+def set_validators(response, etag, last_modified=None):
+    response.set_etag(etag, weak=True)
+    if last_modified is not None:
+        response.last_modified = as_http_date(last_modified)
+    response.headers['Cache-Control'] = current_app.config['HTTP_CACHE_CONTROL']
+    return response
+
+
+def conditional_response(etag, last_modified, build):
+    """
+    Answer 304 Not Modified when the client already has this version,
+    otherwise call build() for the full response.
+
+    The validators are meant to come from a cheap query (the updated_at of a
+    row, or an aggregate over a list) so a revalidation never loads or
+    serializes the rows themselves.
+    """
+    if is_not_modified(etag, last_modified):
+        response = current_app.response_class(status=HTTPStatus.NOT_MODIFIED)
+    else:
+        response = build()
+    return set_validators(response, etag, last_modified)
@@ -0,0 +1,137 @@
+from bisect import bisect_right
+from functools import lru_cache
+from .cache import LocalCache
+
+
+@lru_cache(maxsize=None)
+def load_numpy():
+    """
+    Import numpy on first use, None when it is not installed.
+
+    Only grade_many() uses it, and importing it takes about a tenth of the
+    app's cold start, so workers that never grade a batch never load it.
+    """
+    try:
+        import numpy
+    except ImportError:
+        return None
+    return numpy
+
+
+class Scale:
+    """
+    A grading scale ready for lookups: letter bands sorted by their minimum score.
+
+    A score gets the band with the highest minimum it reaches, found with
+    a bisection instead of walking every band. The lowest band also takes
+    the scores below its minimum. grade_many() grades a whole batch with
+    one numpy.searchsorted call when numpy is installed, its arrays are
+    built on the first such call.
+    """
+
+    def __init__(self, bands, name='default', version=1, id=None):
+        bands = sorted(bands, key=lambda band: band[0])
+        if not bands:
+            raise ValueError('A grading scale needs at least one band')
+        self.id = id
+        self.name = name
+        self.version = version
+        self.minimums = [float(minimum) for minimum, _, _ in bands]
+        self.letters = [letter for _, letter, _ in bands]
+        self.gpas = [float(gpa) for _, _, gpa in bands]
+        self.gpa_by_letter = dict(zip(self.letters, self.gpas))
+        # searched in place of minimums, the lowest band takes every score below the others
+        self._bounds = [float('-inf')] + self.minimums[1:]
+        self._arrays = None
+
+    def __repr__(self):
+        return f"Scale('{self.name}', {self.version})"
+
+    @property
+    def bands(self):
+        return list(zip(self.minimums, self.letters, self.gpas))
+
+    def letter(self, score):
+        return self.letters[bisect_right(self._bounds, score) - 1]
+
+    def gpa(self, letter):
+        """
+        Return the GPA of a letter grade, None when the scale has no such letter.
+        """
+        return self.gpa_by_letter.get(letter)
+
+    def grade(self, score):
+        """
+        Return the (letter, gpa) of a single score.
+        """
+        index = bisect_right(self._bounds, score) - 1
+        return self.letters[index], self.gpas[index]
+
+    def grade_many(self, scores):
+        """
+        Return the letters and GPAs of a sequence of scores, as two lists.
+        """
+        numpy = load_numpy()
+        if numpy is None:
+            bounds = self._bounds
+            indexes = [bisect_right(bounds, score) - 1 for score in scores]
+            return [self.letters[i] for i in indexes], [self.gpas[i] for i in indexes]
+        if self._arrays is None:
+            self._arrays = numpy.array(self._bounds), numpy.array(self.letters, dtype=object), numpy.array(self.gpas)
+        bounds, letters, gpas = self._arrays
+        indexes = numpy.searchsorted(bounds, numpy.asarray(scores, dtype=float), side='right') - 1
+        return letters[indexes].tolist(), gpas[indexes].tolist()
+
+
+# the scale the API has always used, graded with when the database has no active scale
+DEFAULT_BANDS = [
+    (95, 'A+', 4.0),
+    (90, 'A', 4.0),
+    (85, 'A-', 3.7),
+    (80, 'B+', 3.3),
+    (75, 'B', 3.0),
+    (70, 'B-', 2.7),
+    (65, 'C+', 2.3),
+    (60, 'C', 2.0),
+    (55, 'C-', 1.7),
+    (50, 'D+', 1.3),
+    (45, 'D', 1.0),
+    (0, 'F', 0.0),
+]
+
+default_scale = Scale(DEFAULT_BANDS)
+
+
+class ScaleRegistry:
+    """
+    Keeps the active grading scale of the grading_scales table in memory.
+
+    The scale is loaded once per GRADING_SCALE_CACHE_TTL seconds, so
+    activating another version takes up to that long to reach the other
+    workers. The worker that activates it sees it at once.
+    """
+
+    KEY = 'active'
+
+    def __init__(self):
+        self.cache = LocalCache(maxsize=1, ttl=60)
+
+    def init_app(self, app):
+        self.cache.configure(1, app.config['GRADING_SCALE_CACHE_TTL'])
+
+    def active(self):
+        return self.cache.get_or_load(self.KEY, self.load)
+
+    def load(self, key=None):
+        from ..models.grading import GradingScale
+
+        scale = GradingScale.get_active()
+        if scale is None:
+            return default_scale
+        return scale.compile()
+
+    def invalidate(self):
+        self.cache.invalidate(self.KEY)
+
+
+grading_scales = ScaleRegistry()
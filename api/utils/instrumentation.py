@@ -0,0 +1,276 @@
+import cProfile
+import hmac
+import io
+import json
+import logging
+import os
+import pstats
+import random
+import re
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from flask import g, has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+logger = logging.getLogger(__name__)
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+WHITESPACE = re.compile(r'\s+')
+PARAMETER_LIST = re.compile(r'\((?:\s*(?:\?|%\(\w+\)s|:\w+|%s)\s*,)+\s*(?:\?|%\(\w+\)s|:\w+|%s)\s*\)')
+
+
+def statement_shape(statement):
+    """
+    Reduce a SQL statement to its shape, so IN lists of any length compare equal.
+    """
+    return PARAMETER_LIST.sub('(?)', WHITESPACE.sub(' ', statement).strip())
+
+
+class RequestMetrics:
+    """
+    What one request spent its time on.
+    """
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.phases = Counter()
+        self.queries = 0
+        self.statements = Counter()
+        self.repeated = set()
+        self.profiler = None
+
+    def add_query(self, statement, duration, threshold):
+        self.queries += 1
+        self.phases['db'] += duration
+        shape = statement_shape(statement)
+        self.statements[shape] += 1
+        if self.statements[shape] == threshold:
+            self.repeated.add(shape)
+            logger.warning('Possible N+1: statement repeated %s times in %s %s: %s',
+                threshold, request.method, request.path, shape)
+
+
+class MetricsRegistry:
+    """
+    A minimal thread safe store of counters, gauges and histograms in the Prometheus text format.
+
+    Values are per process, every uwsgi worker exposes its own series.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.counters = {}
+        self.gauges = {}
+        self.histograms = {}
+        self.help = {}
+
+    def describe(self, name, kind, text):
+        self.help[name] = (kind, text)
+
+    def inc(self, name, labels, value=1):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def set(self, name, labels, value):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self.gauges[key] = value
+
+    def observe(self, name, labels, value):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = [[0] * len(DURATION_BUCKETS), 0, 0.0]
+            for i, bound in enumerate(DURATION_BUCKETS):
+                if value <= bound:
+                    histogram[0][i] += 1
+            histogram[1] += 1
+            histogram[2] += value
+
+    def clear(self):
+        with self._lock:
+            self.counters.clear()
+            self.gauges.clear()
+            self.histograms.clear()
+
+    def render(self):
+        lines = []
+        with self._lock:
+            counters = sorted(list(self.counters.items()) + list(self.gauges.items()))
+            histograms = sorted(self.histograms.items())
+        described = set()
+
+        def header(name):
+            if name not in described and name in self.help:
+                described.add(name)
+                kind, text = self.help[name]
+                lines.append(f'# HELP {name} {text}')
+                lines.append(f'# TYPE {name} {kind}')
+
+        for (name, labels), value in counters:
+            header(name)
+            lines.append(f'{name}{format_labels(labels)} {value}')
+        for (name, labels), (buckets, count, total) in histograms:
+            header(name)
+            for bound, bucket in zip(DURATION_BUCKETS, buckets):
+                lines.append(f'{name}_bucket{format_labels(labels + (("le", repr(bound)),))} {bucket}')
+            lines.append(f'{name}_bucket{format_labels(labels + (("le", "+Inf"),))} {count}')
+            lines.append(f'{name}_count{format_labels(labels)} {count}')
+            lines.append(f'{name}_sum{format_labels(labels)} {total}')
+        return '\n'.join(lines) + '\n'
+
+
+def format_labels(labels):
+    if not labels:
+        return ''
+    escaped = (
+        '{}="{}"'.format(name, str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n'))
+        for name, value in labels
+    )
+    return '{' + ','.join(escaped) + '}'
+
+
+class Instrumentation:
+    """
+    Per-request timing, SQL statement accounting and optional sampled profiling.
+
+    Every request gets a RequestMetrics in g. SQL statements are counted and
+    timed from engine events, and code marks its auth and serialization
+    work with timer(). Phases can overlap: the queries made while checking
+    a token count towards both auth and db. When the request ends, a
+    structured log line is written and the totals are added to the
+    registry served at /metrics. The endpoint only exists once METRICS_TOKEN
+    is set, and scrapers send it as a bearer token.
+
+    With PROFILE_SAMPLE_RATE above zero that fraction of requests also runs
+    under cProfile, and the profile is written to PROFILE_DIR, or logged
+    when no directory is set.
+    """
+
+    def __init__(self):
+        self.registry = MetricsRegistry()
+        self.enabled = False
+        self.repeat_threshold = 10
+        self.sample_rate = 0.0
+        self.profile_dir = None
+        self.metrics_token = ''
+        self._listening = False
+        self.registry.describe('http_requests_total', 'counter', 'Requests handled')
+        self.registry.describe('http_request_duration_seconds', 'histogram', 'Request duration')
+        self.registry.describe('http_request_phase_seconds_total', 'counter', 'Time spent in auth, db and serialization')
+        self.registry.describe('db_queries_total', 'counter', 'SQL statements executed')
+        self.registry.describe('db_repeated_statements_total', 'counter', 'Statements repeated past the N+1 threshold')
+
+    def init_app(self, app):
+        self.enabled = app.config.get('INSTRUMENTATION_ENABLED', True)
+        self.repeat_threshold = app.config.get('SQL_REPEAT_THRESHOLD', 10)
+        self.sample_rate = app.config.get('PROFILE_SAMPLE_RATE', 0.0)
+        self.profile_dir = app.config.get('PROFILE_DIR') or None
+        self.metrics_token = app.config.get('METRICS_TOKEN', '')
+        self.registry.clear()
+        if not self.enabled:
+            return
+
+        if not self._listening:
+            event.listen(Engine, 'before_cursor_execute', self.before_cursor_execute)
+            event.listen(Engine, 'after_cursor_execute', self.after_cursor_execute)
+            self._listening = True
+
+        app.before_request(self.before_request)
+        app.after_request(self.after_request)
+        if app.config.get('METRICS_ENABLED', True) and self.metrics_token:
+            app.add_url_rule('/metrics', 'metrics', self.metrics_view)
+
+    def current(self):
+        if self.enabled and has_request_context():
+            return g.get('request_metrics')
+        return None
+
+    @contextmanager
+    def timer(self, phase):
+        """
+        Add the time spent in the block to a phase of the current request.
+        """
+        metrics = self.current()
+        if metrics is None:
+            yield
+            return
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            metrics.phases[phase] += time.perf_counter() - start
+
+    def before_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        conn.info['query_start'] = time.perf_counter()
+
+    def after_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        start = conn.info.pop('query_start', None)
+        metrics = self.current()
+        if metrics is not None and start is not None:
+            metrics.add_query(statement, time.perf_counter() - start, self.repeat_threshold)
+
+    def before_request(self):
+        metrics = g.request_metrics = RequestMetrics()
+        if self.sample_rate and random.random() < self.sample_rate:
+            metrics.profiler = cProfile.Profile()
+            metrics.profiler.enable()
+
+    def after_request(self, response):
+        metrics = g.pop('request_metrics', None)
+        if metrics is None or request.endpoint == 'metrics':
+            return response
+        duration = time.perf_counter() - metrics.start
+        if metrics.profiler is not None:
+            metrics.profiler.disable()
+            self.save_profile(metrics.profiler)
+
+        endpoint = request.endpoint or 'unknown'
+        self.registry.inc('http_requests_total', {'method': request.method, 'endpoint': endpoint, 'status': response.status_code})
+        self.registry.observe('http_request_duration_seconds', {'method': request.method, 'endpoint': endpoint}, duration)
+        for phase in ('auth', 'db', 'serialization'):
+            if metrics.phases[phase]:
+                self.registry.inc('http_request_phase_seconds_total', {'endpoint': endpoint, 'phase': phase}, metrics.phases[phase])
+        if metrics.queries:
+            self.registry.inc('db_queries_total', {'endpoint': endpoint}, metrics.queries)
+        if metrics.repeated:
+            self.registry.inc('db_repeated_statements_total', {'endpoint': endpoint}, len(metrics.repeated))
+
+        logger.info(json.dumps({
+            'event': 'request',
+            'method': request.method,
+            'path': request.path,
+            'endpoint': endpoint,
+            'status': response.status_code,
+            'duration_ms': round(duration * 1000, 3),
+            'auth_ms': round(metrics.phases['auth'] * 1000, 3),
+            'db_ms': round(metrics.phases['db'] * 1000, 3),
+            'serialization_ms': round(metrics.phases['serialization'] * 1000, 3),
+            'queries': metrics.queries,
+            'repeated_statements': len(metrics.repeated),
+        }))
+        return response
+
+    def save_profile(self, profiler):
+        if self.profile_dir:
+            name = '{}-{}.prof'.format((request.endpoint or 'unknown').replace('/', '_'), time.time_ns())
+            profiler.dump_stats(os.path.join(self.profile_dir, name))
+            return
+        output = io.StringIO()
+        pstats.Stats(profiler, stream=output).sort_stats('cumulative').print_stats(20)
+        logger.info('Profile of %s %s\n%s', request.method, request.path, output.getvalue())
+
+    def metrics_view(self):
+        supplied = request.headers.get('Authorization', '').encode()
+        if not hmac.compare_digest(supplied, f'Bearer {self.metrics_token}'.encode()):
+            return {'message': 'A valid metrics token is required'}, 401, {'WWW-Authenticate': 'Bearer'}
+        return self.registry.render(), 200, {'Content-Type': 'text/plain; version=0.0.4; charset=utf-8'}
+
+
+instrumentation = Instrumentation()
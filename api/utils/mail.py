@@ -0,0 +1,277 @@
+import atexit
+import logging
+import secrets
+import smtplib
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from email.mime.multipart import MIMEMultipart
+from email.mime.text import MIMEText
+from . import db
+from ..models.mail import OutboundEmail
+
+logger = logging.getLogger(__name__)
+
+
+class SMTPConnectionPool:
+    """
+    Keeps authenticated SMTP connections open so they can be reused between sends.
+
+    Connections idle for longer than max_idle seconds are checked with a NOOP
+    before being handed out again, broken connections are dropped.
+    """
+
+    def __init__(self, host, port, username=None, password=None, use_tls=True, size=2, max_idle=60, timeout=30):
+        self.host = host
+        self.port = port
+        self.username = username
+        self.password = password
+        self.use_tls = use_tls
+        self.size = size
+        self.max_idle = max_idle
+        self.timeout = timeout
+        self._idle = []
+        self._lock = threading.Lock()
+        self.connections_opened = 0
+
+    def _connect(self):
+        server = smtplib.SMTP(self.host, self.port, timeout=self.timeout)
+        if self.use_tls:
+            server.starttls()
+        if self.username:
+            server.login(self.username, self.password)
+        self.connections_opened += 1
+        return server
+
+    def _checkout(self):
+        while True:
+            with self._lock:
+                if not self._idle:
+                    break
+                server, last_used = self._idle.pop()
+            if time.monotonic() - last_used < self.max_idle:
+                return server
+            try:
+                if server.noop()[0] == 250:
+                    return server
+            except smtplib.SMTPException:
+                pass
+            self._close(server)
+        return self._connect()
+
+    def _close(self, server):
+        try:
+            server.quit()
+        except (smtplib.SMTPException, OSError):
+            pass
+
+    @contextmanager
+    def connection(self):
+        """
+        Borrow a connection, it is returned to the pool unless sending failed at the connection level.
+        """
+        server = self._checkout()
+        try:
+            yield server
+        except (smtplib.SMTPServerDisconnected, OSError):
+            self._close(server)
+            raise
+        else:
+            with self._lock:
+                if len(self._idle) < self.size:
+                    self._idle.append((server, time.monotonic()))
+                    return
+            self._close(server)
+
+    def close(self):
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for server, _ in idle:
+            self._close(server)
+
+
+class MailDispatcher:
+    """
+    Sends the emails queued in the outbox table from a pool of background threads.
+
+    Requests only insert an OutboundEmail row. The worker threads, started on
+    the first enqueued email so they run in the uwsgi worker and not in the
+    master, claim batches of due emails and send each batch over one pooled
+    SMTP connection. Failed sends are retried with exponential backoff until
+    MAIL_MAX_ATTEMPTS is reached. Several processes can share the outbox,
+    every batch is claimed with a single conditional UPDATE. Without SMTP
+    credentials the workers are never started and the emails wait in the
+    outbox.
+    """
+
+    def __init__(self):
+        self.app = None
+        self.pool = None
+        self._wakeup = threading.Event()
+        self._stopping = threading.Event()
+        self._threads = []
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        self.stop()
+        self.app = app
+        config = app.config
+        self.sender = config['MAIL_DEFAULT_SENDER']
+        self.enabled = config['MAIL_DISPATCH_ENABLED'] and bool(config['MAIL_USERNAME'] and config['MAIL_PASSWORD'])
+        if config['MAIL_DISPATCH_ENABLED'] and not self.enabled:
+            logger.warning('MAIL_USERNAME and MAIL_PASSWORD are not set, emails stay in the outbox')
+        self.workers = config['MAIL_WORKERS']
+        self.batch_size = config['MAIL_BATCH_SIZE']
+        self.max_attempts = config['MAIL_MAX_ATTEMPTS']
+        self.retry_backoff = config['MAIL_RETRY_BACKOFF']
+        self.poll_interval = config['MAIL_POLL_INTERVAL']
+        self.lease = config['MAIL_CLAIM_LEASE']
+        self.pool = SMTPConnectionPool(
+            config['MAIL_SERVER'],
+            config['MAIL_PORT'],
+            username=config['MAIL_USERNAME'],
+            password=config['MAIL_PASSWORD'],
+            use_tls=config['MAIL_USE_TLS'],
+            size=config['MAIL_POOL_SIZE']
+        )
+
+    def enqueue(self, recipient, subject, body):
+        """
+        Add an email to the outbox and wake the workers once it is committed.
+        """
+        email = OutboundEmail(recipient=recipient, subject=subject, body=body)
+        email.save()
+        self.wake()
+        return email
+
+    def wake(self):
+        if not self.enabled:
+            return
+        self.start()
+        self._wakeup.set()
+
+    def start(self):
+        with self._lock:
+            if self._threads:
+                return
+            self._stopping.clear()
+            for i in range(self.workers):
+                thread = threading.Thread(target=self._run, name=f'mail-dispatcher-{i}', daemon=True)
+                thread.start()
+                self._threads.append(thread)
+
+    def stop(self):
+        with self._lock:
+            threads, self._threads = self._threads, []
+        self._stopping.set()
+        self._wakeup.set()
+        for thread in threads:
+            thread.join(timeout=5)
+        if self.pool:
+            self.pool.close()
+
+    def _run(self):
+        while not self._stopping.is_set():
+            try:
+                with self.app.app_context():
+                    sent = self.dispatch_batch()
+            except Exception:
+                logger.exception('Mail dispatcher failed')
+                sent = 0
+            if not sent:
+                self._wakeup.wait(self.poll_interval)
+                self._wakeup.clear()
+
+    def claim_batch(self):
+        """
+        Claim up to batch_size due emails for this worker.
+
+        Emails stuck in "sending" past their lease, because a worker died,
+        become claimable again.
+        """
+        now = datetime.utcnow()
+        token = secrets.token_hex(16)
+        due = db.select(OutboundEmail.id).where(db.or_(
+            db.and_(OutboundEmail.status == 'pending', OutboundEmail.next_attempt_at <= now),
+            db.and_(OutboundEmail.status == 'sending', OutboundEmail.locked_until < now)
+        )).order_by(OutboundEmail.id).limit(self.batch_size)
+        ids = [row.id for row in db.session.execute(due)]
+        if not ids:
+            db.session.commit()
+            return []
+
+        db.session.execute(
+            db.update(OutboundEmail)
+            .where(OutboundEmail.id.in_(ids), db.or_(
+                OutboundEmail.status == 'pending',
+                db.and_(OutboundEmail.status == 'sending', OutboundEmail.locked_until < now)
+            ))
+            .values(status='sending', claim_token=token, locked_until=now + timedelta(seconds=self.lease)),
+            execution_options={'synchronize_session': False}
+        )
+        db.session.commit()
+        return OutboundEmail.query.filter_by(claim_token=token, status='sending').order_by(OutboundEmail.id).all()
+
+    def dispatch_batch(self):
+        """
+        Claim and send one batch, returns the number of emails handled.
+        """
+        emails = self.claim_batch()
+        if not emails:
+            return 0
+
+        pending = list(emails)
+        try:
+            with self.pool.connection() as server:
+                while pending:
+                    email = pending[0]
+                    try:
+                        server.sendmail(self.sender, email.recipient, self.build_message(email))
+                    except (smtplib.SMTPRecipientsRefused, smtplib.SMTPDataError, smtplib.SMTPSenderRefused) as error:
+                        self.mark_failed(email, error)
+                    else:
+                        email.status = 'sent'
+                        email.sent_at = datetime.utcnow()
+                        email.claim_token = None
+                    pending.pop(0)
+        except (smtplib.SMTPException, OSError) as error:
+            # the connection itself failed, retry everything that was not sent
+            for email in pending:
+                self.mark_failed(email, error)
+        db.session.commit()
+        return len(emails)
+
+    def mark_failed(self, email, error):
+        email.attempts += 1
+        email.last_error = str(error)
+        email.claim_token = None
+        if email.attempts >= self.max_attempts:
+            email.status = 'failed'
+            logger.error('Giving up on email %s to %s: %s', email.id, email.recipient, error)
+        else:
+            email.status = 'pending'
+            email.next_attempt_at = datetime.utcnow() + timedelta(seconds=self.retry_backoff * 2 ** (email.attempts - 1))
+
+    def build_message(self, email):
+        msg = MIMEMultipart()
+        msg['From'] = self.sender
+        msg['To'] = email.recipient
+        msg['Subject'] = email.subject
+        msg.attach(MIMEText(email.body, 'plain'))
+        return msg.as_string()
+
+    def dispatch_pending(self):
+        """
+        Send every due email from the calling thread, returns the number handled.
+        """
+        total = 0
+        while True:
+            handled = self.dispatch_batch()
+            if not handled:
+                return total
+            total += handled
+
+
+mail_dispatcher = MailDispatcher()
+atexit.register(mail_dispatcher.stop)
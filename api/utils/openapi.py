@@ -0,0 +1,128 @@
+import gzip
+import hashlib
+import json
+import logging
+import os
+from http import HTTPStatus
+import click
+from flask import current_app, request, send_file
+from flask.cli import with_appcontext
+
+logger = logging.getLogger(__name__)
+
+SPEC_FILE = 'swagger.json'
+GZIP_FILE = 'swagger.json.gz'
+MANIFEST_FILE = 'manifest.json'
+
+
+def render_spec(api):
+    """
+    Generate the Swagger document of the API as canonical JSON bytes.
+
+    Keys are sorted so an unchanged API always gives the same bytes, and
+    with them the same ETag.
+    """
+    from flask_restx.swagger import Swagger
+
+    with current_app.test_request_context('/'):
+        spec = Swagger(api).as_dict()
+    return json.dumps(spec, sort_keys=True, separators=(',', ':')).encode()
+
+
+def write_artifact(api, directory):
+    """
+    Write the spec, its gzip encoding and a manifest into directory, returns the manifest.
+    """
+    body = render_spec(api)
+    manifest = {
+        'api_version': api.version,
+        'etag': hashlib.sha256(body).hexdigest()[:32],
+        'size': len(body),
+    }
+    # mtime=0 keeps the gzip bytes reproducible
+    files = {
+        SPEC_FILE: body,
+        GZIP_FILE: gzip.compress(body, compresslevel=9, mtime=0),
+        MANIFEST_FILE: json.dumps(manifest, indent=2).encode() + b'\n',
+    }
+    os.makedirs(directory, exist_ok=True)
+    # the manifest goes last, a reader never sees it describe files not written yet
+    for name, data in files.items():
+        path = os.path.join(directory, name)
+        with open(path + '.tmp', 'wb') as f:
+            f.write(data)
+        os.replace(path + '.tmp', path)
+    return manifest
+
+
+def load_manifest(directory):
+    try:
+        with open(os.path.join(directory, MANIFEST_FILE)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+class SpecArtifact:
+    """
+    Serves the prebuilt Swagger document in place of flask_restx's live one.
+
+    flask_restx renders the document from every model and @doc of the
+    namespaces on the first /swagger.json of each process. The artifact
+    written by "flask build-openapi" is sent from disk instead, through
+    the server's file wrapper when it has one, gzip-encoded for clients
+    that accept it, with a strong ETag so pollers revalidate with a 304.
+    """
+
+    def __init__(self, directory, manifest):
+        self.directory = directory
+        self.manifest = manifest
+
+    def view(self):
+        etag = self.manifest['etag']
+        if request.accept_encodings['gzip']:
+            response = send_file(os.path.join(self.directory, GZIP_FILE), mimetype='application/json',
+                                 etag=f'{etag}-gzip', conditional=True, max_age=None)
+            response.headers['Content-Encoding'] = 'gzip'
+        else:
+            response = send_file(os.path.join(self.directory, SPEC_FILE), mimetype='application/json',
+                                 etag=etag, conditional=True, max_age=None)
+        response.vary.add('Accept-Encoding')
+        response.headers['Cache-Control'] = current_app.config['OPENAPI_CACHE_CONTROL']
+        return response
+
+
+def spec_not_built():
+    return {
+        'message': 'The API specification has not been built, run "flask build-openapi"'
+    }, HTTPStatus.SERVICE_UNAVAILABLE
+
+
+def init_spec(app, api):
+    """
+    Serve the spec artifact from OPENAPI_ARTIFACT_DIR at the specs endpoint.
+
+    Without an artifact only OPENAPI_LIVE_FALLBACK apps (DevConfig) keep
+    generating the document live, the others answer 503.
+    """
+    directory = app.config['OPENAPI_ARTIFACT_DIR']
+    manifest = load_manifest(directory)
+    if manifest is not None:
+        if manifest.get('api_version') != api.version:
+            logger.warning('The API specification in %s is for version %s, the API is %s',
+                directory, manifest.get('api_version'), api.version)
+        app.view_functions['specs'] = SpecArtifact(directory, manifest).view
+    elif not app.config['OPENAPI_LIVE_FALLBACK']:
+        logger.warning('No API specification in %s, /swagger.json answers 503', directory)
+        app.view_functions['specs'] = spec_not_built
+
+
+@click.command('build-openapi')
+@click.option('--output', help='Directory to write to, defaults to OPENAPI_ARTIFACT_DIR')
+@with_appcontext
+def build_openapi_command(output):
+    """Build the Swagger document served at /swagger.json."""
+    current_app.ensure_setup()
+    directory = output or current_app.config['OPENAPI_ARTIFACT_DIR']
+    manifest = write_artifact(current_app.extensions['api'], directory)
+    click.echo(f"Wrote {manifest['size']} bytes to {directory}, ETag {manifest['etag']}")
@@ -0,0 +1,113 @@
+import base64
+import binascii
+import json
+from datetime import datetime
+from http import HTTPStatus
+from urllib.parse import urlencode
+from flask import current_app, request
+from flask_restx import abort
+from .serializers import get_serializer, json_response
+
+
+def encode_cursor(last_id):
+    """
+    Encode the id of the last row of a page into an opaque cursor.
+    """
+    payload = json.dumps({'id': last_id}, separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(payload).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """
+    Decode a cursor created by encode_cursor back into the last seen id.
+    """
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        last_id = json.loads(base64.urlsafe_b64decode(padded))['id']
+    except (binascii.Error, ValueError, KeyError, TypeError):
+        abort(HTTPStatus.BAD_REQUEST, 'Invalid cursor')
+    if not isinstance(last_id, int):
+        abort(HTTPStatus.BAD_REQUEST, 'Invalid cursor')
+    return last_id
+
+
+def get_limit():
+    """
+    Read ?limit= from the query string, capped at PAGINATION_MAX_LIMIT.
+    """
+    default = current_app.config['PAGINATION_DEFAULT_LIMIT']
+    maximum = current_app.config['PAGINATION_MAX_LIMIT']
+    limit = request.args.get('limit', default, type=int)
+    if limit is None or limit < 1:
+        abort(HTTPStatus.BAD_REQUEST, 'limit must be a positive integer')
+    return min(limit, maximum)
+
+
+def get_fields(model):
+    """
+    Read the ?fields= sparse fieldset, returning the selected field names.
+
+    Every field of the model is returned when the parameter is absent.
+    """
+    fields = request.args.get('fields')
+    if not fields:
+        return list(model.keys())
+    selected = [field.strip() for field in fields.split(',') if field.strip()]
+    unknown = [field for field in selected if field not in model]
+    if unknown:
+        abort(HTTPStatus.BAD_REQUEST, 'Unknown fields: {}'.format(', '.join(unknown)))
+    return selected
+
+
+def get_datetime_arg(name):
+    """
+    Read an ISO 8601 datetime from the query string.
+    """
+    value = request.args.get(name)
+    if value is None:
+        return None
+    try:
+        return datetime.fromisoformat(value)
+    except ValueError:
+        abort(HTTPStatus.BAD_REQUEST, f'{name} must be an ISO 8601 datetime')
+
+
+def keyset_paginate(query, column, limit):
+    """
+    Return one page of query ordered by column, starting after ?cursor=.
+
+    The next page is found by seeking past the last id instead of using an
+    offset, so every page costs the same index range scan.
+
+    Returns:
+        (items, next_cursor) where next_cursor is None on the last page
+    """
+    cursor = request.args.get('cursor')
+    if cursor:
+        query = query.filter(column > decode_cursor(cursor))
+
+    items = query.order_by(column).limit(limit + 1).all()
+    if len(items) > limit:
+        items = items[:limit]
+        return items, encode_cursor(getattr(items[-1], column.key))
+    return items, None
+
+
+def next_page_url(next_cursor):
+    args = request.args.to_dict()
+    args['cursor'] = next_cursor
+    return '{}?{}'.format(request.base_url, urlencode(args))
+
+
+def page_response(items, model, fields, next_cursor):
+    """
+    Serialize a page and attach the next page links.
+
+    The body stays a plain list, the next page is advertised through the
+    Link and X-Next-Cursor headers.
+    """
+    headers = {}
+    if next_cursor:
+        headers['Link'] = '<{}>; rel="next"'.format(next_page_url(next_cursor))
+        headers['X-Next-Cursor'] = next_cursor
+    return json_response(get_serializer(model, fields).many(items), HTTPStatus.OK, headers)
@@ -0,0 +1,149 @@
+import atexit
+import logging
+import multiprocessing
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from werkzeug.security import generate_password_hash, check_password_hash
+from .instrumentation import instrumentation
+
+logger = logging.getLogger(__name__)
+
+
+class PasswordHasherBusy(Exception):
+    """
+    Raised when every hashing slot stayed taken for PASSWORD_HASH_QUEUE_TIMEOUT seconds.
+    """
+
+
+class PasswordHasher:
+    """
+    Hashes and checks passwords on a bounded pool of worker processes.
+
+    Hashing is deliberately slow and CPU bound. A worker serving requests
+    on several threads (uwsgi threads, the WSGI threads of asgi.py) can send
+    it to a process pool created on first use, after uwsgi forked, so the
+    other threads keep running meanwhile. At most workers + max_pending
+    operations are admitted at a time, later callers wait up to
+    queue_timeout seconds for a slot and then get PasswordHasherBusy,
+    which the API answers with 503 and Retry-After. With workers set to 0,
+    the default, the hashing runs inline: a single threaded worker, as
+    uwsgi.ini runs, waits for the hash either way.
+
+    The method string carries both algorithm and cost, e.g.
+    "pbkdf2:sha256:600000". Hashes made with another method are reported by
+    needs_rehash() so they can be upgraded when the user next logs in.
+    """
+
+    def __init__(self):
+        self.method = 'pbkdf2:sha256:260000'
+        self.salt_length = 16
+        self.workers = 0
+        self.max_pending = 0
+        self.queue_timeout = 5
+        self.start_method = 'spawn'
+        self.python = ''
+        self._executor = None
+        self._slots = None
+        self._lock = threading.Lock()
+        self.in_flight = 0
+        self.rejected = 0
+
+    def init_app(self, app):
+        self.shutdown()
+        self.method = app.config['PASSWORD_HASH_METHOD']
+        self.salt_length = app.config['PASSWORD_SALT_LENGTH']
+        self.workers = app.config['PASSWORD_HASH_WORKERS']
+        self.max_pending = app.config['PASSWORD_HASH_MAX_PENDING']
+        self.queue_timeout = app.config['PASSWORD_HASH_QUEUE_TIMEOUT']
+        self.start_method = app.config['PASSWORD_HASH_START_METHOD']
+        self.python = app.config['PASSWORD_HASH_PYTHON']
+        self._slots = threading.BoundedSemaphore(self.workers + self.max_pending) if self.workers else None
+        self.in_flight = 0
+        self.rejected = 0
+        instrumentation.registry.describe('password_hash_queue_depth', 'gauge', 'Password hashing operations admitted and not finished')
+        instrumentation.registry.describe('password_hash_rejected_total', 'counter', 'Password hashing operations rejected for lack of a slot')
+        instrumentation.registry.describe('password_hash_duration_seconds', 'histogram', 'Password hashing time, queueing included')
+
+    def hash(self, password):
+        return self._run(generate_password_hash, password, self.method, self.salt_length)
+
+    def verify(self, pwhash, password):
+        return self._run(check_password_hash, pwhash, password)
+
+    def needs_rehash(self, pwhash):
+        return pwhash.split('$', 1)[0] != self.method
+
+    def _get_executor(self):
+        with self._lock:
+            if self._executor is None:
+                context = multiprocessing.get_context(self.start_method)
+                if self.python:
+                    # spawn and forkserver start sys.executable, the uwsgi binary under uwsgi
+                    context.set_executable(self.python)
+                self._executor = ProcessPoolExecutor(max_workers=self.workers, mp_context=context)
+            return self._executor
+
+    def _reset_executor(self, executor):
+        with self._lock:
+            if self._executor is executor:
+                self._executor = None
+        executor.shutdown(wait=False)
+
+    def _track(self, delta):
+        with self._lock:
+            self.in_flight += delta
+            depth = self.in_flight
+        instrumentation.registry.set('password_hash_queue_depth', {}, depth)
+
+    def _run(self, fn, *args):
+        start = time.perf_counter()
+        with instrumentation.timer('auth'):
+            if not self.workers:
+                result = fn(*args)
+            else:
+                result = self._submit(fn, *args)
+        instrumentation.registry.observe('password_hash_duration_seconds', {'operation': fn.__name__}, time.perf_counter() - start)
+        return result
+
+    def _submit(self, fn, *args):
+        if not self._slots.acquire(timeout=self.queue_timeout):
+            with self._lock:
+                self.rejected += 1
+            instrumentation.registry.inc('password_hash_rejected_total', {})
+            raise PasswordHasherBusy()
+
+        self._track(1)
+        try:
+            executor = self._get_executor()
+            try:
+                return executor.submit(fn, *args).result()
+            except BrokenProcessPool:
+                # a worker died, start a fresh pool and retry once
+                logger.exception('Password hashing pool broke, restarting it')
+                self._reset_executor(executor)
+                return self._get_executor().submit(fn, *args).result()
+        finally:
+            self._track(-1)
+            self._slots.release()
+
+    def shutdown(self):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=True)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'method': self.method,
+                'workers': self.workers,
+                'max_pending': self.max_pending,
+                'in_flight': self.in_flight,
+                'rejected': self.rejected
+            }
+
+
+password_hasher = PasswordHasher()
+atexit.register(password_hasher.shutdown)
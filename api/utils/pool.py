@@ -0,0 +1,108 @@
+import logging
+import threading
+import time
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.pool import QueuePool
+
+logger = logging.getLogger(__name__)
+
+
+class PoolStats:
+    """
+    Counters of how long requests wait for a database connection.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.checkouts = 0
+        self.timeouts = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+        self.peak_checked_out = 0
+        self.peak_overflow = 0
+
+    def record(self, wait, checked_out, overflow, timed_out=False):
+        with self._lock:
+            self.checkouts += 1
+            self.wait_total += wait
+            self.wait_max = max(self.wait_max, wait)
+            self.peak_checked_out = max(self.peak_checked_out, checked_out)
+            self.peak_overflow = max(self.peak_overflow, overflow)
+            if timed_out:
+                self.timeouts += 1
+
+    def as_dict(self):
+        with self._lock:
+            return {
+                'checkouts': self.checkouts,
+                'timeouts': self.timeouts,
+                'wait_avg_ms': round(self.wait_total * 1000 / self.checkouts, 3) if self.checkouts else 0.0,
+                'wait_max_ms': round(self.wait_max * 1000, 3),
+                'peak_checked_out': self.peak_checked_out,
+                'peak_overflow': self.peak_overflow
+            }
+
+
+class InstrumentedQueuePool(QueuePool):
+    """
+    A QueuePool that measures the time spent waiting for a connection.
+
+    Checkouts slower than slow_checkout seconds and checkout timeouts are
+    logged with the pool status, and the status is also logged every
+    log_interval seconds while the pool is in use.
+    """
+
+    slow_checkout = 0.1
+    log_interval = 300
+
+    def __init__(self, creator, **kw):
+        super().__init__(creator, **kw)
+        self.stats = PoolStats()
+        self._last_log = time.monotonic()
+
+    def recreate(self):
+        # keep the counters when the engine is disposed
+        pool = super().recreate()
+        pool.stats = self.stats
+        return pool
+
+    def _do_get(self):
+        start = time.monotonic()
+        try:
+            connection = super()._do_get()
+        except PoolTimeoutError:
+            self.stats.record(time.monotonic() - start, self.checkedout(), max(self.overflow(), 0), timed_out=True)
+            logger.error('Timed out waiting for a database connection: %s', pool_status(self))
+            raise
+
+        now = time.monotonic()
+        wait = now - start
+        self.stats.record(wait, self.checkedout(), max(self.overflow(), 0))
+        if wait >= self.slow_checkout:
+            logger.warning('Waited %.0f ms for a database connection: %s', wait * 1000, pool_status(self))
+        elif now - self._last_log >= self.log_interval:
+            self._last_log = now
+            logger.info('Database pool: %s', pool_status(self))
+        return connection
+
+
+def pool_status(pool):
+    """
+    Describe the current state of a connection pool.
+    """
+    status = {'pool': type(pool).__name__}
+    if isinstance(pool, QueuePool):
+        status.update({
+            'size': pool.size(),
+            'max_overflow': pool._max_overflow,
+            'timeout': pool.timeout(),
+            'checked_out': pool.checkedout(),
+            'idle': pool.checkedin(),
+            # negative until every pooled connection has been opened once
+            'overflow': max(pool.overflow(), 0)
+        })
+    else:
+        status['status'] = pool.status()
+    if isinstance(pool, InstrumentedQueuePool):
+        status.update(pool.stats.as_dict())
+    return status
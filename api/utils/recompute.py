@@ -0,0 +1,311 @@
+import json
+import multiprocessing
+import os
+import time
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+import click
+from flask import current_app
+from flask.cli import with_appcontext
+from . import db
+from .grading import grading_scales
+
+
+def grade_chunk(scale, rows):
+    """
+    Grade (id, score, percent, gpa, scale_id) rows, returns the rows whose grade changes.
+
+    Runs in the worker processes, the result lists {'id', 'score', 'percent', 'gpa', 'scale_id'}
+    dicts, score being the one graded.
+    """
+    letters, gpas = scale.grade_many([row[1] for row in rows])
+    return [
+        {'id': row[0], 'score': row[1], 'percent': letter, 'gpa': gpa, 'scale_id': scale.id}
+        for row, letter, gpa in zip(rows, letters, gpas)
+        if (row[2], row[3], row[4]) != (letter, gpa, scale.id)
+    ]
+
+
+def values_update(model, key, rows, match=()):
+    """
+    Build an UPDATE ... FROM (VALUES ...) of the rows joined on the key column.
+
+    The match columns are compared instead of written, e.g. the score a
+    grade was computed from. The values are cast to the types of the
+    columns they are written to, Postgres would otherwise guess them from
+    the literals.
+    """
+    table = model.__table__
+    names = [key, *match] + [name for name in rows[0] if name != key and name not in match]
+    values = db.values(
+        *[db.column(name, table.c[name].type) for name in names], name='v'
+    ).data([tuple(row[name] for name in names) for row in rows])
+    return (
+        db.update(table)
+        .where(*[table.c[name] == values.c[name] for name in names[:1 + len(match)]])
+        .values({name: db.cast(values.c[name], table.c[name].type) for name in names[1 + len(match):]})
+    )
+
+
+def update_from_values(model, key, rows, match=()):
+    """
+    Write many rows of model by their key column, nothing is committed.
+
+    A row whose match columns no longer hold the given values is left
+    alone. On Postgres this is a single values_update() statement, other
+    databases get an executemany UPDATE.
+    """
+    if not rows:
+        return
+    if db.session.get_bind().dialect.name == 'postgresql':
+        db.session.execute(values_update(model, key, rows, match))
+        return
+    table = model.__table__
+    compared = [key, *match]
+    statement = (
+        db.update(table)
+        .where(*[table.c[name] == db.bindparam(f'b_{name}') for name in compared])
+        .values({name: db.bindparam(f'b_{name}') for name in rows[0] if name not in compared})
+    )
+    db.session.execute(statement, [{f'b_{name}': value for name, value in row.items()} for row in rows])
+
+
+def transcript_rows(student_ids, totals, existing):
+    """
+    Build the transcript rows of a chunk of students from their per-term totals.
+
+    Args:
+        student_ids (list): The students of the chunk
+        totals (list): (student_id, term, credits, quality_points, courses) rows
+        existing (set): Students of the chunk with a transcript, every one with totals among them
+
+    Returns:
+        The transcript rows to write, students without scores get an
+        emptied transcript when they have one
+    """
+    transcripts = {}
+    for student_id, term, credits, quality_points, courses in totals:
+        transcript = transcripts.setdefault(student_id, {
+            'student_id': student_id, 'total_credits': 0, 'quality_points': 0.0, 'graded_courses': 0, 'terms': {}
+        })
+        transcript['total_credits'] += credits
+        transcript['quality_points'] += quality_points
+        transcript['graded_courses'] += courses
+        transcript['terms'][term or 'unassigned'] = {
+            'credits': credits,
+            'quality_points': quality_points,
+            'gpa': round(quality_points / credits, 2) if credits else 0.0
+        }
+
+    rows = []
+    for student_id in student_ids:
+        if student_id not in existing:
+            continue
+        transcript = transcripts.get(student_id) or {
+            'student_id': student_id, 'total_credits': 0, 'quality_points': 0.0, 'graded_courses': 0, 'terms': {}
+        }
+        total_credits = transcript['total_credits']
+        transcript['gpa'] = round(transcript['quality_points'] / total_credits, 2) if total_credits else 0.0
+        rows.append(transcript)
+    return rows
+
+
+class Checkpoint:
+    """
+    Progress of a recomputation, saved after every committed chunk.
+
+    Holds the phase ('scores' then 'transcripts'), the last id written in
+    it and the grading scale the run started with. The file is replaced
+    atomically and removed once the run completes.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.state = None
+
+    def load(self):
+        try:
+            with open(self.path) as f:
+                self.state = json.load(f)
+        except (OSError, ValueError):
+            self.state = None
+        return self.state
+
+    def save(self, **state):
+        self.state = {**(self.state or {}), **state}
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        with open(self.path + '.tmp', 'w') as f:
+            json.dump(self.state, f)
+        os.replace(self.path + '.tmp', self.path)
+
+    def clear(self):
+        self.state = None
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+
+class Progress:
+    def __init__(self, phase, total):
+        self.phase = phase
+        self.total = total
+        self.done = 0
+        self.changed = 0
+        self.start = time.perf_counter()
+
+    def advance(self, rows, changed):
+        self.done += rows
+        self.changed += changed
+        elapsed = time.perf_counter() - self.start
+        percent = self.done / self.total * 100 if self.total else 100.0
+        click.echo(f'{self.phase}: {self.done}/{self.total} ({percent:.0f}%), {self.changed} changed, '
+                   f'{self.done / elapsed if elapsed else 0:.0f} rows/s')
+
+
+def completed(result):
+    future = Future()
+    future.set_result(result)
+    return future
+
+
+def recompute_scores(scale, checkpoint, chunk_size, executor, in_flight):
+    """
+    Regrade every score with scale, chunk by chunk in id order.
+
+    Chunks are read with keyset queries and graded in the worker
+    processes while the next ones are read. The changed rows of a chunk
+    are written and committed in id order, then the checkpoint records
+    its last id. A score changed since its chunk was read is not
+    written: the lecturer's write graded it with the same scale.
+    """
+    from ..models.course import Score
+
+    last_id = checkpoint.state['last_id']
+    progress = Progress('scores', db.session.execute(
+        db.select(db.func.count(Score.id)).where(Score.id > last_id)
+    ).scalar())
+    pending = deque()
+
+    def write(rows, future):
+        changes = future.result()
+        update_from_values(Score, 'id', changes, match=('score',))
+        db.session.commit()
+        checkpoint.save(last_id=rows[-1][0])
+        progress.advance(len(rows), len(changes))
+
+    while True:
+        rows = [tuple(row) for row in db.session.execute(
+            db.select(Score.id, Score.score, Score.percent, Score.gpa, Score.scale_id)
+            .where(Score.id > last_id).order_by(Score.id).limit(chunk_size)
+        )]
+        if not rows:
+            break
+        last_id = rows[-1][0]
+        future = executor.submit(grade_chunk, scale, rows) if executor else completed(grade_chunk(scale, rows))
+        pending.append((rows, future))
+        while len(pending) > in_flight:
+            write(*pending.popleft())
+    while pending:
+        write(*pending.popleft())
+    return progress
+
+
+def recompute_transcripts(checkpoint, chunk_size):
+    """
+    Rebuild every student transcript from the stored score GPAs.
+
+    Each chunk of students is summed per term with one grouped query over
+    their id range and written with one UPDATE. The transcripts are locked
+    before their scores are summed, like StudentTranscript.apply_score_changes
+    locks them, so a score written meanwhile is folded in after the rebuild
+    rather than lost under it. Students with scores but no transcript get
+    an empty one first, locked like the others.
+    """
+    from ..models.course import Course, Score
+    from ..models.transcript import StudentTranscript
+    from ..models.user import Student
+
+    students = Student.__table__
+    last_id = checkpoint.state['last_id']
+    progress = Progress('transcripts', db.session.execute(
+        db.select(db.func.count(students.c.id)).where(students.c.id > last_id)
+    ).scalar())
+
+    while True:
+        student_ids = db.session.execute(
+            db.select(students.c.id).where(students.c.id > last_id).order_by(students.c.id).limit(chunk_size)
+        ).scalars().all()
+        if not student_ids:
+            break
+        low, high = last_id, student_ids[-1]
+        existing = StudentTranscript.lock_student_ids(student_ids)
+        while True:
+            totals = db.session.execute(
+                db.select(
+                    Score.student_id, Course.term,
+                    db.func.sum(Course.credit_units), db.func.sum(Score.gpa * Course.credit_units), db.func.count(Score.id)
+                )
+                .join(Course, Course.id == Score.course_id)
+                .where(Score.student_id > low, Score.student_id <= high, Score.gpa.isnot(None))
+                .group_by(Score.student_id, Course.term)
+            ).all()
+            missing = sorted({row[0] for row in totals} - existing)
+            if not missing:
+                break
+            # summed again once they are locked, their first score may have come with them
+            StudentTranscript.create_empty(missing)
+            existing |= StudentTranscript.lock_student_ids(missing)
+
+        rows = transcript_rows(student_ids, totals, existing)
+        update_from_values(StudentTranscript, 'student_id', rows)
+        db.session.commit()
+        last_id = high
+        checkpoint.save(last_id=last_id)
+        progress.advance(len(student_ids), len(rows))
+    return progress
+
+
+@click.command('recompute-gpas')
+@click.option('--chunk-size', default=5000, show_default=True, help='Rows read and written per statement')
+@click.option('--workers', type=int, help='Grading processes, 0 grades inline  [default: CPU count - 1]')
+@click.option('--checkpoint', 'checkpoint_path', help='Checkpoint file  [default: instance/recompute-gpas.json]')
+@click.option('--restart', is_flag=True, help='Ignore the checkpoint of an interrupted run')
+@with_appcontext
+def recompute_gpas_command(chunk_size, workers, checkpoint_path, restart):
+    """Regrade every score with the active grading scale and rebuild the transcripts.
+
+    An interrupted run resumes after the last chunk it committed.
+    """
+    checkpoint = Checkpoint(checkpoint_path or os.path.join(current_app.instance_path, 'recompute-gpas.json'))
+    grading_scales.invalidate()
+    scale = grading_scales.active()
+
+    state = None if restart else checkpoint.load()
+    if state is None:
+        checkpoint.clear()
+        checkpoint.save(phase='scores', last_id=0, scale_id=scale.id, scale_version=scale.version)
+    elif (state['scale_id'], state['scale_version']) != (scale.id, scale.version):
+        raise click.ClickException(
+            f"{checkpoint.path} is of a run with another grading scale, use --restart to regrade everything"
+        )
+    else:
+        click.echo(f"Resuming the {state['phase']} after id {state['last_id']}")
+    click.echo(f'Grading with {scale.name} version {scale.version}')
+
+    if checkpoint.state['phase'] == 'scores':
+        if workers is None:
+            # the command itself keeps a core for reading and writing the chunks
+            workers = (os.cpu_count() or 1) - 1
+        executor = None
+        if workers:
+            executor = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn'))
+        try:
+            # two chunks per worker keep them busy while the parent reads and writes
+            recompute_scores(scale, checkpoint, chunk_size, executor, 2 * workers)
+        finally:
+            if executor:
+                executor.shutdown()
+        checkpoint.save(phase='transcripts', last_id=0)
+
+    recompute_transcripts(checkpoint, chunk_size)
+    checkpoint.clear()
+    click.echo('Done')
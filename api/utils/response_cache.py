@@ -0,0 +1,167 @@
+import json
+import threading
+from collections import namedtuple
+from functools import wraps
+from urllib.parse import urlencode
+from flask import Response, current_app, request
+from .cache import LocalCache, make_key_value_client
+from .routing import replica_router
+
+
+CachedResponse = namedtuple('CachedResponse', ['body', 'status', 'headers', 'tags', 'versions'])
+
+
+class ResponseCache:
+    """
+    Caches whole GET responses keyed by path and query string.
+
+    Every entry carries dependency tags such as course:<id> and records the
+    version of each tag when the response was rendered. Writes bump the
+    version of the tags they affect, and an entry is only served while all
+    of its tag versions are unchanged, so invalidation is precise without
+    having to know which keys were built from which rows.
+
+    Entries live in a process-local tier and, with the "kv" backend, in a
+    shared key-value tier as well. The shared tier also holds the tag
+    versions, so a write on one worker invalidates the entries of every
+    worker. With the "local" backend each worker only sees its own writes
+    and entries written elsewhere age out after RESPONSE_CACHE_TTL.
+    """
+
+    entry_prefix = 'response:'
+    tag_prefix = 'response-tag:'
+
+    def __init__(self):
+        self.local = LocalCache()
+        self.client = None
+        self.enabled = False
+        self.ttl = 300
+        self._versions = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.stale = 0
+        self.invalidations = 0
+
+    def init_app(self, app):
+        self.enabled = app.config.get('RESPONSE_CACHE_ENABLED', True)
+        self.ttl = app.config.get('RESPONSE_CACHE_TTL', 300)
+        self.local.configure(app.config.get('RESPONSE_CACHE_MAXSIZE', 1024), self.ttl)
+        backend = app.config.get('RESPONSE_CACHE_BACKEND', 'local')
+        if backend == 'local':
+            self.client = None
+        elif backend == 'kv':
+            self.client = make_key_value_client(app.config.get('RESPONSE_CACHE_KV_URL'), 'RESPONSE_CACHE_KV_URL')
+        else:
+            raise ValueError(f'Unknown response cache backend: {backend}')
+        with self._lock:
+            self._versions = {}
+            self.hits = self.misses = self.stale = self.invalidations = 0
+
+    def tag_versions(self, tags):
+        if self.client is not None:
+            return tuple(int(version or 0) for version in self.client.mget([self.tag_prefix + tag for tag in tags]))
+        with self._lock:
+            return tuple(self._versions.get(tag, 0) for tag in tags)
+
+    def invalidate(self, *tags):
+        """
+        Drop every cached response depending on any of the tags.
+        """
+        if not self.enabled:
+            return
+        if self.client is not None:
+            for tag in tags:
+                self.client.incr(self.tag_prefix + tag)
+        with self._lock:
+            for tag in tags:
+                self._versions[tag] = self._versions.get(tag, 0) + 1
+            self.invalidations += len(tags)
+
+    def get(self, key):
+        entry = self.local.get(key)
+        if entry is None and self.client is not None:
+            payload = self.client.get(self.entry_prefix + key)
+            if payload is not None:
+                entry = CachedResponse(**json.loads(payload))
+                self.local.set(key, entry)
+
+        if entry is not None and tuple(entry.versions) != self.tag_versions(entry.tags):
+            self.local.invalidate(key)
+            with self._lock:
+                self.stale += 1
+            entry = None
+
+        with self._lock:
+            if entry is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return entry
+
+    def set(self, key, response, tags, versions):
+        entry = CachedResponse(
+            response.get_data(as_text=True),
+            response.status_code,
+            [(name, value) for name, value in response.headers if name.lower() != 'content-length'],
+            list(tags),
+            list(versions)
+        )
+        self.local.set(key, entry)
+        if self.client is not None:
+            self.client.set(self.entry_prefix + key, json.dumps(entry._asdict()), ex=self.ttl)
+
+    def make_key(self):
+        args = urlencode(sorted(request.args.items(multi=True)))
+        return f'{request.path}?{args}'
+
+    def cached(self, *tags):
+        """
+        Cache the successful responses of a view.
+
+        Tags are format strings filled in from the view arguments, e.g.
+        'course:{course_id}'. Place it below the access decorators so the
+        permission checks still run on every request.
+        """
+        def decorator(fn):
+            @wraps(fn)
+            def wrapper(*args, **kwargs):
+                if not self.enabled:
+                    return fn(*args, **kwargs)
+
+                key = self.make_key()
+                entry_tags = [tag.format(**kwargs) for tag in tags]
+                entry = self.get(key)
+                if entry is not None:
+                    response = current_app.response_class(entry.body, status=entry.status, headers=entry.headers)
+                    response.headers['X-Cache'] = 'HIT'
+                    return response.make_conditional(request)
+
+                # read the versions before rendering, a write made meanwhile then marks the entry stale
+                versions = self.tag_versions(entry_tags)
+                # render from the primary, a lagging replica would cache the old rows under the new versions
+                replica_router.use_primary()
+                response = fn(*args, **kwargs)
+                if isinstance(response, Response) and response.status_code == 200 and not response.is_streamed:
+                    self.set(key, response, entry_tags, versions)
+                    response.headers['X-Cache'] = 'MISS'
+                return response
+            return wrapper
+        return decorator
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'enabled': self.enabled,
+                'backend': 'local' if self.client is None else 'kv',
+                'hits': self.hits,
+                'misses': self.misses,
+                'stale': self.stale,
+                'invalidations': self.invalidations,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0,
+                'local': self.local.stats()
+            }
+
+
+response_cache = ResponseCache()
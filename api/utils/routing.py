@@ -0,0 +1,115 @@
+from functools import wraps
+from flask import g, has_app_context, request
+from flask_sqlalchemy.session import Session
+from .cache import make_key_value_client
+
+REPLICA_BIND = 'replica'
+
+
+class RoutingSession(Session):
+    """
+    A session that sends the reads of replica-routed requests to the read replica.
+
+    Everything else goes to the primary: flushes, INSERT/UPDATE/DELETE
+    statements, queries of requests that are not routed to the replica and,
+    once a request has written anything, the rest of that request's queries.
+    """
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None and has_app_context():
+            if self._flushing or getattr(clause, 'is_dml', False):
+                g.db_wrote = True
+            elif replica_router.reads_from_replica():
+                return self._db.engines[REPLICA_BIND]
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
+class ReplicaRouter:
+    """
+    Decides which requests may read from the replica.
+
+    GET requests of the routed namespaces read from the replica, except for
+    users who wrote something in the last READ_YOUR_WRITES_WINDOW seconds:
+    those keep reading from the primary until the replica has caught up
+    with their own changes. The recent writers are tracked in a key-value
+    server when REPLICA_STICKY_KV_URL is set, so the window holds across
+    workers, and per process otherwise.
+    """
+
+    prefix = 'wrote:'
+
+    def __init__(self):
+        self.enabled = False
+        self.window = 5
+        self.client = None
+
+    def init_app(self, app):
+        self.enabled = REPLICA_BIND in (app.config.get('SQLALCHEMY_BINDS') or {})
+        self.window = app.config.get('READ_YOUR_WRITES_WINDOW', 5)
+        self.client = make_key_value_client(app.config.get('REPLICA_STICKY_KV_URL'), 'REPLICA_STICKY_KV_URL')
+        app.before_request(self.before_request)
+        app.after_request(self.after_request)
+
+    def before_request(self):
+        # the app context, and g with it, can outlive a request, e.g. in tests
+        for name in ('db_route', 'db_wrote', 'db_sticky'):
+            g.pop(name, None)
+
+    def is_sticky(self, identity):
+        return identity is not None and bool(self.client.exists(f'{self.prefix}{identity}'))
+
+    def mark_write(self, identity):
+        if identity is not None and self.window > 0:
+            self.client.set(f'{self.prefix}{identity}', 1, ex=self.window)
+
+    def after_request(self, response):
+        if self.enabled and g.get('db_wrote'):
+            self.mark_write(current_identity())
+        return response
+
+    def route_reads(self, fn):
+        """
+        Let the GET requests of a view read from the replica.
+
+        Meant as a namespace decorator, it wraps the whole resource and
+        leaves every other method on the primary.
+        """
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            if self.enabled and request.method in ('GET', 'HEAD'):
+                g.db_route = REPLICA_BIND
+            return fn(*args, **kwargs)
+        return wrapper
+
+    def use_primary(self):
+        """
+        Send the rest of the current request to the primary.
+        """
+        g.db_route = None
+
+    def reads_from_replica(self):
+        """
+        Whether the current query may go to the replica.
+
+        The user's recent writes are looked up on the first query made once
+        the JWT is verified, and remembered for the rest of the request.
+        """
+        if not self.enabled or g.get('db_route') != REPLICA_BIND or g.get('db_wrote'):
+            return False
+        if 'db_sticky' not in g:
+            identity = current_identity()
+            if identity is None:
+                return True
+            g.db_sticky = self.is_sticky(identity)
+        return not g.db_sticky
+
+
+def current_identity():
+    # the identity of the verified JWT, None for anonymous requests
+    jwt = g.get('_jwt_extended_jwt')
+    if not jwt:
+        return None
+    return jwt.get('sub')
+
+
+replica_router = ReplicaRouter()
@@ -0,0 +1,153 @@
+import json
+from flask import current_app
+from flask_restx import fields as restx_fields
+from .instrumentation import instrumentation
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+# field types whose output can be reduced to "convert the value unless it is None"
+CONVERTERS = {
+    restx_fields.String: str,
+    restx_fields.Integer: int,
+    restx_fields.Float: float,
+    restx_fields.Boolean: bool,
+    restx_fields.Raw: None,
+}
+
+
+def iso8601(value):
+    return value.isoformat()
+
+
+def field_converter(field):
+    """
+    Return (supported, converter) for a field, converter may be None for identity.
+    """
+    if type(field) is restx_fields.DateTime:
+        return field.dt_format == 'iso8601', iso8601
+    if type(field) in CONVERTERS:
+        return True, CONVERTERS[type(field)]
+    return False, None
+
+
+class CompiledSerializer:
+    """
+    A flask_restx model compiled into plain Python functions.
+
+    marshal() walks the field tree and calls Field.output() for every
+    attribute of every object. Here the model is turned once into the source
+    of a function that reads each attribute and converts it inline, which
+    gives the same dicts as marshal() at a fraction of the cost. Fields
+    with no inline equivalent (nested models, lists, custom fields, dotted
+    attributes) still go through Field.output().
+    """
+
+    def __init__(self, model, names=None):
+        self.model = model
+        self.names = list(names) if names is not None else list(model.keys())
+        self.from_object = self._compile('object')
+        self.from_mapping = self._compile('mapping')
+
+    def _compile(self, source):
+        namespace = {}
+        lines = []
+        values = []
+        for i, name in enumerate(self.names):
+            field = self.model[name]
+            if isinstance(field, type):
+                field = field()
+            attribute = field.attribute if field.attribute is not None else name
+            supported, converter = field_converter(field)
+            if not supported or not isinstance(attribute, str) or '.' in attribute:
+                namespace[f'field_{i}'] = field
+                lines.append(f'    v{i} = field_{i}.output({name!r}, obj)')
+                values.append(f'v{i}')
+                continue
+
+            default = field.default
+            namespace[f'default_{i}'] = field.format(default) if default else default
+            if source == 'object':
+                lines.append(f'    v{i} = getattr(obj, {attribute!r}, None)')
+            else:
+                lines.append(f'    v{i} = obj.get({attribute!r})')
+            if converter is None:
+                values.append(f'default_{i} if v{i} is None else v{i}')
+            else:
+                namespace[f'convert_{i}'] = converter
+                values.append(f'default_{i} if v{i} is None else convert_{i}(v{i})')
+
+        body = '\n'.join(lines) or '    pass'
+        items = ', '.join(f'{name!r}: {value}' for name, value in zip(self.names, values))
+        exec(f'def serialize(obj):\n{body}\n    return {{{items}}}\n', namespace)
+        return namespace['serialize']
+
+    def one(self, obj):
+        with instrumentation.timer('serialization'):
+            if isinstance(obj, dict):
+                return self.from_mapping(obj)
+            return self.from_object(obj)
+
+    def many(self, objs):
+        objs = list(objs)
+        if not objs:
+            return []
+        with instrumentation.timer('serialization'):
+            serialize = self.from_mapping if isinstance(objs[0], dict) else self.from_object
+            return [serialize(obj) for obj in objs]
+
+
+def projected_columns(entity, names, always=('id',)):
+    """
+    Return the mapped columns of entity needed to serialize the given fields.
+
+    Querying these instead of the entity loads lightweight rows without
+    building ORM identities or fetching unused columns such as password hashes.
+    Names that are not columns of the entity are left out.
+    """
+    columns = []
+    for name in list(always) + [name for name in names if name not in always]:
+        attribute = getattr(entity, name, None)
+        if attribute is not None and hasattr(attribute, 'expression'):
+            columns.append(attribute)
+    return columns
+
+
+_serializers = {}
+
+
+def get_serializer(model, names=None):
+    """
+    Return the compiled serializer of a model, or of a subset of its fields.
+
+    Serializers are compiled on first use and kept for the life of the process.
+    """
+    key = (id(model), tuple(names) if names is not None else None)
+    serializer = _serializers.get(key)
+    if serializer is None:
+        serializer = _serializers[key] = CompiledSerializer(model, names)
+    return serializer
+
+
+def dumps(data):
+    """
+    Encode data as JSON bytes, with orjson when it is installed.
+    """
+    if orjson is not None:
+        return orjson.dumps(data)
+    return json.dumps(data, separators=(',', ':')).encode()
+
+
+def json_response(data, status=200, headers=None):
+    """
+    Build a JSON response directly, skipping flask_restx's output_json.
+    """
+    with instrumentation.timer('serialization'):
+        body = dumps(data) + b'\n'
+    response = current_app.response_class(body, status=status, mimetype='application/json')
+    if headers:
+        response.headers.extend(headers)
+    return response
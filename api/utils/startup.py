@@ -0,0 +1,69 @@
+import threading
+import click
+from flask import Flask
+
+
+class LazyFlask(Flask):
+    """
+    A Flask app that can postpone part of its setup until it is needed.
+
+    create_app() hands the API and its namespaces to defer() when
+    LAZY_API_REGISTRATION is on. Importing flask_restx and the views and
+    building their routes is most of the time create_app() takes, and
+    processes that never serve a request (flask CLI commands, tests that
+    only touch the database) then skip it altogether. The deferred setup
+    runs once, right before the first request context is created, or when
+    ensure_setup() is called.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._deferred = []
+        self._deferred_done = True
+        self._deferred_lock = threading.Lock()
+
+    def defer(self, setup):
+        """
+        Run setup(app) before the first request instead of now.
+        """
+        with self._deferred_lock:
+            self._deferred.append(setup)
+            self._deferred_done = False
+
+    def ensure_setup(self):
+        if self._deferred_done:
+            return
+        with self._deferred_lock:
+            while self._deferred:
+                self._deferred.pop(0)(self)
+            self._deferred_done = True
+
+    def request_context(self, environ):
+        self.ensure_setup()
+        return super().request_context(environ)
+
+
+class LazyGroup(click.Group):
+    """
+    A CLI command group whose commands are imported when it is first used.
+
+    load() is called once and returns the real group, e.g. a
+    "flask db" group that needs alembic, a slow import every process
+    would otherwise pay at startup.
+    """
+
+    def __init__(self, name, load, **attrs):
+        super().__init__(name, **attrs)
+        self.load = load
+        self._group = None
+
+    def loaded(self):
+        if self._group is None:
+            self._group = self.load()
+        return self._group
+
+    def list_commands(self, ctx):
+        return self.loaded().list_commands(ctx)
+
+    def get_command(self, ctx, name):
+        return self.loaded().get_command(ctx, name)
@@ -0,0 +1,4 @@
+from api.asgi import create_asgi_app
+from api.config.config import config_dict
+
+app = create_asgi_app(config=config_dict['prod'])
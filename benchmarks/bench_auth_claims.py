@@ -0,0 +1,53 @@
+"""
+Compare role resolution from JWT claims against the per-request database lookup.
+"""
+from .common import make_app, count_queries, timeit, report
+from flask_jwt_extended import create_access_token
+from werkzeug.security import generate_password_hash
+
+from api.decorators import role_claims
+from api.models.user import Admin
+from api.utils.cache import user_identity_cache
+
+ITERATIONS = 500
+
+
+def main():
+    app, ctx = make_app()
+    admin = Admin(
+        name='Bench Admin', email='bench@admin.com', username='benchadmin',
+        password_hash=generate_password_hash('password'), user_type='admin', is_admin=True
+    )
+    admin.save()
+    client = app.test_client()
+
+    tokens = {
+        'legacy token (db lookup)': create_access_token(identity=admin.id),
+        'claims + role version check': create_access_token(identity=admin.id, additional_claims=role_claims(admin)),
+    }
+    rows = []
+    for check in (True, False):
+        app.config['JWT_ROLE_VERSION_CHECK'] = check
+        for name, token in tokens.items():
+            if name.startswith('legacy') and not check:
+                continue
+            label = name if check else 'claims only (no version check)'
+            headers = {'Authorization': f'Bearer {token}'}
+
+            # GET /students/<id> is guarded by admin_or_lecturer_required
+            user_identity_cache.clear()
+            with count_queries() as counter:
+                client.get('/students/0', headers=headers)
+            cold_queries = counter.count - 1  # the handler itself issues one query
+            with count_queries() as counter:
+                client.get('/students/0', headers=headers)
+            warm_queries = counter.count - 1
+            ms = timeit(lambda: client.get('/students/0', headers=headers), ITERATIONS)
+            rows.append((label, f"{cold_queries} cold / {warm_queries} warm auth queries, {ms:.3f} ms/request"))
+
+    report('admin_or_lecturer_required on GET /students/<id>', rows)
+    ctx.pop()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,47 @@
+"""
+Compare uploading a term's scores one request per student against the bulk endpoint.
+"""
+import time
+from .common import make_app, seed_students, lecturer_course, enroll_all, count_queries, report
+
+STUDENTS = 600
+
+
+def main():
+    app, ctx = make_app()
+    seed_students(STUDENTS)
+    course_id, headers = lecturer_course()
+    student_ids = enroll_all(course_id)
+    client = app.test_client()
+    rows = []
+
+    # one request per student, as lecturers do today
+    start = time.perf_counter()
+    with count_queries() as counter:
+        for i, student_id in enumerate(student_ids):
+            client.put(f'/students/studentcourse/score/{course_id}', json={'student_id': student_id, 'score': i % 100}, headers=headers)
+    elapsed = time.perf_counter() - start
+    rows.append((f'{STUDENTS} single PUT requests', f'{elapsed * 1000:.0f} ms, {STUDENTS / elapsed:.0f} scores/s, {counter.count} queries'))
+
+    # the same upload through the bulk endpoint, as JSON then as CSV (all updates now)
+    scores = [{'student_id': student_id, 'score': (i * 7) % 100} for i, student_id in enumerate(student_ids)]
+    start = time.perf_counter()
+    with count_queries() as counter:
+        response = client.put(f'/students/studentcourse/score/{course_id}/bulk', json=scores, headers=headers)
+    elapsed = time.perf_counter() - start
+    assert not response.json['errors']
+    rows.append(('bulk JSON upload', f'{elapsed * 1000:.0f} ms, {STUDENTS / elapsed:.0f} scores/s, {counter.count} queries'))
+
+    body = 'student_id,score\n' + ''.join(f'{student_id},{(i * 3) % 100}\n' for i, student_id in enumerate(student_ids))
+    start = time.perf_counter()
+    with count_queries() as counter:
+        client.put(f'/students/studentcourse/score/{course_id}/bulk', data=body, content_type='text/csv', headers=headers)
+    elapsed = time.perf_counter() - start
+    rows.append(('bulk CSV upload', f'{elapsed * 1000:.0f} ms, {STUDENTS / elapsed:.0f} scores/s, {counter.count} queries'))
+
+    report(f'Uploading {STUDENTS} scores of one course', rows)
+    ctx.pop()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,57 @@
+"""
+Course catalog throughput with the response cache on and off, at a read/write mix of 200:1.
+"""
+import time
+from .common import BenchConfig, make_app, seed_students, lecturer_course, enroll_all, report
+
+from api.models.course import Course
+from api.utils import db
+from api.utils.response_cache import response_cache
+
+STUDENTS = 2000
+COURSES = 200
+REQUESTS = 2000
+READS_PER_WRITE = 200
+
+
+class CacheOffConfig(BenchConfig):
+    RESPONSE_CACHE_ENABLED = False
+
+
+def run(config):
+    app, ctx = make_app(config)
+    seed_students(STUDENTS)
+    course_id, headers = lecturer_course()
+    enroll_all(course_id)
+    db.session.execute(db.insert(Course), [
+        {'name': f'Course {i}', 'course_code': f'C{i:05d}'} for i in range(COURSES)
+    ])
+    db.session.commit()
+    client = app.test_client()
+    urls = ['/courses/', f'/courses/{course_id}', f'/courses/{course_id}/students']
+
+    start = time.perf_counter()
+    for i in range(REQUESTS):
+        if i % READS_PER_WRITE == READS_PER_WRITE - 1:
+            course = db.session.get(Course, course_id)
+            course.name = f'Bench Course {i}'
+            course.save()
+        client.get(urls[i % len(urls)], headers=headers)
+    elapsed = time.perf_counter() - start
+
+    stats = response_cache.stats()
+    db.drop_all()
+    ctx.pop()
+    return REQUESTS / elapsed, stats['hit_rate']
+
+
+def main():
+    rows = []
+    for name, config in (('cache off', CacheOffConfig), ('cache on', BenchConfig)):
+        qps, hit_rate = run(config)
+        rows.append((name, f'{qps:.0f} req/s, hit rate {hit_rate:.1%}'))
+    report(f'{REQUESTS} catalog GETs ({STUDENTS} students in the course, {COURSES} courses)', rows)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,42 @@
+"""
+Peak memory of the streaming student export as the roster grows.
+"""
+import time
+import tracemalloc
+from .common import make_app, seed_students, admin_headers, report
+
+from api.utils import db
+
+SIZES = (10000, 40000)
+
+
+def measure(client, headers):
+    """
+    Stream the export, returns (time in ms, peak traced memory in MB, bytes received).
+    """
+    tracemalloc.start()
+    start = time.perf_counter()
+    response = client.get('/exports/students', headers=headers, buffered=False)
+    received = sum(len(chunk) for chunk in response.response)
+    response.close()
+    elapsed = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return elapsed * 1000, peak / 1024 / 1024, received
+
+
+def main():
+    rows = []
+    for size in SIZES:
+        app, ctx = make_app()
+        headers = admin_headers()
+        seed_students(size)
+        ms, mb, received = measure(app.test_client(), headers)
+        rows.append((f'{size} students', f'{ms:.1f} ms, peak {mb:.1f} MB, {received / 1024 / 1024:.1f} MB sent'))
+        db.drop_all()
+        ctx.pop()
+    report('Streaming /exports/students as NDJSON', rows)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,132 @@
+"""
+Compare the if/elif grade() and letter_grade_to_gpa() against the grading scales.
+
+The ladder functions below are the ones the API graded with before
+grading scales, a score walked down to eleven comparisons and its letter
+as many string comparisons. Scale.grade() bisects the band minimums and
+Scale.grade_many() grades a batch with numpy.searchsorted, or with
+bisect when numpy is not installed.
+
+    python -m benchmarks.bench_grading
+    python -m benchmarks.bench_grading --scores 1000000
+"""
+import argparse
+import random
+import time
+from unittest import mock
+from .common import report
+
+from api.utils.grading import default_scale, load_numpy
+
+ITERATIONS = 5
+
+
+def ladder_grade(score):
+    if score >= 95:
+        return 'A+'
+    elif score >= 90:
+        return 'A'
+    elif score >= 85:
+        return 'A-'
+    elif score >= 80:
+        return 'B+'
+    elif score >= 75:
+        return 'B'
+    elif score >= 70:
+        return 'B-'
+    elif score >= 65:
+        return 'C+'
+    elif score >= 60:
+        return 'C'
+    elif score >= 55:
+        return 'C-'
+    elif score >= 50:
+        return 'D+'
+    elif score >= 45:
+        return 'D'
+    else:
+        return 'F'
+
+
+def ladder_gpa(letter_grade):
+    if letter_grade == "A+":
+        return 4.0
+    elif letter_grade == "A":
+        return 4.0
+    elif letter_grade == "A-":
+        return 3.7
+    elif letter_grade == "B+":
+        return 3.3
+    elif letter_grade == "B":
+        return 3.0
+    elif letter_grade == "B-":
+        return 2.7
+    elif letter_grade == "C+":
+        return 2.3
+    elif letter_grade == "C":
+        return 2.0
+    elif letter_grade == "C-":
+        return 1.7
+    elif letter_grade == "D+":
+        return 1.3
+    elif letter_grade == "D":
+        return 1.0
+    elif letter_grade == "F":
+        return 0.0
+    else:
+        return None
+
+
+def best_of(fn):
+    timings = []
+    for _ in range(ITERATIONS):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    return min(timings) * 1000
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--scores', type=int, default=100000, help='scores graded per run')
+    args = parser.parse_args(argv)
+
+    rng = random.Random(42)
+    # whole and half marks, most of them in the middle bands like real results
+    scores = [round(min(max(rng.gauss(62, 15), 0), 100) * 2) / 2 for _ in range(args.scores)]
+
+    def ladder():
+        letters = [ladder_grade(score) for score in scores]
+        return letters, [ladder_gpa(letter) for letter in letters]
+
+    def bisect_each():
+        graded = [default_scale.grade(score) for score in scores]
+        return [letter for letter, _ in graded], [gpa for _, gpa in graded]
+
+    def batch_without_numpy():
+        with mock.patch('api.utils.grading.load_numpy', return_value=None):
+            return default_scale.grade_many(scores)
+
+    expected = ladder()
+    candidates = [
+        ('if/elif grade() + letter_grade_to_gpa()', ladder),
+        ('Scale.grade() per score, bisect', bisect_each),
+        ('Scale.grade_many(), bisect', batch_without_numpy),
+    ]
+    if load_numpy() is not None:
+        candidates.append(('Scale.grade_many(), numpy', lambda: default_scale.grade_many(scores)))
+
+    rows = []
+    baseline = None
+    for name, fn in candidates:
+        assert fn() == expected, name
+        elapsed = best_of(fn)
+        baseline = baseline or elapsed
+        rows.append((name, f'{elapsed:.1f} ms, {args.scores / elapsed * 1000 / 1e6:.2f} M scores/s, x{baseline / elapsed:.1f}'))
+    if load_numpy() is None:
+        rows.append(('Scale.grade_many(), numpy', 'skipped, numpy is not installed'))
+    report(f'Grading {args.scores} scores with their GPAs, best of {ITERATIONS}', rows)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,43 @@
+"""
+Compare the keyset paginated GET /students/ against the previous full scan.
+"""
+from .common import make_app, seed_students, admin_headers, timeit, report
+from flask_restx import marshal
+
+from api.models.user import Student
+from api.student.views import student_field
+from api.utils.pagination import encode_cursor
+
+STUDENTS = 20000
+ITERATIONS = 20
+
+
+def main():
+    app, ctx = make_app()
+    seed_students(STUDENTS)
+    headers = admin_headers()
+    client = app.test_client()
+
+    def full_scan():
+        # what GET /students/ used to do
+        return marshal(Student.query.all(), student_field)
+
+    first = client.get('/students/', headers=headers)
+    deep_cursor = encode_cursor(STUDENTS // 2)
+
+    rows = [
+        ('full scan, all rows', '{:.2f} ms, {} bytes'.format(
+            timeit(full_scan, ITERATIONS), len(str(full_scan())))),
+        ('first page (limit 50)', '{:.2f} ms, {} bytes'.format(
+            timeit(lambda: client.get('/students/', headers=headers), ITERATIONS), len(first.data))),
+        ('deep page (limit 500, middle of table)', '{:.2f} ms'.format(
+            timeit(lambda: client.get(f'/students/?limit=500&cursor={deep_cursor}', headers=headers), ITERATIONS))),
+        ('first page, ?fields=id,name', '{:.2f} ms'.format(
+            timeit(lambda: client.get('/students/?fields=id,name', headers=headers), ITERATIONS))),
+    ]
+    report(f'GET /students/ with {STUDENTS} students', rows)
+    ctx.pop()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,74 @@
+"""
+Measure login throughput against the size of the password hashing pool.
+
+Logins run on --threads request threads of a single app, the requests a
+uwsgi worker serves at once, with the production hashing cost. The
+default of 1 is the shipped uwsgi.ini, which sets neither threads nor
+processes: there the request waits for its hash either way, and the
+pool only adds the round trip to another process.
+
+    python -m benchmarks.bench_password_pool
+    python -m benchmarks.bench_password_pool --threads 8 --requests 200
+"""
+import argparse
+import os
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from .common import BenchConfig, make_app, report
+
+from api.config.config import Config
+from api.models.user import Student
+from api.utils.passwords import password_hasher
+
+POOL_SIZES = (0, 1, 2, 4)
+LOGIN = {'email': 'loadtest@bench.com', 'password': 'loadtest-password'}
+
+
+def run(directory, workers, threads, requests):
+    class PoolConfig(BenchConfig):
+        SQLALCHEMY_DATABASE_URI = 'sqlite:///' + os.path.join(directory, f'pool-{workers}.sqlite3')
+        PASSWORD_HASH_METHOD = Config.PASSWORD_HASH_METHOD
+        PASSWORD_HASH_WORKERS = workers
+        PASSWORD_HASH_MAX_PENDING = threads
+
+    app, ctx = make_app(PoolConfig)
+    Student(
+        name='Load Test', email=LOGIN['email'], username='loadtest', matric_no='STD@LOAD',
+        password_hash=password_hasher.hash(LOGIN['password']), user_type='student'
+    ).save()
+    ctx.pop()
+
+    def login(_):
+        return app.test_client().post('/auth/login', json=LOGIN).status_code
+
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        # start the hashing processes before measuring
+        list(pool.map(login, range(threads)))
+        start = time.perf_counter()
+        statuses = list(pool.map(login, range(requests)))
+        elapsed = time.perf_counter() - start
+
+    password_hasher.shutdown()
+    errors = sum(status != 200 for status in statuses)
+    return requests / elapsed, errors
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--threads', type=int, default=1, help='request threads of the worker, uwsgi.ini runs 1')
+    parser.add_argument('--requests', type=int, default=100, help='measured logins per pool size')
+    args = parser.parse_args(argv)
+
+    rows = []
+    with tempfile.TemporaryDirectory() as directory:
+        for workers in POOL_SIZES:
+            throughput, errors = run(directory, workers, args.threads, args.requests)
+            label = 'inline hashing' if workers == 0 else f'{workers} hashing process(es)'
+            rows.append((label, f'{throughput:.1f} logins/s, {errors} errors'))
+
+    report(f'POST /auth/login, {args.threads} request thread(s), {Config.PASSWORD_HASH_METHOD} (cpus: {os.cpu_count()})', rows)
+
+
+if __name__ == '__main__':
+    main()
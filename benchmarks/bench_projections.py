@@ -0,0 +1,58 @@
+"""
+Compare loading full polymorphic Student entities against projected column rows.
+"""
+import time
+import tracemalloc
+from .common import make_app, seed_students, report
+
+from api.models.user import Student
+from api.student.views import student_field
+from api.utils import db
+from api.utils.serializers import get_serializer, projected_columns
+
+STUDENTS = 20000
+ITERATIONS = 5
+
+
+def measure(fn):
+    """
+    Return (best time in ms, peak traced memory in MB) of fn.
+    """
+    timings = []
+    for _ in range(ITERATIONS):
+        db.session.expunge_all()
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    db.session.expunge_all()
+    tracemalloc.start()
+    fn()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return min(timings) * 1000, peak / 1024 / 1024
+
+
+def main():
+    app, ctx = make_app()
+    seed_students(STUDENTS)
+    serializer = get_serializer(student_field)
+    columns = projected_columns(Student, student_field.keys())
+
+    def entities():
+        return serializer.many(Student.query.order_by(Student.id).all())
+
+    def projected():
+        return serializer.many(db.session.query(*columns).order_by(Student.id).all())
+
+    assert entities() == projected()
+
+    rows = []
+    for name, fn in (('Student.query.all()', entities), ('projected columns', projected)):
+        ms, mb = measure(fn)
+        rows.append((name, f'{ms:.1f} ms, peak {mb:.1f} MB'))
+    report(f'Loading and serializing {STUDENTS} students', rows)
+    ctx.pop()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,46 @@
+"""
+Compare flask_restx marshal() + json.dumps against the compiled serializers + orjson.
+"""
+import json
+import time
+from .common import make_app, seed_students, report
+from flask_restx import marshal
+
+from api.models.user import Student
+from api.student.views import student_field
+from api.utils.serializers import get_serializer, dumps, orjson
+
+STUDENTS = 10000
+ITERATIONS = 10
+
+
+def best_of(fn):
+    timings = []
+    for _ in range(ITERATIONS):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    return min(timings) * 1000
+
+
+def main():
+    app, ctx = make_app()
+    seed_students(STUDENTS)
+    students = Student.query.all()
+    serializer = get_serializer(student_field)
+
+    assert serializer.many(students) == marshal(students, student_field)
+
+    marshalled = marshal(students, student_field)
+    rows = [
+        ('marshal()', f'{best_of(lambda: marshal(students, student_field)):.1f} ms'),
+        ('compiled serializer', f'{best_of(lambda: serializer.many(students)):.1f} ms'),
+        ('json.dumps', f'{best_of(lambda: json.dumps(marshalled)):.1f} ms'),
+        ('orjson' if orjson else 'dumps (orjson not installed)', f'{best_of(lambda: dumps(marshalled)):.1f} ms'),
+    ]
+    report(f'Serializing {STUDENTS} students', rows)
+    ctx.pop()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,96 @@
+"""
+Track the cold-start time of the app: imports, create_app and the first request.
+
+Every sample runs in a fresh interpreter, the way a uwsgi lazy-apps or
+uvicorn worker starts. With --imports the slowest modules reported by
+python -X importtime are listed as well.
+
+    python -m benchmarks.bench_startup
+    python -m benchmarks.bench_startup --samples 10 --imports 25
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+from .common import report
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# runs in the child interpreter, prints the phase timings as JSON
+PROBE = """
+import json, os, sys, time
+os.environ.setdefault('JWT_SECRET_KEY', 'benchmark-secret')
+start = time.perf_counter()
+from api import create_app
+from api.config.config import TestConfig
+imported = time.perf_counter()
+
+class StartupConfig(TestConfig):
+    SQLALCHEMY_ECHO = False
+    LAZY_API_REGISTRATION = sys.argv[1] == 'lazy'
+
+app = create_app(config=StartupConfig)
+created = time.perf_counter()
+app.test_client().get('/swagger.json')
+served = time.perf_counter()
+print(json.dumps({
+    'import': imported - start,
+    'create_app': created - imported,
+    'first_request': served - created,
+    'total': served - start,
+    'flask_migrate_imported': 'flask_migrate' in sys.modules,
+}))
+"""
+
+
+def sample(mode):
+    output = subprocess.run(
+        [sys.executable, '-c', PROBE, mode], cwd=ROOT, capture_output=True, text=True, check=True
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def import_report(limit):
+    """
+    Return the modules with the highest cumulative import time, in ms.
+    """
+    stderr = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', 'import api'], cwd=ROOT,
+        capture_output=True, text=True, check=True, env={**os.environ, 'JWT_SECRET_KEY': 'benchmark-secret'}
+    ).stderr
+    modules = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, own, cumulative, name = [part.strip() for part in line.replace('import time:', '|').split('|')]
+        modules.append((int(cumulative) / 1000, int(own) / 1000, name))
+    return sorted(modules, reverse=True)[:limit]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--samples', type=int, default=5, help='fresh interpreters per mode')
+    parser.add_argument('--imports', type=int, default=0, help='list this many of the slowest imports')
+    args = parser.parse_args(argv)
+
+    rows = []
+    for mode in ('eager', 'lazy'):
+        samples = [sample(mode) for _ in range(args.samples)]
+        median = {phase: statistics.median(s[phase] for s in samples) * 1000
+                  for phase in ('import', 'create_app', 'first_request', 'total')}
+        rows.append((f'{mode} API registration', (
+            'import {import:.0f} ms, create_app {create_app:.1f} ms, '
+            'first request {first_request:.1f} ms, total {total:.0f} ms'
+        ).format(**median)))
+    report(f'Cold start, median of {args.samples} fresh interpreters', rows)
+
+    if args.imports:
+        report(f'Slowest imports of the api package (cumulative / self ms)', [
+            (name, f'{cumulative:.1f} / {own:.1f}') for cumulative, own, name in import_report(args.imports)
+        ])
+
+
+if __name__ == '__main__':
+    main()
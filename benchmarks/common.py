@@ -0,0 +1,131 @@
+"""
+Shared helpers for the benchmark scripts.
+
+Run a benchmark from the repository root, e.g.
+
+    python -m benchmarks.bench_auth_claims
+"""
+import os
+import time
+from contextlib import contextmanager
+
+os.environ.setdefault('JWT_SECRET_KEY', 'benchmark-secret')
+
+from api import create_app
+from api.config.config import TestConfig
+from api.utils import db
+from api.models.user import Admin, Lecturer, Student
+from api.models.course import Course, StudentCourse
+from api.decorators import role_claims
+from flask_jwt_extended import create_access_token
+
+
+class BenchConfig(TestConfig):
+    SQLALCHEMY_ECHO = False
+
+
+def make_app(config=BenchConfig):
+    """
+    Create an app with an empty in-memory database and push its context.
+    """
+    app = create_app(config=config)
+    ctx = app.app_context()
+    ctx.push()
+    db.create_all()
+    return app, ctx
+
+
+class QueryCounter:
+    """
+    Count the SQL statements executed on the app engine.
+    """
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, conn, cursor, statement, parameters, context, executemany):
+        self.count += 1
+
+
+@contextmanager
+def count_queries():
+    counter = QueryCounter()
+    db.event.listen(db.engine, 'before_cursor_execute', counter)
+    try:
+        yield counter
+    finally:
+        db.event.remove(db.engine, 'before_cursor_execute', counter)
+
+
+def seed_students(count, batch_size=5000):
+    """
+    Bulk insert count students, returns nothing.
+    """
+    for start in range(0, count, batch_size):
+        db.session.execute(db.insert(Student), [
+            {
+                'name': f'Student {i}',
+                'email': f'student{i}@bench.com',
+                'username': f'student{i}',
+                'password_hash': 'x',
+                'matric_no': f'STD@{i:07d}',
+                'user_type': 'student'
+            }
+            for i in range(start, min(start + batch_size, count))
+        ])
+    db.session.commit()
+
+
+def admin_headers():
+    """
+    Create an admin and return the Authorization header for it.
+    """
+    admin = Admin(
+        name='Bench Admin', email='admin@bench.com', username='benchadmin',
+        password_hash='x', user_type='admin', is_admin=True
+    )
+    admin.save()
+    token = create_access_token(identity=admin.id, additional_claims=role_claims(admin))
+    return {'Authorization': f'Bearer {token}'}
+
+
+def lecturer_course(credit_units=3):
+    """
+    Create a lecturer with one course, returns (course_id, Authorization header).
+    """
+    lecturer = Lecturer(
+        name='Bench Lecturer', email='lecturer@bench.com', username='benchlecturer',
+        password_hash='x', staff_no='LCT@BENCH', user_type='lecturer'
+    )
+    lecturer.save()
+    course = Course(name='Bench Course', course_code='BENCH01', lecturer_id=lecturer.id, credit_units=credit_units)
+    course.save()
+    token = create_access_token(identity=lecturer.id, additional_claims=role_claims(lecturer))
+    return course.id, {'Authorization': f'Bearer {token}'}
+
+
+def enroll_all(course_id):
+    """
+    Register every student for the course, returns their ids.
+    """
+    student_ids = [row.id for row in db.session.execute(db.select(Student.id).order_by(Student.id))]
+    db.session.execute(db.insert(StudentCourse), [
+        {'student_id': student_id, 'course_id': course_id} for student_id in student_ids
+    ])
+    db.session.commit()
+    return student_ids
+
+
+def timeit(fn, iterations):
+    """
+    Run fn the given number of times and return the mean time per call in ms.
+    """
+    start = time.perf_counter()
+    for _ in range(iterations):
+        fn()
+    return (time.perf_counter() - start) * 1000 / iterations
+
+
+def report(title, rows):
+    print(title)
+    for name, value in rows:
+        print(f"  {name:<45} {value}")
@@ -0,0 +1,55 @@
+"""
+Compare two result files of benchmarks.harness.
+
+    python -m benchmarks.compare benchmarks/results/abc1234-10000.json benchmarks/results/def5678-10000.json
+
+Exits with status 1 when a scenario lost more than --threshold percent of
+its throughput or gained that much p95 latency, so it can gate a CI job.
+"""
+import argparse
+import json
+import sys
+
+
+def change(old, new):
+    return (new - old) * 100 / old if old else 0.0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Compare two benchmark result files')
+    parser.add_argument('baseline')
+    parser.add_argument('candidate')
+    parser.add_argument('--threshold', type=float, default=10.0, help='allowed regression in percent')
+    args = parser.parse_args(argv)
+
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    with open(args.candidate) as f:
+        candidate = json.load(f)
+
+    print('{} -> {}'.format(baseline['meta']['commit'], candidate['meta']['commit']))
+    if baseline['meta']['students'] != candidate['meta']['students']:
+        print('warning: the runs were seeded with a different number of students')
+
+    regressions = []
+    for name, new in candidate['scenarios'].items():
+        old = baseline['scenarios'].get(name)
+        if old is None:
+            print(f'  {name:<15} new scenario')
+            continue
+        throughput = change(old['throughput_rps'], new['throughput_rps'])
+        p95 = change(old['latency_ms']['p95'], new['latency_ms']['p95'])
+        print('  {:<15} {:>10.1f} -> {:>10.1f} req/s ({:+.1f}%)   p95 {:>9.2f} -> {:>9.2f} ms ({:+.1f}%)'.format(
+            name, old['throughput_rps'], new['throughput_rps'], throughput,
+            old['latency_ms']['p95'], new['latency_ms']['p95'], p95))
+        if throughput < -args.threshold or p95 > args.threshold:
+            regressions.append(name)
+
+    if regressions:
+        print('Regressed: {}'.format(', '.join(regressions)))
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
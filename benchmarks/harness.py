@@ -0,0 +1,205 @@
+"""
+Scripted load scenarios over the real hot paths, with results stored as JSON.
+
+Seeds an in-memory database with a synthetic academy, then replays each
+scenario through the WSGI app and records its throughput and latency
+percentiles. Results are written to benchmarks/results/<commit>-<students>.json
+so two commits can be compared with benchmarks.compare.
+
+    python -m benchmarks.harness --students 1000
+    python -m benchmarks.harness --students 10000 --requests 500
+    python -m benchmarks.harness --students 100000 --scenario grades
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import time
+from datetime import datetime
+from .common import make_app, seed_students, lecturer_course, report
+
+from api.models.user import Student
+from api.models.course import Course, StudentCourse, Score
+from api.utils import db, grade, letter_grade_to_gpa
+from werkzeug.security import generate_password_hash
+
+SIZES = (1000, 10000, 100000)
+COURSES = 50
+# students registered and graded in the lecturer's course, the rest stay unregistered for the enrollment scenario
+GRADED = 500
+UPLOAD_ROWS = 500
+SEED = 42
+RESULTS_DIR = os.path.join(os.path.dirname(__file__), 'results')
+
+
+class Academy:
+    """
+    The seeded data the scenarios run against.
+    """
+
+    def __init__(self, students):
+        self.random = random.Random(SEED)
+        seed_students(students)
+        self.student_ids = [row.id for row in db.session.execute(db.select(Student.id).order_by(Student.id))]
+        self.course_id, self.headers = lecturer_course()
+        db.session.execute(db.insert(Course), [
+            {'name': f'Catalog Course {i}', 'course_code': f'CAT{i:05d}', 'credit_units': 1 + i % 4}
+            for i in range(COURSES)
+        ])
+
+        self.graded = self.student_ids[:GRADED]
+        db.session.execute(db.insert(StudentCourse), [
+            {'student_id': student_id, 'course_id': self.course_id} for student_id in self.graded
+        ])
+        scores = []
+        for student_id in self.graded:
+            score = self.random.randint(0, 100)
+            percent = grade(score)
+            scores.append({
+                'student_id': student_id, 'course_id': self.course_id,
+                'score': score, 'percent': percent, 'gpa': letter_grade_to_gpa(percent)
+            })
+        db.session.execute(db.insert(Score), scores)
+        self.unenrolled = iter(self.student_ids[GRADED:])
+
+        self.login = {'email': 'loadtest@bench.com', 'password': 'loadtest-password'}
+        student = Student(
+            name='Load Test', email=self.login['email'], username='loadtest', matric_no='STD@LOAD',
+            password_hash=generate_password_hash(self.login['password']), user_type='student'
+        )
+        db.session.add(student)
+        db.session.commit()
+
+
+def login(client, academy):
+    return client.post('/auth/login', json=academy.login)
+
+
+def catalog(client, academy):
+    path = academy.random.choice((
+        '/courses/',
+        '/courses/?limit=20',
+        f'/courses/{academy.course_id}',
+        f'/courses/{academy.course_id}/students',
+    ))
+    return client.get(path, headers=academy.headers)
+
+
+def enrollment(client, academy):
+    student_id = next(academy.unenrolled, None)
+    if student_id is None:
+        # every student is registered, keep the request mix by re-registering
+        student_id = academy.random.choice(academy.graded)
+    return client.post(f'/courses/addcourse/{academy.course_id}', json={'student_id': student_id}, headers=academy.headers)
+
+
+def score_upload(client, academy):
+    rows = academy.random.sample(academy.graded, min(UPLOAD_ROWS, len(academy.graded)))
+    body = [{'student_id': student_id, 'score': academy.random.randint(0, 100)} for student_id in rows]
+    return client.put(f'/students/studentcourse/score/{academy.course_id}/bulk', json=body, headers=academy.headers)
+
+
+def grades(client, academy):
+    student_id = academy.random.choice(academy.graded)
+    return client.get(f'/students/{student_id}/courses/grades', headers=academy.headers)
+
+
+SCENARIOS = {
+    'login': login,
+    'catalog': catalog,
+    'enrollment': enrollment,
+    'score_upload': score_upload,
+    'grades': grades,
+}
+
+
+def run_scenario(client, academy, scenario, requests, warmup):
+    for _ in range(warmup):
+        scenario(client, academy)
+
+    latencies = []
+    errors = 0
+    start = time.perf_counter()
+    for _ in range(requests):
+        request_start = time.perf_counter()
+        response = scenario(client, academy)
+        latencies.append(time.perf_counter() - request_start)
+        if response.status_code >= 400:
+            errors += 1
+    elapsed = time.perf_counter() - start
+
+    percentiles = statistics.quantiles(latencies, n=100, method='inclusive')
+    return {
+        'requests': requests,
+        'errors': errors,
+        'throughput_rps': round(requests / elapsed, 2),
+        'latency_ms': {
+            'mean': round(statistics.fmean(latencies) * 1000, 3),
+            'p50': round(percentiles[49] * 1000, 3),
+            'p95': round(percentiles[94] * 1000, 3),
+            'p99': round(percentiles[98] * 1000, 3),
+            'max': round(max(latencies) * 1000, 3),
+        }
+    }
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--students', type=int, default=SIZES[0], help='number of seeded students, e.g. 1000, 10000 or 100000')
+    parser.add_argument('--requests', type=int, default=200, help='measured requests per scenario')
+    parser.add_argument('--warmup', type=int, default=20, help='unmeasured requests per scenario')
+    parser.add_argument('--scenario', action='append', choices=sorted(SCENARIOS), help='run only these scenarios')
+    parser.add_argument('--output', help='result file, defaults to benchmarks/results/<commit>-<students>.json')
+    args = parser.parse_args(argv)
+
+    app, ctx = make_app()
+    seed_start = time.perf_counter()
+    academy = Academy(args.students)
+    seed_seconds = time.perf_counter() - seed_start
+    client = app.test_client()
+
+    results = {}
+    for name in args.scenario or SCENARIOS:
+        results[name] = run_scenario(client, academy, SCENARIOS[name], args.requests, args.warmup)
+    ctx.pop()
+
+    commit = git_commit()
+    document = {
+        'meta': {
+            'commit': commit,
+            'date': datetime.utcnow().isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'students': args.students,
+            'requests': args.requests,
+            'seed_seconds': round(seed_seconds, 2),
+        },
+        'scenarios': results
+    }
+    output = args.output or os.path.join(RESULTS_DIR, f'{commit}-{args.students}.json')
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w') as f:
+        json.dump(document, f, indent=2)
+
+    report(f'{args.students} students, {args.requests} requests per scenario (commit {commit})', [
+        (name, '{throughput_rps:.0f} req/s, p50 {p50:.2f} ms, p95 {p95:.2f} ms, {errors} errors'.format(
+            throughput_rps=result['throughput_rps'], errors=result['errors'], **result['latency_ms']))
+        for name, result in results.items()
+    ])
+    print(f'Results written to {output}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,38 @@
+"""
+Microbenchmarks of the grading helpers, run with pytest-benchmark (pinned in requirements.txt):
+
+    python -m pytest benchmarks/test_micro_grading.py --benchmark-json=benchmarks/results/micro.json
+"""
+import os
+
+os.environ.setdefault('JWT_SECRET_KEY', 'benchmark-secret')
+
+from api.utils import grade, letter_grade_to_gpa
+from api.utils.grading import default_scale
+
+# one score per grade band, plus the band edges
+SCORES = [100, 95, 90, 85, 80, 75, 70, 65, 60, 55, 50, 45, 40, 35, 30, 25, 10, 0]
+GRADES = ['A+', 'A', 'A-', 'B+', 'B', 'B-', 'C+', 'C', 'C-', 'D+', 'D', 'F']
+
+
+def grade_all():
+    return [grade(score) for score in SCORES]
+
+
+def gpa_all():
+    return [letter_grade_to_gpa(letter) for letter in GRADES]
+
+
+def test_grade(benchmark):
+    result = benchmark(grade_all)
+    assert len(result) == len(SCORES)
+
+
+def test_letter_grade_to_gpa(benchmark):
+    result = benchmark(gpa_all)
+    assert len(result) == len(GRADES)
+
+
+def test_scale_grade_many(benchmark):
+    letters, gpas = benchmark(default_scale.grade_many, SCORES)
+    assert len(letters) == len(gpas) == len(SCORES)
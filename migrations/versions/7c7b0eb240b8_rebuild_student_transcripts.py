@@ -0,0 +1,64 @@
+"""rebuild student transcripts
+
+Revision ID: 7c7b0eb240b8
+Revises: 959898158b33
+Create Date: 2026-10-18 20:30:12.418204
+
+"""
+from datetime import datetime
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '7c7b0eb240b8'
+down_revision = '959898158b33'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # transcripts only followed score writes made after they were added, rebuild every one
+    # from the scores that have a gpa so students graded before then get theirs
+    totals = op.get_bind().execute(sa.text(
+        "SELECT scores.student_id, courses.term, SUM(courses.credit_units), "
+        "SUM(scores.gpa * courses.credit_units), COUNT(scores.id) "
+        "FROM scores JOIN courses ON courses.id = scores.course_id "
+        "WHERE scores.gpa IS NOT NULL "
+        "GROUP BY scores.student_id, courses.term"
+    )).all()
+
+    now = datetime.utcnow()
+    transcripts = {}
+    for student_id, term, credits, quality_points, courses in totals:
+        transcript = transcripts.setdefault(student_id, {
+            'student_id': student_id, 'total_credits': 0, 'quality_points': 0.0, 'gpa': 0.0,
+            'graded_courses': 0, 'terms': {}, 'updated_at': now
+        })
+        transcript['total_credits'] += credits
+        transcript['quality_points'] += quality_points
+        transcript['graded_courses'] += courses
+        transcript['terms'][term or 'unassigned'] = {
+            'credits': credits,
+            'quality_points': quality_points,
+            'gpa': round(quality_points / credits, 2) if credits else 0.0
+        }
+    for transcript in transcripts.values():
+        if transcript['total_credits']:
+            transcript['gpa'] = round(transcript['quality_points'] / transcript['total_credits'], 2)
+
+    table = sa.table(
+        'student_transcripts',
+        sa.column('student_id', sa.Integer()), sa.column('total_credits', sa.Integer()),
+        sa.column('quality_points', sa.Float()), sa.column('gpa', sa.Float()),
+        sa.column('graded_courses', sa.Integer()), sa.column('terms', sa.JSON()),
+        sa.column('updated_at', sa.DateTime()),
+    )
+    op.execute(table.delete())
+    if transcripts:
+        op.bulk_insert(table, list(transcripts.values()))
+
+
+def downgrade():
+    # the rebuilt transcripts are kept, they are the ones the scores give
+    pass